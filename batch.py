@@ -0,0 +1,171 @@
+"""Headless batch merges driven by a job file.
+
+Each job names a repository and the branches to integrate. Jobs run
+concurrently in a bounded process pool (one process per job at a time, so
+every job gets its own working directory), and one failing repository
+never blocks the others. A JSON report records per-job timings, conflict
+counts and errors.
+
+Job files are JSON lines, or YAML (a list of jobs, or {"jobs": [...]})
+when PyYAML is installed:
+
+    {"repo": "../service-a", "friend_branch": "feature-x", "your_branch": "feature-y",
+     "target_branch": "main", "strategy": "union"}
+
+or, to integrate a whole list of branches ordered by conflict risk:
+
+    {"repo": "../service-b", "branches": ["feature-a", "feature-b", "fix-c"]}
+"""
+import io
+import json
+import os
+import time
+import traceback
+from contextlib import redirect_stdout
+
+import click
+
+REQUIRED_FIELDS = ("repo", "friend_branch", "your_branch")
+TRAIN_FIELDS = ("repo", "branches")
+
+
+def load_jobs(path):
+    """Read jobs from a JSON lines or YAML file; relative repos are resolved
+    against the job file's directory"""
+    with open(path) as f:
+        text = f.read()
+
+    if path.endswith((".yml", ".yaml")):
+        try:
+            import yaml
+        except ImportError:
+            raise RuntimeError("PyYAML is required for YAML job files (pip install pyyaml)")
+        data = yaml.safe_load(text) or []
+        jobs = data.get("jobs", []) if isinstance(data, dict) else data
+    else:
+        jobs = []
+        for number, line in enumerate(text.splitlines(), 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                jobs.append(json.loads(line))
+            except ValueError as e:
+                raise RuntimeError(f"{path}:{number}: invalid JSON ({e})")
+
+    base = os.path.dirname(os.path.abspath(path))
+    for job in jobs:
+        if isinstance(job, dict) and job.get("repo"):
+            job["repo"] = os.path.normpath(os.path.join(base, os.path.expanduser(job["repo"])))
+    return jobs
+
+
+def run_job(index, job):
+    """Run one job in its repository and return its report entry.
+
+    Meant to run in a pool worker: it changes the process's working
+    directory and captures everything the integration flow prints.
+    """
+    import tracing
+    from conflict_solver import summarize_results
+    from integration import IntegrationOptions, TARGET_BRANCH, run_integration, run_train
+
+    entry = {"index": index, "repo": job.get("repo") if isinstance(job, dict) else None,
+             "status": "failed", "seconds": 0.0, "phases": {}, "conflicted_files": 0,
+             "hunks": 0, "error": None, "log": ""}
+    log = io.StringIO()
+    start = time.perf_counter()
+    cwd = os.getcwd()
+    tracing.disable()
+    tracer = tracing.enable()
+    try:
+        if not isinstance(job, dict):
+            raise RuntimeError("Job must be an object")
+        required = TRAIN_FIELDS if "branches" in job else REQUIRED_FIELDS
+        missing = [field for field in required if not job.get(field)]
+        if missing:
+            raise RuntimeError(f"Job is missing {', '.join(missing)}")
+        if not os.path.isdir(job["repo"]):
+            raise RuntimeError(f"Repository not found: {job['repo']}")
+
+        options = {name: job[name] for name in IntegrationOptions.__slots__ if name in job}
+        options.setdefault("target", job.get("target_branch", TARGET_BRANCH))
+        os.chdir(job["repo"])
+        engine = job.get("engine", "checkout")
+        with redirect_stdout(log):
+            if "branches" in job:
+                results = run_train(list(job["branches"]), engine=engine, **options)
+            else:
+                results = run_integration(job["friend_branch"], job["your_branch"],
+                                          engine=engine, **options)
+        summary = summarize_results(results)
+        entry.update(status="ok", conflicted_files=summary["files"], hunks=summary["hunks"])
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+        if not isinstance(e, RuntimeError):
+            log.write(traceback.format_exc())
+    finally:
+        os.chdir(cwd)
+        tracing.disable()
+        entry["seconds"] = time.perf_counter() - start
+        entry["phases"] = {row["name"]: row["seconds"]
+                           for row in tracing.summary(tracer, top=50)["spans"]}
+        entry["log"] = log.getvalue()
+    return entry
+
+
+def run_batch(jobs, max_workers=4):
+    """Run jobs concurrently; yields report entries as jobs finish"""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    with ProcessPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {pool.submit(run_job, index, job): index for index, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:  # the worker process itself died
+                job = jobs[futures[future]]
+                yield {"index": futures[future],
+                       "repo": job.get("repo") if isinstance(job, dict) else None,
+                       "status": "failed", "seconds": 0.0, "phases": {},
+                       "conflicted_files": 0, "hunks": 0,
+                       "error": f"{type(e).__name__}: {e}", "log": ""}
+
+
+@click.command()
+@click.argument("job_file", type=click.Path(exists=True, dir_okay=False))
+@click.option("--jobs", "-j", "max_workers", default=4, show_default=True,
+              help="How many repositories to merge at once")
+@click.option("--report", "report_file", default="git-solver-report.json", show_default=True,
+              type=click.Path(dir_okay=False), help="Where to write the JSON result report")
+def batch(job_file, max_workers, report_file):
+    """Merge many repositories without prompts, as listed in JOB_FILE"""
+    try:
+        jobs = load_jobs(job_file)
+    except (OSError, RuntimeError) as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f"🚀 Running {len(jobs)} job(s), {max_workers} at a time")
+    start = time.perf_counter()
+    entries = []
+    for entry in run_batch(jobs, max_workers):
+        entries.append(entry)
+        icon = "✅" if entry["status"] == "ok" else "❌"
+        detail = entry["error"] or f"{entry['conflicted_files']} conflicted file(s)"
+        click.echo(f"{icon} [{entry['index']}] {entry['repo']} ({entry['seconds']:.1f}s): {detail}")
+
+    entries.sort(key=lambda entry: entry["index"])
+    failed = sum(1 for entry in entries if entry["status"] != "ok")
+    report = {
+        "job_file": os.path.abspath(job_file),
+        "seconds": time.perf_counter() - start,
+        "total": len(entries),
+        "succeeded": len(entries) - failed,
+        "failed": failed,
+        "jobs": entries,
+    }
+    with open(report_file, "w") as out:
+        json.dump(report, out, indent=2)
+    click.echo(f"📄 Report written to {report_file} ({report['succeeded']} ok, {failed} failed)")
+    if failed:
+        raise SystemExit(1)
@@ -0,0 +1,205 @@
+"""Benchmark the merge-and-resolve pipeline on synthetic conflict repositories.
+
+Builds a throwaway repository with a local bare repo as `origin`, a main
+branch of generated files and N feature branches that all edit the same
+lines, then times each phase of the integration flow. Everything runs
+offline; results are printed (or written) as JSON.
+
+    python benchmarks/bench_pipeline.py --files 200 --hunks 5 --lines 2000 --branches 2
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from git_utils import git_executable  # noqa: E402
+
+PHASES = ("fetch", "validate", "merge", "resolve", "add", "commit")
+
+BENCH_ENV = {
+    "GIT_AUTHOR_NAME": "bench",
+    "GIT_AUTHOR_EMAIL": "bench@example.com",
+    "GIT_COMMITTER_NAME": "bench",
+    "GIT_COMMITTER_EMAIL": "bench@example.com",
+}
+
+
+def sh(args, cwd):
+    subprocess.run([git_executable()] + args, cwd=cwd, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def write_files(work, files, lines, hunks, tag):
+    """Write every generated file, changing the hunk lines to mention tag"""
+    step = max(1, lines // (hunks + 1))
+    hunk_lines = {step * (i + 1) for i in range(hunks)}
+    for f in range(files):
+        path = os.path.join(work, "src", f"file_{f:05d}.txt")
+        with open(path, "w", newline="\n") as out:
+            for n in range(lines):
+                if tag and n in hunk_lines:
+                    out.write(f"line {n} changed on {tag}\n")
+                else:
+                    out.write(f"line {n} of file {f} with some filler text\n")
+
+
+def build_repo(root, files, lines, hunks, branches):
+    """Create origin.git and a work clone with main plus feature-1..N pushed"""
+    origin = os.path.join(root, "origin.git")
+    work = os.path.join(root, "work")
+    sh(["init", "--bare", "-q", origin], root)
+    sh(["init", "-q", work], root)
+    sh(["checkout", "-q", "-b", "main"], work)
+    sh(["remote", "add", "origin", origin], work)
+    os.makedirs(os.path.join(work, "src"))
+
+    write_files(work, files, lines, hunks, None)
+    sh(["add", "-A"], work)
+    sh(["commit", "-q", "-m", "base"], work)
+    sh(["push", "-q", "origin", "main"], work)
+
+    names = []
+    for b in range(1, branches + 1):
+        name = f"feature-{b}"
+        sh(["checkout", "-q", "-b", name, "main"], work)
+        write_files(work, files, lines, hunks, name)
+        sh(["commit", "-q", "-a", "-m", name], work)
+        sh(["push", "-q", "origin", name], work)
+        names.append(name)
+    sh(["checkout", "-q", "main"], work)
+    return work, names
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.phases = {name: 0.0 for name in PHASES}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += time.perf_counter() - start
+
+
+def run_phases(branches, workers):
+    """Replay the checkout integration flow phase by phase in the current repo"""
+    from conflict_solver import resolve_conflicts
+    from fetch_planner import FetchPlan, fetch
+    from git_utils import branch_exists, run_git, run_git_merge, stage_paths
+
+    timer = PhaseTimer()
+    conflicted = 0
+    with timer.phase("fetch"):
+        fetch(FetchPlan(["main"] + list(branches)))
+    with timer.phase("validate"):
+        refs = [branch_exists(name) for name in branches]
+    run_git(["checkout", "-q", "-B", "auto-integration-branch", "main"])
+    for ref in refs:
+        with timer.phase("merge"):
+            has_conflicts = run_git_merge(ref)
+        if not has_conflicts:
+            continue
+        with timer.phase("resolve"):
+            results = resolve_conflicts(workers=workers)
+        conflicted += len(results)
+        with timer.phase("add"):
+            stage_paths([result.path for result in results])
+        with timer.phase("commit"):
+            run_git("commit --no-edit")
+    return timer.phases, conflicted
+
+
+def run_end_to_end(branches, engine, workers):
+    """Time run_integration for the first two branches against the local origin"""
+    from integration import run_integration
+
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):  # keep the JSON output clean
+        run_integration(branches[1], branches[0], engine=engine, workers=workers,
+                        use_cache=False)
+    return time.perf_counter() - start
+
+
+def bench_once(args):
+    root = tempfile.mkdtemp(prefix="git-solver-bench-")
+    cwd = os.getcwd()
+    try:
+        start = time.perf_counter()
+        work, branches = build_repo(root, args.files, args.lines, args.hunks, args.branches)
+        setup_seconds = time.perf_counter() - start
+        os.chdir(work)
+        if args.end_to_end:
+            return {"setup": setup_seconds,
+                    "end_to_end": run_end_to_end(branches, args.engine, args.workers)}
+        phases, conflicted = run_phases(branches, args.workers)
+        return {"setup": setup_seconds, "phases": phases, "conflicted_files": conflicted,
+                "total": sum(phases.values())}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def summarize(runs):
+    """Per-metric min and median across repeats"""
+    def stats(values):
+        return {"min": min(values), "median": statistics.median(values)}
+
+    summary = {}
+    if "phases" in runs[0]:
+        summary["phases"] = {name: stats([r["phases"][name] for r in runs]) for name in PHASES}
+        summary["total"] = stats([r["total"] for r in runs])
+    else:
+        summary["end_to_end"] = stats([r["end_to_end"] for r in runs])
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=50, help="conflicted files per branch")
+    parser.add_argument("--hunks", type=int, default=3, help="conflict hunks per file")
+    parser.add_argument("--lines", type=int, default=500, help="lines per file")
+    parser.add_argument("--branches", type=int, default=2, help="feature branches to merge")
+    parser.add_argument("--workers", type=int, default=1, help="resolver workers")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--end-to-end", action="store_true",
+                        help="time run_integration instead of individual phases")
+    parser.add_argument("--engine", default="checkout", help="engine for --end-to-end")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    if args.end_to_end and args.branches < 2:
+        parser.error("--end-to-end needs at least two branches")
+
+    os.environ.update(BENCH_ENV)
+    runs = [bench_once(args) for _ in range(args.repeat)]
+    git_version = subprocess.run([git_executable(), "--version"], stdout=subprocess.PIPE,
+                                 universal_newlines=True).stdout.strip()
+    report = {
+        "benchmark": "end_to_end" if args.end_to_end else "phases",
+        "params": {k: v for k, v in vars(args).items() if k != "output"},
+        "environment": {"python": platform.python_version(), "git": git_version,
+                        "platform": platform.platform()},
+        "runs": runs,
+        "summary": summarize(runs),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Check that the git-solver entry point starts within a time budget.
+
+Times `git-solver --help` and a shell session that only runs `exit`, each
+in a fresh interpreter, and verifies that neither imports the merge stack.
+Exits with status 1 when a median is over budget or a heavy module was
+loaded, so it can run in CI:
+
+    python benchmarks/bench_startup.py --repeat 10 --help-budget 250 --shell-budget 350
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that only merge, resolve, batch or daemon work should pull in
+HEAVY_MODULES = (
+    "integration", "merge_engine", "merge_planner", "conflict_solver", "resolution_cache",
+    "file_classifier", "fetch_planner", "sqlite3", "concurrent.futures", "multiprocessing",
+)
+
+# Runs the real entry point (cli_shell:main, like the console script) and
+# reports which heavy modules ended up imported
+PROBE = """
+import sys
+sys.path.insert(0, {root!r})
+import cli_shell
+try:
+    cli_shell.main(prog_name="git-solver")
+except SystemExit:
+    pass
+heavy = [name for name in {heavy!r} if name in sys.modules]
+sys.stderr.write("\\nHEAVY:" + ",".join(heavy) + "\\n")
+"""
+
+SCENARIOS = {
+    "help": (["--help"], None),
+    "shell": ([], "exit\n"),
+}
+
+
+def run_once(args, stdin, cwd):
+    """Seconds for one interpreter run of the entry point, and heavy imports"""
+    code = PROBE.format(root=ROOT, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", code] + args, cwd=cwd, input=stdin,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+    )
+    seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"git-solver {' '.join(args)} failed: {result.stderr.strip()}")
+    marker = result.stderr.rsplit("HEAVY:", 1)[-1].strip()
+    return seconds, [name for name in marker.split(",") if name]
+
+
+def baseline(repeat):
+    """Median seconds for a bare interpreter start, for context"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--help-budget", type=float, default=250,
+                        help="milliseconds allowed for the median `--help` run")
+    parser.add_argument("--shell-budget", type=float, default=350,
+                        help="milliseconds allowed for the median no-op shell session")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    budgets = {"help": args.help_budget, "shell": args.shell_budget}
+
+    report = {
+        "benchmark": "startup",
+        "params": {k: v for k, v in vars(args).items() if k != "output"},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "interpreter_ms": baseline(args.repeat) * 1000,
+        "scenarios": {},
+    }
+    failures = []
+    # Run the shell outside any repository so only startup work is measured
+    with tempfile.TemporaryDirectory(prefix="git-solver-startup-") as cwd:
+        for name, (cli_args, stdin) in SCENARIOS.items():
+            runs = [run_once(cli_args, stdin, cwd) for _ in range(args.repeat)]
+            times = [seconds * 1000 for seconds, _ in runs]
+            heavy = sorted({module for _, modules in runs for module in modules})
+            median = statistics.median(times)
+            report["scenarios"][name] = {
+                "min_ms": min(times), "median_ms": median, "budget_ms": budgets[name],
+                "heavy_imports": heavy,
+            }
+            if median > budgets[name]:
+                failures.append(f"{name}: median {median:.0f} ms over the {budgets[name]:.0f} ms budget")
+            if heavy:
+                failures.append(f"{name}: imported {', '.join(heavy)} at startup")
+    report["failures"] = failures
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(text + "\n")
+    else:
+        print(text)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,17 +2,24 @@ import os
 import sys
 from pathlib import Path
 import click
+import tracing
 from git_utils import (
-    run_git, run_git_merge, has_conflicts, is_git_repo, 
-    has_uncommitted_changes, stash_changes, unstash_changes, 
-    branch_exists, cleanup_lock_files, get_origin_url, set_origin_url
+    git, is_git_repo, has_uncommitted_changes, stash_changes, unstash_changes,
+    cleanup_lock_files, get_origin_url, set_origin_url, refresh_state, repo_state
 )
-from conflict_solver import resolve_conflicts
+# Only light modules at import time: the merge stack is imported by the
+# commands that need it, so `--help` and a plain shell start quickly
+from batch import batch
+from journal import resume_command
+from predict import predict_command
+from solver_daemon import daemon_command, request_command
+from utils import option_value, split_branches
 
 class ConflictSolverShell:
     def __init__(self):
         self.origin_url = None
         self.running = True
+        self.last_trace = None
         
     def print_banner(self):
         click.echo("=" * 60)
@@ -31,11 +38,30 @@ class ConflictSolverShell:
         click.echo("  ls             - List items in current directory")
         click.echo("  setup          - Configure origin remote URL")
         click.echo("  merge          - Merge two branches with auto conflict resolution")
+        click.echo("                   [--workers N] resolve files across N processes")
+        click.echo("                   [--engine in-memory|worktree] merge without touching")
+        click.echo("                   your checkout ([--worktree-dir DIR] e.g. /dev/shm)")
+        click.echo("                   [--engine async] overlap fetch, checkout and resolution")
+        click.echo("                   [--no-cache] skip the saved hunk resolutions")
+        click.echo("                   [--strategy union|ours|theirs|trivial] how hunks are resolved")
+        click.echo("                   [--depth N] [--filter-blobs] shallow / partial fetch")
+        click.echo("                   [--fetch-ttl SECONDS] skip fetching recently fetched branches")
+        click.echo("                   [--branches a,b,c] merge many branches, ordered by conflict risk")
+        click.echo("                   [--targets main,release] merge into each, then push all at once")
+        click.echo("                   [--scan-tree] check every file for conflict markers, not only changed ones")
+        click.echo("  resume         - Continue the last interrupted merge from its last completed phase")
+        click.echo("                   [TARGET] the merge into that branch [--show] only print what it completed")
         click.echo("  status         - Show git repository status")
         click.echo("  branches       - List all branches (local and remote)")
+        click.echo("                   [--local|--remote] [--filter PATTERN] [--page N] [--page-size N]")
         click.echo("  stash          - Stash uncommitted changes")
         click.echo("  unstash        - Restore stashed changes")
         click.echo("  cleanup        - Remove stale git lock files")
+        click.echo("  predict        - Predict conflicts of merging branches, without touching the repo")
+        click.echo("                   <branch>... [--target main] [--target-only] [--no-cache]")
+        click.echo("  scan           - Find leftover conflict markers in the whole tree")
+        click.echo("                   [--changed [REV]] only files changed since REV (HEAD) [--workers N]")
+        click.echo("  profile        - Time git calls: on | off | show [N] | dump <file> | reset")
         click.echo("  help           - Show this help message")
         click.echo("  exit           - Exit the program")
         click.echo("-" * 60)
@@ -102,8 +128,24 @@ class ConflictSolverShell:
             set_origin_url(new_url)
             click.echo("✅ Origin added successfully")
             
-    def cmd_merge(self):
+    def cmd_merge(self, args=()):
         """Perform merge with auto conflict resolution"""
+        from conflict_model import DEFAULT_STRATEGY
+        from integration import ENGINES, run_integration, run_train
+        from utils import report_cache
+
+        try:
+            workers = option_value(args, "--workers", 1, int)
+            depth = option_value(args, "--depth", None, int)
+            fetch_ttl = option_value(args, "--fetch-ttl", 0, int)
+        except ValueError:
+            click.echo("❌ --workers, --depth and --fetch-ttl expect a number")
+            return
+        engine = option_value(args, "--engine", "checkout")
+        if engine not in ENGINES:
+            click.echo(f"❌ Unknown engine '{engine}' (choose from {', '.join(ENGINES)})")
+            return
+
         if not is_git_repo():
             click.echo("❌ Not a git repository")
             return
@@ -116,119 +158,80 @@ class ConflictSolverShell:
             else:
                 return
                 
-        friend_branch = click.prompt("Enter FRIEND branch name")
-        your_branch = click.prompt("Enter YOUR branch name")
+        branches = split_branches(option_value(args, "--branches", ""))
+        if branches:
+            click.echo(f"🚂 Integrating {len(branches)} branches: {', '.join(branches)}")
+        else:
+            friend_branch = click.prompt("Enter FRIEND branch name")
+            your_branch = click.prompt("Enter YOUR branch name")
         
         if not click.confirm("Proceed with merge?", default=True):
             click.echo("❌ Merge cancelled")
             return
             
-        stashed = False
+        options = dict(
+            engine=engine, workers=workers,
+            use_cache="--no-cache" not in args,
+            strategy=option_value(args, "--strategy", DEFAULT_STRATEGY),
+            worktree_root=option_value(args, "--worktree-dir"),
+            fetch_depth=depth, blob_filter="--filter-blobs" in args,
+            fetch_ttl=fetch_ttl, targets=split_branches(option_value(args, "--targets", "")),
+            scan_whole_tree="--scan-tree" in args
+        )
         try:
-            # Clean up lock files
-            if cleanup_lock_files():
-                click.echo("🧹 Cleaned up stale git lock files")
-                
-            # Stash changes
-            if has_uncommitted_changes():
-                click.echo("📦 Stashing uncommitted changes...")
-                stash_changes()
-                stashed = True
-                
-            click.echo("🔄 Fetching from origin...")
-            run_git("fetch origin")
-            
-            # Validate branches
-            your_branch_ref = branch_exists(your_branch)
-            friend_branch_ref = branch_exists(friend_branch)
-            
-            if not your_branch_ref:
-                raise RuntimeError(f"Branch '{your_branch}' not found")
-            if not friend_branch_ref:
-                raise RuntimeError(f"Branch '{friend_branch}' not found")
-                
-            click.echo(f"📍 Found your branch: {your_branch_ref}")
-            click.echo(f"📍 Found friend branch: {friend_branch_ref}")
-            
-            run_git("checkout main")
-            run_git("pull origin main")
-            
-            # Delete old integration branch
-            try:
-                run_git("branch -D auto-integration-branch")
-            except:
-                pass
-                
-            run_git("checkout -b auto-integration-branch")
-            
-            # Merge your branch
-            click.echo("🔀 Merging your branch...")
-            has_conflicts_your = run_git_merge(your_branch_ref)
-            
-            if has_conflicts_your:
-                click.echo("🛠 Resolving conflicts from your branch...")
-                resolve_conflicts()
-                run_git("add -A")
-                run_git("commit --no-edit")
-                
-            # Merge friend branch
-            click.echo("🔀 Merging friend branch...")
-            has_conflicts_friend = run_git_merge(friend_branch_ref)
-            
-            if has_conflicts_friend:
-                click.echo("🛠 Resolving conflicts from friend branch...")
-                resolve_conflicts()
-                run_git("add -A")
-                run_git("commit --no-edit")
-                
-            run_git("checkout main")
-            run_git("merge auto-integration-branch")
-            run_git("push origin main")
-            
-            click.echo("✅ Successfully merged branches into main")
-            
-            if stashed:
-                click.echo("📦 Restoring your stashed changes...")
-                unstash_changes()
-                
+            if branches:
+                results = run_train(branches, **options)
+            else:
+                results = run_integration(friend_branch, your_branch, **options)
+            report_cache(results)
         except RuntimeError as e:
             click.echo(f"❌ Error: {str(e)}")
-            if stashed:
-                try:
-                    click.echo("📦 Restoring your stashed changes...")
-                    unstash_changes()
-                except:
-                    click.echo("⚠️  Could not restore stashed changes. Run 'git stash pop' manually.")
-                    
+
     def cmd_status(self):
         """Show git status"""
         if not is_git_repo():
             click.echo("❌ Not a git repository")
             return
             
+        from repo_state import describe
+
         try:
-            result = run_git("status")
-            click.echo(result.stdout)
+            for line in describe(repo_state()):
+                click.echo(line)
         except RuntimeError as e:
             click.echo(f"❌ Error: {str(e)}")
             
-    def cmd_branches(self):
-        """List all branches"""
+    def cmd_branches(self, args=()):
+        """List branches, optionally filtered and paginated"""
+        from ref_index import page
+
         if not is_git_repo():
             click.echo("❌ Not a git repository")
             return
-            
+
         try:
-            click.echo("\n📋 Local Branches:")
-            result = run_git("branch")
-            click.echo(result.stdout)
-            
-            click.echo("\n📋 Remote Branches:")
-            result = run_git("branch -r")
-            click.echo(result.stdout)
+            number = option_value(args, "--page", 1, int)
+            size = option_value(args, "--page-size", 50, int)
+        except ValueError:
+            click.echo("❌ --page and --page-size expect numbers")
+            return
+        pattern = option_value(args, "--filter")
+        kinds = [kind for kind in ("local", "remote") if f"--{kind}" in args] or ["local", "remote"]
+
+        try:
+            refs = git().refs()
+            current = git().run(["symbolic-ref", "--quiet", "--short", "HEAD"]).stdout.strip()
+            for kind in kinds:
+                matching = refs.names(kind, pattern)
+                names, pages = page(matching, number, size)
+                click.echo(f"\n📋 {kind.capitalize()} Branches "
+                           f"({len(matching)}, page {min(max(number, 1), pages)}/{pages}):")
+                for name in names:
+                    marker = "*" if kind == "local" and name == current else " "
+                    click.echo(f"  {marker} {name}")
         except RuntimeError as e:
             click.echo(f"❌ Error: {str(e)}")
-            
+
     def cmd_stash(self):
         """Stash uncommitted changes"""
         if not is_git_repo():
@@ -267,6 +270,122 @@ class ConflictSolverShell:
         else:
             click.echo("ℹ️  No lock files found")
             
+    def cmd_profile(self, args=()):
+        """Control git call instrumentation"""
+        action = args[0].lower() if args else "show"
+        if action == "on":
+            tracing.enable()
+            click.echo("⏱️  Profiling on - run some commands, then 'profile show'")
+        elif action == "off":
+            self.last_trace = tracing.disable() or self.last_trace
+            click.echo("⏱️  Profiling off")
+        elif action == "reset":
+            was_on = tracing.is_enabled()
+            tracing.disable()
+            self.last_trace = None
+            if was_on:
+                tracing.enable()
+            click.echo("🧹 Profile data cleared")
+        elif action in ("show", "dump"):
+            trace = tracing.current() or self.last_trace
+            if trace is None:
+                click.echo("ℹ️  Nothing recorded yet. Use 'profile on' first")
+            elif action == "show":
+                try:
+                    top = int(args[1]) if len(args) > 1 else 10
+                except ValueError:
+                    click.echo("❌ profile show expects a number")
+                    return
+                click.echo("\n⏱️  Slowest git commands and phases:")
+                for line in tracing.format_summary(trace, top):
+                    click.echo(f"  {line}")
+            elif len(args) < 2:
+                click.echo("❌ Usage: profile dump <file.json|file.jsonl>")
+            else:
+                count = tracing.dump(args[1], trace)
+                click.echo(f"✅ Wrote {count} event(s) to {args[1]}")
+        else:
+            click.echo(f"❌ Unknown profile action '{action}'")
+
+    def cmd_resume(self, args=()):
+        """Continue an interrupted merge from its journal"""
+        from integration import resume_integration
+        from journal import resumable
+        from utils import report_cache
+
+        if not is_git_repo():
+            click.echo("❌ Not a git repository")
+            return
+        names = [arg for arg in args if not arg.startswith("--")]
+        try:
+            journal = resumable(names[0] if names else None)
+        except RuntimeError as e:
+            click.echo(f"ℹ️  {str(e)}")
+            return
+        for line in journal.describe():
+            click.echo(line)
+        if "--show" in args or not click.confirm("Resume this merge?", default=True):
+            return
+        try:
+            report_cache(resume_integration(journal))
+        except RuntimeError as e:
+            click.echo(f"❌ Error: {str(e)}")
+
+    def cmd_scan(self, args=()):
+        """Report files that still contain conflict markers"""
+        import time
+        from marker_scan import changed_paths, describe, scan_paths, tree_paths
+
+        if not is_git_repo():
+            click.echo("❌ Not a git repository")
+            return
+        try:
+            workers = option_value(args, "--workers", None, int)
+        except ValueError:
+            click.echo("❌ --workers expects a number")
+            return
+        start = time.perf_counter()
+        try:
+            if "--changed" in args:
+                since = option_value(args, "--changed", "HEAD")
+                names = changed_paths("HEAD" if since.startswith("--") else since)
+            else:
+                names = tree_paths()
+            hits = scan_paths(names, git().toplevel(), workers)
+        except RuntimeError as e:
+            click.echo(f"❌ Error: {str(e)}")
+            return
+        seconds = time.perf_counter() - start
+        if not hits:
+            click.echo(f"✅ No conflict markers in {len(names)} file(s) ({seconds:.2f}s)")
+            return
+        click.echo(f"⚠️  Conflict markers in {len(hits)} of {len(names)} file(s) "
+                   f"({seconds:.2f}s):")
+        for line in describe(hits, limit=len(hits)):
+            click.echo(line)
+
+    def cmd_predict(self, args=()):
+        """Predict merge conflicts without touching the repository"""
+        from predict import format_predictions, predict
+
+        if not is_git_repo():
+            click.echo("❌ Not a git repository")
+            return
+        target = option_value(args, "--target", "main")
+        branches = [arg for i, arg in enumerate(args)
+                    if not arg.startswith("--") and (i == 0 or args[i - 1] != "--target")]
+        if not branches:
+            click.echo("❌ Usage: predict <branch> [<branch> ...] [--target main] [--target-only]")
+            return
+        try:
+            predictions = predict(branches, target, "--target-only" not in args,
+                                  "--no-cache" not in args)
+        except RuntimeError as e:
+            click.echo(f"❌ Error: {str(e)}")
+            return
+        for line in format_predictions(predictions, target):
+            click.echo(line)
+
     def run(self):
         """Run the interactive shell"""
         self.print_banner()
@@ -282,10 +401,15 @@ class ConflictSolverShell:
                 command = click.prompt(f"\n{self.prompt_prefix()}", default="", show_default=False)
                 command = command.strip()
                 lowered = command.lower()
+                name = lowered.split(maxsplit=1)[0] if lowered else ""
+                args = command.split()[1:]
                 
                 if not command:
                     continue
-                    
+                # Files may have changed since the last command
+                refresh_state()
+
+
                 if lowered.startswith("cd"):
                     parts = command.split(maxsplit=1)
                     path_arg = parts[1] if len(parts) > 1 else ""
@@ -301,18 +425,26 @@ class ConflictSolverShell:
                     self.running = False
                 elif lowered == "setup":
                     self.cmd_setup()
-                elif lowered == "merge":
-                    self.cmd_merge()
+                elif name == "merge":
+                    self.cmd_merge(args)
                 elif lowered == "status":
                     self.cmd_status()
-                elif lowered == "branches":
-                    self.cmd_branches()
+                elif name == "branches":
+                    self.cmd_branches(args)
                 elif lowered == "stash":
                     self.cmd_stash()
                 elif lowered == "unstash":
                     self.cmd_unstash()
                 elif lowered == "cleanup":
                     self.cmd_cleanup()
+                elif name == "profile":
+                    self.cmd_profile(args)
+                elif name == "predict":
+                    self.cmd_predict(args)
+                elif name == "resume":
+                    self.cmd_resume(args)
+                elif name == "scan":
+                    self.cmd_scan(args)
                 else:
                     click.echo(f"❌ Unknown command: '{command}'")
                     click.echo("Type 'help' to see available commands")
@@ -326,11 +458,23 @@ class ConflictSolverShell:
             except Exception as e:
                 click.echo(f"❌ Error: {str(e)}")
 
-@click.command()
-def main():
-    """Git Conflict Solver - Interactive CLI"""
-    shell = ConflictSolverShell()
-    shell.run()
+@click.group(invoke_without_command=True)
+@click.pass_context
+def main(ctx):
+    """Git Conflict Solver - Interactive CLI (run without a command for the shell)"""
+    if ctx.invoked_subcommand is None:
+        shell = ConflictSolverShell()
+        shell.run()
+
+main.add_command(batch)
+main.add_command(predict_command)
+main.add_command(resume_command)
+main.add_command(daemon_command)
+main.add_command(request_command)
 
 if __name__ == "__main__":
+    import multiprocessing
+
+    # Needed for the process pool in the frozen (PyInstaller) executable
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,172 @@
+"""Structured view of conflict markers in a file.
+
+A conflicted file is parsed once into a list of Hunk records that only
+hold offsets into the original buffer (bytes or an mmap), so no per-line
+strings are created. Resolution strategies pick byte ranges from those
+records and the renderer writes them straight from the buffer.
+"""
+
+CONFLICT_START = b"<<<<<<<"
+CONFLICT_BASE = b"|||||||"
+CONFLICT_SEPARATOR = b"======="
+CONFLICT_END = b">>>>>>>"
+MARKER_LENGTH = 7
+
+
+class Hunk:
+    """Offsets of one conflict region; *_end offsets are exclusive.
+
+    start/end span the whole region including marker lines. base_start is
+    -1 when the file was not written with diff3/zdiff3 markers.
+    """
+
+    __slots__ = (
+        "start", "end",
+        "ours_start", "ours_end",
+        "base_start", "base_end",
+        "theirs_start", "theirs_end",
+        "ours_label", "base_label", "theirs_label",
+    )
+
+    def __init__(self, start, end, ours, base, theirs, labels):
+        self.start = start
+        self.end = end
+        self.ours_start, self.ours_end = ours
+        self.base_start, self.base_end = base if base else (-1, -1)
+        self.theirs_start, self.theirs_end = theirs
+        self.ours_label, self.base_label, self.theirs_label = labels
+
+    @property
+    def ours(self):
+        return self.ours_start, self.ours_end
+
+    @property
+    def base(self):
+        if self.base_start < 0:
+            return None
+        return self.base_start, self.base_end
+
+    @property
+    def theirs(self):
+        return self.theirs_start, self.theirs_end
+
+    @property
+    def size(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return (f"Hunk({self.start}:{self.end}, ours={self.ours}, base={self.base}, "
+                f"theirs={self.theirs})")
+
+
+def _line_end(buf, pos):
+    newline = buf.find(b"\n", pos)
+    return len(buf) if newline < 0 else newline + 1
+
+
+def _find_marker(buf, marker, pos, end=None):
+    """Offset of the first line at or after pos starting with marker, or -1.
+
+    pos must be at the start of a line.
+    """
+    if end is None:
+        end = len(buf)
+    if buf[pos:pos + MARKER_LENGTH] == marker:
+        return pos
+    found = buf.find(b"\n" + marker, pos, end)
+    return -1 if found < 0 else found + 1
+
+
+def _label(buf, marker_pos, line_end):
+    return bytes(buf[marker_pos + MARKER_LENGTH:line_end]).strip()
+
+
+def parse_conflicts(buf):
+    """Parse conflict markers in buf into a list of Hunk records.
+
+    An unterminated region at the end of the buffer is not a hunk and is
+    left for the caller to copy through untouched.
+    """
+    hunks = []
+    pos = 0
+    while True:
+        start = _find_marker(buf, CONFLICT_START, pos)
+        if start < 0:
+            break
+        ours_start = _line_end(buf, start)
+        separator = _find_marker(buf, CONFLICT_SEPARATOR, ours_start)
+        if separator < 0:
+            break
+
+        base = None
+        base_label = b""
+        ours_end = separator
+        base_marker = _find_marker(buf, CONFLICT_BASE, ours_start, separator)
+        if base_marker >= 0:
+            ours_end = base_marker
+            base_start = _line_end(buf, base_marker)
+            base = (base_start, separator)
+            base_label = _label(buf, base_marker, base_start)
+
+        theirs_start = _line_end(buf, separator)
+        end_marker = _find_marker(buf, CONFLICT_END, theirs_start)
+        if end_marker < 0:
+            break
+        end = _line_end(buf, end_marker)
+
+        hunks.append(Hunk(
+            start, end,
+            (ours_start, ours_end), base, (theirs_start, end_marker),
+            (_label(buf, start, ours_start), base_label, _label(buf, end_marker, end)),
+        ))
+        pos = end
+    return hunks
+
+
+# Strategies return the list of (start, end) ranges that replace a hunk
+
+def take_ours(view, hunk):
+    return [hunk.ours]
+
+
+def take_theirs(view, hunk):
+    return [hunk.theirs]
+
+
+def take_union(view, hunk):
+    return [hunk.ours, hunk.theirs]
+
+
+def _same(view, a, b):
+    return (a[1] - a[0]) == (b[1] - b[0]) and view[a[0]:a[1]] == view[b[0]:b[1]]
+
+
+def take_trivial(view, hunk):
+    """Base-aware merge: keep the side that changed, union when both did"""
+    if _same(view, hunk.ours, hunk.theirs):
+        return [hunk.ours]
+    base = hunk.base
+    if base is not None:
+        if _same(view, hunk.ours, base):
+            return [hunk.theirs]
+        if _same(view, hunk.theirs, base):
+            return [hunk.ours]
+    return take_union(view, hunk)
+
+
+STRATEGIES = {
+    "union": take_union,
+    "ours": take_ours,
+    "theirs": take_theirs,
+    "trivial": take_trivial,
+}
+DEFAULT_STRATEGY = "union"
+
+
+def get_strategy(name):
+    try:
+        return STRATEGIES[name]
+    except KeyError:
+        raise RuntimeError(
+            f"Unknown resolution strategy '{name}' (choose from {', '.join(STRATEGIES)})"
+        )
@@ -1,31 +1,385 @@
+import io
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from collections import namedtuple
 from pathlib import Path
-import subprocess
-from git_utils import GIT_EXECUTABLE
-
-def resolve_conflicts():
-    files = subprocess.check_output(
-        f'"{GIT_EXECUTABLE}" diff --name-only --diff-filter=U',
-        shell=True,
-        text=True
-    ).splitlines()
-
-    for file in files:
-        path = Path(file)
-        content = path.read_text()
-
-        resolved = []
-        in_conflict = False
-
-        for line in content.splitlines():
-            if line.startswith("<<<<<<<"):
-                in_conflict = True
-                continue
-            elif line.startswith("======="):
-                continue
-            elif line.startswith(">>>>>>>"):
-                in_conflict = False
-                continue
-
-            resolved.append(line)
-
-        path.write_text("\n".join(resolved))
+from git_utils import git, repo_state
+from conflict_model import DEFAULT_STRATEGY, Hunk, get_strategy, parse_conflicts
+from file_classifier import REGENERATE, STRUCTURED, classify, fallback_plan, sniff
+from line_merge import conflict_lines, merge_lines
+from resolution_cache import ResolutionCache, hunk_key
+
+# Hunks up to this size are copied out of the file buffer so they can be
+# line-merged and their resolution cached; bigger ones are written
+# straight from it.
+MAX_HUNK_BUFFER = 1024 * 1024
+
+# Outcome of resolving one file; error is None on success. action is
+# "text" for hunk-by-hunk resolution, "ours"/"theirs" when one side's whole
+# file was taken, "regenerate" for lockfiles that need rebuilding and
+# "structured" for an entry by entry merge. shrink holds (conflicting
+# lines before, after) for every hunk the line-level merge ran on. note
+# is the format a structured merge used, or why it fell back.
+FileResult = namedtuple(
+    "FileResult",
+    ["path", "hunks", "bytes_written", "error", "cache_hits", "cache_misses", "action",
+     "shrink", "note"],
+)
+FileResult.__new__.__defaults__ = ("text", (), None)
+
+
+def failed_result(path, error):
+    return FileResult(path, 0, 0, f"{type(error).__name__}: {error}", 0, 0)
+
+
+def cache_counts(cache):
+    """(hits, misses) so far for a resolution cache, or zeros without one"""
+    if cache is None:
+        return 0, 0
+    return cache.hits, cache.misses
+
+
+def line_merge_hunk(ours, base, theirs, take, labels, shrink=None):
+    """Resolve one hunk's sections: merge line by line what only one side
+    changed, then apply the strategy to each residual conflict.
+
+    Appends (conflicting lines before, after) to shrink if given.
+    """
+    resolution = []
+    left = 0
+    for segment in merge_lines(ours, base, theirs):
+        if isinstance(segment, bytes):
+            resolution.append(segment)
+            continue
+        residual_ours, residual_base, residual_theirs = segment
+        left += conflict_lines(residual_ours, residual_theirs)
+        # Strategies only look at section offsets, so a buffer of the three
+        # sections without marker lines is enough
+        buf = residual_ours + (residual_base or b"") + residual_theirs
+        base_end = len(buf) - len(residual_theirs)
+        residual_base = None if residual_base is None else (len(residual_ours), base_end)
+        residual = Hunk(0, len(buf), (0, len(residual_ours)), residual_base,
+                        (base_end, len(buf)), labels)
+        resolution += [buf[start:end] for start, end in take(buf, residual)]
+    if shrink is not None:
+        shrink.append((conflict_lines(ours, theirs), left))
+    return b"".join(resolution)
+
+
+def resolve_hunk(view, hunk, strategy=DEFAULT_STRATEGY, cache=None, shrink=None):
+    """Buffers that replace one hunk, served from the cache when seen before.
+
+    diff3 hunks up to MAX_HUNK_BUFFER are line-merged first (see
+    line_merge_hunk); shrink collects their sizes before and after.
+    """
+    take = get_strategy(strategy)
+    if hunk.size > MAX_HUNK_BUFFER or (cache is None and hunk.base is None):
+        return [view[start:end] for start, end in take(view, hunk)]
+
+    ours = bytes(view[hunk.ours_start:hunk.ours_end])
+    theirs = bytes(view[hunk.theirs_start:hunk.theirs_end])
+    base = None if hunk.base is None else bytes(view[hunk.base_start:hunk.base_end])
+    key = None
+    if cache is not None:
+        key = hunk_key(ours, base, theirs, strategy)
+        cached = cache.get(key)
+        if cached is not None:
+            if b"\r\n" in ours or b"\r\n" in theirs:
+                cached = cached.replace(b"\n", b"\r\n")
+            return [cached]
+
+    if base is None:
+        resolution = b"".join(view[start:end] for start, end in take(view, hunk))
+    else:
+        labels = (hunk.ours_label, hunk.base_label, hunk.theirs_label)
+        resolution = line_merge_hunk(ours, base, theirs, take, labels, shrink)
+    if key is not None:
+        cache.put(key, resolution)
+    return [resolution]
+
+
+def render(buf, hunks, dst, strategy=DEFAULT_STRATEGY, cache=None, shrink=None):
+    """Write buf to dst with every hunk replaced by its resolution.
+
+    Everything outside the hunks is copied byte for byte, so encoding,
+    line endings and the trailing newline survive. Returns bytes written.
+    """
+    written = 0
+    pos = 0
+    view = memoryview(buf)
+    try:
+        for hunk in hunks:
+            for chunk in [view[pos:hunk.start]] + resolve_hunk(view, hunk, strategy, cache,
+                                                                shrink):
+                dst.write(chunk)
+                written += len(chunk)
+            pos = hunk.end
+        dst.write(view[pos:])
+        written += len(view) - pos
+    finally:
+        view.release()
+    return written
+
+
+def resolve_bytes(data, cache=None, strategy=DEFAULT_STRATEGY, shrink=None):
+    """Resolve conflict markers in an in-memory blob, returns (hunks, resolved)"""
+    hunks = parse_conflicts(data)
+    if not hunks:
+        return 0, data
+    out = io.BytesIO()
+    render(data, hunks, out, strategy, cache, shrink)
+    return len(hunks), out.getvalue()
+
+
+def resolve_file(path, cache=None, strategy=DEFAULT_STRATEGY, shrink=None):
+    """Resolve a single conflicted file in place.
+
+    The file is memory-mapped rather than read, and the result goes to a
+    temp file that atomically replaces it. Returns (hunks, bytes_written).
+    """
+    path = Path(path)
+    with open(str(path), "rb") as src:
+        if os.fstat(src.fileno()).st_size == 0:
+            return 0, 0
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            hunks = parse_conflicts(buf)
+            if not hunks:
+                return 0, 0
+            fd, tmp_name = tempfile.mkstemp(prefix=".conflict-", dir=str(path.parent))
+            try:
+                with os.fdopen(fd, "wb") as dst:
+                    written = render(buf, hunks, dst, strategy, cache, shrink)
+            except BaseException:
+                os.remove(tmp_name)
+                raise
+    shutil.copymode(str(path), tmp_name)
+    os.replace(tmp_name, str(path))
+    return len(hunks), written
+
+
+# One cache connection per worker thread/process, opened on first use;
+# _thread_caches maps every thread to its caches so a pool's can be closed
+_worker_caches = threading.local()
+_thread_caches = {}
+_thread_caches_lock = threading.Lock()
+
+
+def _worker_cache(cache_path):
+    if cache_path is None:
+        return None
+    caches = getattr(_worker_caches, "caches", None)
+    if caches is None:
+        caches = _worker_caches.caches = {}
+        with _thread_caches_lock:
+            _thread_caches[threading.current_thread()] = caches
+    if cache_path not in caches:
+        caches[cache_path] = ResolutionCache(cache_path)
+    return caches[cache_path]
+
+
+def _close_worker_caches():
+    """Close this thread's caches and those of pool threads that have exited"""
+    current = threading.current_thread()
+    with _thread_caches_lock:
+        done = [thread for thread in _thread_caches if thread is current or not thread.is_alive()]
+        closing = [_thread_caches.pop(thread) for thread in done]
+    _worker_caches.caches = None
+    for caches in closing:
+        for cache in caches.values():
+            cache.close()
+
+
+def _resolve_one(path, cache_path=None, strategy=DEFAULT_STRATEGY):
+    """Resolve one file and capture failures so a bad file never aborts a batch"""
+    try:
+        cache = _worker_cache(cache_path)
+        hits, misses = cache_counts(cache)
+        shrink = []
+        hunks, written = resolve_file(path, cache, strategy, shrink)
+        if cache is not None:
+            cache.commit()
+        hits_after, misses_after = cache_counts(cache)
+        return FileResult(path, hunks, written, None, hits_after - hits, misses_after - misses,
+                          "text", tuple(shrink))
+    except Exception as e:
+        return failed_result(path, e)
+
+
+def _resolve_chunk(paths, cache_path, strategies):
+    """Resolve a batch of files in one worker call"""
+    return [_resolve_one(path, cache_path, strategy) for path, strategy in zip(paths, strategies)]
+
+
+def _chunk_results(futures, chunks):
+    """Results of every file, in order; a chunk whose worker failed as a
+    whole (e.g. a crashed process) gives a failed result per file"""
+    for future, paths in zip(futures, chunks):
+        try:
+            results = future.result()
+        except Exception as e:
+            results = [failed_result(path, e) for path in paths]
+        for result in results:
+            yield result
+
+
+def take_side(path, side, action=None):
+    """Resolve a path to one side's whole version without reading it"""
+    try:
+        result = git().run(["checkout", f"--{side}", "--", path])
+        if result.returncode != 0:
+            if "does not have" not in result.stderr:
+                raise RuntimeError(result.stderr.strip() or "Unknown error")
+            # That side deleted the file
+            if os.path.lexists(path):
+                os.remove(path)
+            return FileResult(path, 0, 0, None, 0, 0, action or side)
+        return FileResult(path, 0, os.path.getsize(path), None, 0, 0, action or side)
+    except Exception as e:
+        return failed_result(path, e)
+
+
+def merge_structured(path, stages):
+    """Merge a JSON/YAML/TOML file entry by entry from its index stages
+    ({stage: (mode, oid)}) into the working tree.
+
+    Raises when it cannot, so the caller can fall back.
+    """
+    from structured_merge import merge_stages
+
+    fd, tmp_name = tempfile.mkstemp(prefix=".structured-", dir=os.path.dirname(path) or ".")
+    os.close(fd)
+    try:
+        kind = merge_stages(path, stages, tmp_name)
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_name)
+    except BaseException:
+        os.remove(tmp_name)
+        raise
+    os.replace(tmp_name, path)
+    return FileResult(path, 0, os.path.getsize(path), None, 0, 0, STRUCTURED, (), kind)
+
+
+def conflicted_files():
+    """List paths git reports as unmerged"""
+    state = repo_state()
+    if state is None:
+        raise RuntimeError("Not a git repository")
+    return list(state.conflicted)
+
+
+def _named(results, names):
+    """The results again, each with the path name git listed"""
+    return (result._replace(path=name) for name, result in zip(names, results))
+
+
+def _collect(results, on_result):
+    if on_result is None:
+        return list(results)
+    collected = []
+    for result in results:
+        on_result(result)
+        collected.append(result)
+    return collected
+
+
+def resolve_conflicts(workers=1, use_processes=True, cache_path=None,
+                      strategy=DEFAULT_STRATEGY, on_result=None):
+    """Resolve every conflicted file, optionally across a worker pool.
+
+    workers=None uses one worker per CPU. With cache_path set, hunk
+    resolutions are looked up in and saved to that resolution cache.
+    strategy names an entry of conflict_model.STRATEGIES; binary, generated
+    and lockfile paths are first classified by file_classifier and may be
+    resolved without parsing; JSON/YAML/TOML paths are merged entry by
+    entry first and fall back to the text strategy when that fails. Returns
+    a FileResult per file in the order git listed them; a file that fails,
+    even by crashing its worker, gets a FileResult with its error instead
+    of aborting the others.
+
+    on_result(result) is called as each file finishes, so its path can be
+    staged while later files are still being resolved. Whole-file picks
+    (which run `git checkout` and need the index) are reported first, only
+    once all of them are done.
+    """
+    get_strategy(strategy)  # fail fast on a bad name
+    conflicted = conflicted_files()
+    # git lists paths from the top of the working tree it runs in, which
+    # need not be the process directory (see git_utils.temporary_worktree)
+    root = git().toplevel() or "."
+    plans = classify(conflicted, strategy,
+                     read_head=lambda path: sniff(os.path.join(root, path)))
+    by_path = {}
+    notes = {}
+    for i, plan in enumerate(plans):
+        if plan.action == STRUCTURED:
+            try:
+                by_path[plan.path] = merge_structured(
+                    os.path.join(root, plan.path), repo_state().conflicted[plan.path][1]
+                )._replace(path=plan.path)
+            except Exception as e:  # any plugin failure falls back to the text strategy
+                plans[i] = fallback_plan(plan, e)
+                notes[plan.path] = f"structured merge failed: {e}"
+    for plan in plans:
+        if plan.action not in ("text", STRUCTURED):
+            side = "ours" if plan.action == REGENERATE else plan.action
+            by_path[plan.path] = take_side(os.path.join(root, plan.path), side,
+                                           plan.action)._replace(path=plan.path)
+    if on_result is not None:
+        for result in by_path.values():
+            on_result(result)
+
+    text_plans = [plan for plan in plans if plan.action == "text"]
+    names = [plan.path for plan in text_plans]
+    files = [os.path.join(root, name) for name in names]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(files)))
+    cache_paths = [cache_path] * len(files)
+    strategies = [plan.strategy for plan in text_plans]
+
+    if workers == 1:
+        results = _collect(_named(map(_resolve_one, files, cache_paths, strategies), names),
+                           on_result)
+        _close_worker_caches()
+    else:
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        pool_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        chunksize = max(1, len(files) // (workers * 4)) if use_processes else 1
+        starts = range(0, len(files), chunksize)
+        chunks = [files[i:i + chunksize] for i in starts]
+        with pool_class(max_workers=workers) as pool:
+            futures = [pool.submit(_resolve_chunk, chunk, cache_path,
+                                   strategies[i:i + chunksize])
+                       for i, chunk in zip(starts, chunks)]
+            results = _collect(_named(_chunk_results(futures, chunks), names), on_result)
+        if not use_processes:
+            _close_worker_caches()  # the pool's threads have exited by now
+
+    if cache_path is not None and files:
+        ResolutionCache(cache_path).close()  # evicts least recently used entries
+    by_path.update(zip(names, results))
+    for path, note in notes.items():
+        by_path[path] = by_path[path]._replace(note=note)
+    return [by_path[path] for path in conflicted]
+
+
+def summarize_results(results):
+    """Totals for a list of FileResult: files, hunks, bytes, cache use,
+    line-level merge shrinkage and failures"""
+    failed = [r for r in results if r.error]
+    shrink = [pair for r in results for pair in r.shrink]
+    return {
+        "files": len(results),
+        "hunks": sum(r.hunks for r in results),
+        "bytes_written": sum(r.bytes_written for r in results),
+        "cache_hits": sum(r.cache_hits for r in results),
+        "cache_misses": sum(r.cache_misses for r in results),
+        "hunks_shrunk": sum(1 for before, after in shrink if after < before),
+        "lines_before": sum(before for before, _ in shrink),
+        "lines_after": sum(after for _, after in shrink),
+        "failed": failed,
+    }
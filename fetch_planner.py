@@ -0,0 +1,165 @@
+"""Targeted fetching of just the branches a merge needs.
+
+Instead of `fetch origin` (every ref on the remote) followed by
+`pull origin main` (main again), the planner fetches explicit refspecs
+for the target, your and friend branches in a single round trip. It can
+do shallow (--depth) or partial (--filter=blob:none) fetches, and skips
+the network entirely when those refs were fetched within a TTL.
+"""
+import json
+import os
+import re
+import time
+from collections import namedtuple
+from git_utils import get_common_dir, git, run_git
+
+STATE_FILE = os.path.join("git-solver", "fetch-state.json")
+MAX_DEEPEN_ROUNDS = 4
+
+_MISSING_REF = re.compile(r"couldn't find remote ref (\S+)")
+
+# What a fetch did with each of the plan's branches: fetched, dropped as
+# missing on the remote, or skipped as fetched within the ttl
+FetchResult = namedtuple("FetchResult", ["fetched", "missing", "fresh"])
+
+
+class FetchPlan:
+    """Refspecs to fetch from one remote, plus how to fetch them"""
+
+    __slots__ = ("remote", "branches", "depth", "blob_filter")
+
+    def __init__(self, branches, remote="origin", depth=None, blob_filter=False):
+        self.remote = remote
+        prefix = remote + "/"
+        # 'origin/feature' and 'feature' both mean refs/heads/feature on the remote
+        names = (b[len(prefix):] if b.startswith(prefix) else b for b in branches if b)
+        self.branches = list(dict.fromkeys(names))
+        self.depth = depth
+        self.blob_filter = blob_filter
+
+    def refspec(self, branch):
+        return f"+refs/heads/{branch}:refs/remotes/{self.remote}/{branch}"
+
+    def args(self, branches=None, history=None):
+        """fetch arguments; history replaces --depth (e.g. '--deepen=50')"""
+        args = ["fetch", "--no-tags"]
+        if history:
+            args.append(history)
+        elif self.depth:
+            args.append(f"--depth={self.depth}")
+        if self.blob_filter:
+            args.append("--filter=blob:none")
+        return args + [self.remote] + [self.refspec(b) for b in (branches or self.branches)]
+
+
+def _state_path():
+    return os.path.join(get_common_dir(), STATE_FILE)
+
+
+def _load_state():
+    try:
+        with open(_state_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(state):
+    path = _state_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def stale_branches(plan, ttl):
+    """Branches whose remote-tracking ref is missing or older than ttl seconds"""
+    if not ttl:
+        return list(plan.branches)
+    fetched = _load_state().get(plan.remote, {})
+    refs = git().refs()
+    now = time.time()
+    return [
+        branch for branch in plan.branches
+        if not refs.is_remote(f"{plan.remote}/{branch}")
+        or now - fetched.get(branch, 0) > ttl
+    ]
+
+
+def _missing_branches(stderr, branches):
+    """Branches the remote reported as missing, or None if it failed otherwise"""
+    missing = set(_MISSING_REF.findall(stderr))
+    missing = {name[len("refs/heads/"):] if name.startswith("refs/heads/") else name
+               for name in missing}
+    return missing & set(branches) or None
+
+
+def _record_fetched(plan, branches):
+    if branches:
+        state = _load_state()
+        remote_state = state.setdefault(plan.remote, {})
+        now = time.time()
+        for branch in branches:
+            remote_state[branch] = now
+        _save_state(state)
+    return branches
+
+
+def _fetch_failed(result):
+    error_msg = result.stderr.strip() or result.stdout.strip() or "Unknown error"
+    return RuntimeError(f"Git command failed: {error_msg}")
+
+
+def _fetch_branches(plan, branches, run):
+    """Fetch branches in one call of run(args) -> CompletedProcess; branches
+    the remote does not have are dropped and the fetch retried. Returns
+    (fetched, dropped)."""
+    dropped = []
+    while branches:
+        result = run(plan.args(branches))
+        if result.returncode == 0:
+            break
+        missing = _missing_branches(result.stderr, branches)
+        if not missing:
+            raise _fetch_failed(result)
+        dropped += [b for b in branches if b in missing]
+        branches = [b for b in branches if b not in missing]
+    return _record_fetched(plan, branches), dropped
+
+
+def fetch(plan, ttl=0):
+    """Fetch the plan's branches in one call, skipping ones fetched within ttl.
+
+    Branches that do not exist on the remote (e.g. local-only branches)
+    are dropped and the fetch retried. Returns a FetchResult.
+    """
+    stale = stale_branches(plan, ttl)
+    fetched, missing = _fetch_branches(plan, stale, git().run)
+    return FetchResult(fetched, missing, [b for b in plan.branches if b not in stale])
+
+
+async def fetch_async(plan, ttl=0):
+    """fetch() as a coroutine for pipeline steps, run in the loop's thread pool"""
+    import asyncio
+
+    return await asyncio.get_event_loop().run_in_executor(None, fetch, plan, ttl)
+
+
+def is_shallow():
+    result = git().run(["rev-parse", "--is-shallow-repository"])
+    return result.stdout.strip() == "true"
+
+
+def ensure_merge_base(plan, ours, theirs, step=50):
+    """Deepen a shallow history of the plan's branches until ours and
+    theirs share a merge base"""
+    for _ in range(MAX_DEEPEN_ROUNDS):
+        if git().run(["merge-base", ours, theirs]).returncode == 0:
+            return
+        if not is_shallow():
+            return
+        run_git(plan.args(history=f"--deepen={step}"))
+        step *= 4
+    if is_shallow() and git().run(["merge-base", ours, theirs]).returncode != 0:
+        run_git(plan.args(history="--unshallow"))
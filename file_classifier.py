@@ -0,0 +1,180 @@
+"""Cheap per-path decisions made before any conflict parsing.
+
+Every conflicted path is classified once, in this order:
+
+1. its `merge` attribute from .gitattributes (`-merge`/`merge=binary`
+   keeps ours like git does, `merge=union` resolves with union, ...);
+2. a glob -> strategy map: `git config --add git-solver.pathStrategy
+   'GLOB=STRATEGY'` entries first, then DEFAULT_PATH_STRATEGIES;
+3. a sniff of the first block: a NUL byte means binary, which uses the
+   "binary" entry of the map (ours unless configured).
+
+"ours" and "theirs" in the map take that side's whole file, and
+"regenerate" keeps ours and asks for the lockfile to be rebuilt; none of
+them parse the file. "structured" merges JSON/YAML/TOML entry by entry
+(see structured_merge) and falls back to the hunk by hunk strategy when
+that fails. Other strategy names resolve hunk by hunk.
+"""
+import fnmatch
+import os
+from collections import namedtuple
+from conflict_model import STRATEGIES
+from git_utils import git
+
+# Same amount git inspects when deciding whether a file is binary
+SNIFF_SIZE = 8000
+
+CONFIG_KEY = "git-solver.pathStrategy"
+WHOLE_FILE = ("ours", "theirs")
+REGENERATE = "regenerate"
+STRUCTURED = "structured"
+BINARY = "binary"
+
+DEFAULT_PATH_STRATEGIES = [
+    ("package-lock.json", STRUCTURED),
+    ("npm-shrinkwrap.json", STRUCTURED),
+    ("yarn.lock", REGENERATE),
+    ("pnpm-lock.yaml", STRUCTURED),
+    ("Cargo.lock", STRUCTURED),
+    ("poetry.lock", STRUCTURED),
+    ("uv.lock", STRUCTURED),
+    ("Pipfile.lock", STRUCTURED),
+    ("Gemfile.lock", REGENERATE),
+    ("composer.lock", STRUCTURED),
+    ("go.sum", REGENERATE),
+    ("*.min.js", "theirs"),
+    ("*.min.css", "theirs"),
+    ("*.map", "theirs"),
+    ("*.json", STRUCTURED),
+    ("*.yaml", STRUCTURED),
+    ("*.yml", STRUCTURED),
+    (BINARY, "ours"),
+]
+
+# How to rebuild each lockfile once the merge is committed
+REGENERATE_COMMANDS = {
+    "package-lock.json": "npm install --package-lock-only",
+    "npm-shrinkwrap.json": "npm install --package-lock-only",
+    "yarn.lock": "yarn install",
+    "pnpm-lock.yaml": "pnpm install --lockfile-only",
+    "Cargo.lock": "cargo generate-lockfile",
+    "poetry.lock": "poetry lock --no-update",
+    "uv.lock": "uv lock",
+    "Pipfile.lock": "pipenv lock",
+    "Gemfile.lock": "bundle lock",
+    "composer.lock": "composer update --lock",
+    "go.sum": "go mod tidy",
+}
+
+# How one path will be resolved: action is "text" (hunk by hunk with
+# strategy), "ours"/"theirs" (whole file), "regenerate" or "structured"
+# (entry by entry, strategy is for the fallback)
+PathPlan = namedtuple("PathPlan", ["path", "action", "strategy", "reason"])
+
+
+def is_binary(head):
+    return b"\0" in head[:SNIFF_SIZE]
+
+
+def sniff(path):
+    """First block of a file in the working tree (empty if it is gone)"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(SNIFF_SIZE)
+    except OSError:
+        return b""
+
+
+def _check_strategy(name, source):
+    if name not in STRATEGIES and name not in (REGENERATE, STRUCTURED):
+        choices = ", ".join(list(STRATEGIES) + [REGENERATE, STRUCTURED])
+        raise RuntimeError(f"Unknown strategy '{name}' in {source} (choose from {choices})")
+    return name
+
+
+def path_strategies():
+    """(glob, strategy) pairs: configured ones first, then the defaults"""
+    result = git().run(["config", "--get-all", CONFIG_KEY])
+    configured = []
+    for line in result.stdout.splitlines() if result.returncode == 0 else []:
+        glob, sep, strategy = line.rpartition("=")
+        if not sep or not glob.strip():
+            raise RuntimeError(f"{CONFIG_KEY} expects GLOB=STRATEGY, got '{line}'")
+        configured.append((glob.strip(), _check_strategy(strategy.strip(), CONFIG_KEY)))
+    return configured + DEFAULT_PATH_STRATEGIES
+
+
+def merge_attributes(paths):
+    """The `merge` attribute of each path: 'set', 'unset', a driver name or
+    'unspecified', from one `git check-attr` call"""
+    if not paths:
+        return {}
+    stdin = b"".join(os.fsencode(path) + b"\0" for path in paths)
+    result = git().run(["check-attr", "-z", "--stdin", "merge"], input=stdin, text=False)
+    if result.returncode != 0:
+        return {}
+    fields = result.stdout.split(b"\0")
+    return {
+        os.fsdecode(fields[i]): fields[i + 2].decode()
+        for i in range(0, len(fields) - 2, 3)
+    }
+
+
+def _match(path, patterns, binary):
+    name = path.rsplit("/", 1)[-1]
+    for glob, strategy in patterns:
+        if glob == BINARY:
+            if binary:
+                return glob, strategy
+        elif fnmatch.fnmatchcase(path, glob) or fnmatch.fnmatchcase(name, glob):
+            return glob, strategy
+    return None
+
+
+def _plan(path, strategy, reason, text_strategy=None):
+    if strategy in WHOLE_FILE:
+        return PathPlan(path, strategy, None, reason)
+    if strategy == REGENERATE:
+        return PathPlan(path, REGENERATE, None, reason)
+    if strategy == STRUCTURED:
+        return PathPlan(path, STRUCTURED, text_strategy, reason)
+    return PathPlan(path, "text", strategy, reason)
+
+
+def classify(paths, strategy, read_head=sniff, patterns=None):
+    """PathPlan for every path; read_head(path) returns the first bytes of
+    the conflicted content and is only called when a sniff is needed"""
+    if patterns is None:
+        patterns = path_strategies()
+    attributes = merge_attributes(paths)
+    plans = []
+    for path in paths:
+        attribute = attributes.get(path, "unspecified")
+        if attribute in ("unset", "binary"):
+            plans.append(_plan(path, "ours", "merge=binary attribute"))
+            continue
+        if attribute in STRATEGIES or attribute in WHOLE_FILE:
+            plans.append(_plan(path, attribute, f"merge={attribute} attribute"))
+            continue
+
+        # Globs that do not need the content are checked before reading it
+        match = _match(path, [p for p in patterns if p[0] != BINARY], False)
+        if match is None and is_binary(read_head(path)):
+            match = _match(path, patterns, True) or (BINARY, "ours")
+        if match is None:
+            plans.append(PathPlan(path, "text", strategy, None))
+        else:
+            glob, matched = match
+            plans.append(_plan(path, matched, "binary file" if glob == BINARY else glob,
+                               strategy))
+    return plans
+
+
+def fallback_plan(plan, error):
+    """What a structured plan becomes when its merge fails: hunk by hunk"""
+    reason = f"{plan.reason}, structured merge failed: {error}"
+    return PathPlan(plan.path, "text", plan.strategy, reason)
+
+
+def regenerate_command(path):
+    return REGENERATE_COMMANDS.get(path.rsplit("/", 1)[-1])
@@ -0,0 +1,260 @@
+"""Shell-free git execution with long-lived batch processes.
+
+Commands are run as argument vectors, so there is no shell fork and no
+quoting issues. Object reads go through one `git cat-file --batch` process
+kept open for the whole session, and cheap repository facts (git dir,
+toplevel) are cached per working directory.
+"""
+import os
+import subprocess
+import threading
+import time
+import tracing
+from ref_index import RefIndex
+from repo_state import RepoState
+
+# Subcommands that can create, move or delete refs; they drop the ref index
+REF_MUTATING = {
+    "branch", "checkout", "cherry-pick", "commit", "fetch", "merge", "pull", "push",
+    "rebase", "reset", "revert", "stash", "switch", "symbolic-ref", "tag", "update-ref",
+    "worktree",
+}
+
+# Subcommands that can change the index or working tree; they drop the
+# RepoState snapshot
+STATE_MUTATING = REF_MUTATING | {
+    "add", "am", "apply", "checkout-index", "clean", "mv", "read-tree", "restore",
+    "rm", "update-index",
+}
+
+
+def subcommand(args):
+    """The git subcommand in an argument list, skipping '-c name=value' pairs"""
+    i = 0
+    while i < len(args) and args[i] == "-c":
+        i += 2
+    return args[i] if i < len(args) else None
+
+
+class GitBackend:
+    """Runs git for one working directory and caches facts about it"""
+
+    def __init__(self, executable, cwd):
+        self.executable = executable
+        self.cwd = cwd
+        self._facts = {}
+        self._batches = {}
+        self._lock = threading.Lock()
+
+    def run(self, args, input=None, text=True, env=None):
+        """Run git with an argument list, returning the CompletedProcess"""
+        if env is not None:
+            env = dict(os.environ, **env)
+        self.invalidate(args)
+        args = [self.executable] + list(args)
+        start = time.perf_counter()
+        result = subprocess.run(
+            args,
+            cwd=self.cwd,
+            input=input,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=text,
+            env=env,
+        )
+        tracing.record_command(
+            ["git"] + args[1:], start, result.returncode,
+            len(result.stdout or "") + len(result.stderr or "")
+        )
+        return result
+
+    def blob_to_file(self, oid, path):
+        """Stream a blob into the file at path without holding it in memory"""
+        start = time.perf_counter()
+        with open(path, "wb") as f:
+            result = subprocess.run(
+                [self.executable, "cat-file", "blob", oid],
+                cwd=self.cwd,
+                stdout=f,
+                stderr=subprocess.PIPE,
+            )
+            size = f.tell()
+        tracing.record_command(["git", "cat-file", "blob", oid], start, result.returncode,
+                               size + len(result.stderr))
+        if result.returncode != 0:
+            error_msg = os.fsdecode(result.stderr).strip() or "Unknown error"
+            raise RuntimeError(f"Git command failed: {error_msg}")
+        return path
+
+    def fact(self, key, compute):
+        """Return a cached repository fact, computing it on first use.
+
+        None results are not cached so a failed probe is retried later.
+        """
+        if key not in self._facts:
+            value = compute()
+            if value is None:
+                return None
+            self._facts[key] = value
+        return self._facts[key]
+
+    def forget(self, *keys):
+        """Drop cached facts (all of them when no keys are given)"""
+        if not keys:
+            self._facts.clear()
+        for key in keys:
+            self._facts.pop(key, None)
+
+    def invalidate(self, args):
+        """Drop the cached facts that git with these arguments can change"""
+        command = subcommand(args)
+        if command in REF_MUTATING:
+            self.forget("refs")
+        if command in STATE_MUTATING:
+            self.forget("state")
+
+    def git_dir(self):
+        """Absolute path of the .git directory, or None outside a repository"""
+        return self.fact("git_dir", lambda: self._rev_parse("--absolute-git-dir"))
+
+    def common_dir(self):
+        """Absolute path of the git dir shared by all worktrees, or None"""
+        return self.fact("common_dir", lambda: self._common_dir())
+
+    def _common_dir(self):
+        common = self._rev_parse("--git-common-dir")
+        return common and os.path.abspath(os.path.join(self.cwd, common))
+
+    def refs(self):
+        """RefIndex of branches and tags, loaded with one for-each-ref call"""
+        return self.fact("refs", lambda: RefIndex.load(self))
+
+    def state(self):
+        """RepoState snapshot from one `git status`, or None outside a repository"""
+        return self.fact("state", lambda: RepoState.load(self))
+
+    def toplevel(self):
+        """Absolute path of the working tree root, or None"""
+        return self.fact("toplevel", lambda: self._rev_parse("--show-toplevel"))
+
+    def _rev_parse(self, flag):
+        result = self.run(["rev-parse", flag])
+        if result.returncode != 0:
+            return None
+        return result.stdout.strip() or None
+
+    def _batch(self, mode):
+        batch = self._batches.get(mode)
+        if batch is None or batch.closed:
+            batch = CatFileBatch(self.executable, self.cwd, mode)
+            self._batches[mode] = batch
+        return batch
+
+    def read_object(self, name):
+        """Return (type, data) for an object, or None when it does not exist"""
+        with self._lock:
+            return self._batch("--batch").read(name)
+
+    def object_info(self, name):
+        """Return (oid, type, size) for an object, or None when it does not exist"""
+        with self._lock:
+            return self._batch("--batch-check").check(name)
+
+    def for_each_ref(self, fmt, patterns=()):
+        """List refs in one call; each row is the format's fields split on NUL"""
+        result = self.run(["for-each-ref", f"--format={fmt}"] + list(patterns))
+        if result.returncode != 0:
+            raise RuntimeError(f"Git command failed: {result.stderr.strip()}")
+        return [line.split("\0") for line in result.stdout.splitlines() if line]
+
+    def status_records(self, *extra):
+        """Raw NUL separated records from `git status --porcelain=v2 -z`"""
+        result = self.run(["status", "--porcelain=v2", "-z"] + list(extra), text=False)
+        if result.returncode != 0:
+            raise RuntimeError(f"Git command failed: {os.fsdecode(result.stderr).strip()}")
+        return [os.fsdecode(record) for record in result.stdout.split(b"\0") if record]
+
+    def close(self):
+        """Stop the long-lived batch processes"""
+        for batch in self._batches.values():
+            batch.close()
+        self._batches.clear()
+
+
+class CatFileBatch:
+    """A `git cat-file --batch` (or `--batch-check`) process kept open over pipes"""
+
+    def __init__(self, executable, cwd, mode="--batch"):
+        self.mode = mode
+        self.process = subprocess.Popen(
+            [executable, "cat-file", mode],
+            cwd=cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    @property
+    def closed(self):
+        return self.process.poll() is not None
+
+    def _header(self, name):
+        self.process.stdin.write(name.encode() + b"\n")
+        self.process.stdin.flush()
+        header = self.process.stdout.readline().split()
+        if len(header) != 3:
+            return None
+        return header[0].decode(), header[1].decode(), int(header[2])
+
+    def check(self, name):
+        start = time.perf_counter()
+        header = self._header(name)
+        tracing.record_command(["git", "cat-file", self.mode, name], start,
+                               0 if header else 1, 0)
+        return header
+
+    def read(self, name):
+        start = time.perf_counter()
+        header = self._header(name)
+        if header is None:
+            tracing.record_command(["git", "cat-file", self.mode, name], start, 1, 0)
+            return None
+        _, obj_type, size = header
+        data = self.process.stdout.read(size)
+        self.process.stdout.read(1)  # trailing LF after the object body
+        tracing.record_command(["git", "cat-file", self.mode, name], start, 0, size)
+        return obj_type, data
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+_backends = {}
+
+
+def get_backend(executable, cwd=None):
+    """Backend for cwd (default: the current directory), shared for the session"""
+    cwd = os.path.realpath(cwd or os.getcwd())
+    backend = _backends.get(cwd)
+    if backend is None:
+        backend = _backends[cwd] = GitBackend(executable, cwd)
+    return backend
+
+
+def discard_backend(cwd):
+    """Close and forget the backend of a directory that is going away"""
+    backend = _backends.pop(os.path.realpath(cwd), None)
+    if backend is not None:
+        backend.close()
+
+
+def close_all():
+    """Close every backend's batch processes"""
+    for backend in _backends.values():
+        backend.close()
@@ -1,9 +1,63 @@
 import click
-from git_utils import run_git, run_git_merge, has_conflicts, is_git_repo, has_uncommitted_changes, stash_changes, unstash_changes, branch_exists, cleanup_lock_files, get_origin_url, set_origin_url
-from conflict_solver import resolve_conflicts
+import tracing
+from git_utils import is_git_repo, get_origin_url, set_origin_url
+from conflict_model import DEFAULT_STRATEGY, STRATEGIES
+from integration import ENGINES, resume_integration, run_integration, run_train
+from utils import report_cache, split_branches
 
 @click.command()
-def start():
+@click.option("--workers", default=1, show_default=True, type=int,
+              help="Resolve conflicted files across this many processes")
+@click.option("--engine", default="checkout", show_default=True, type=click.Choice(ENGINES),
+              help="'in-memory' merges with git merge-tree, 'worktree' in a temporary "
+                   "worktree; neither touches your working copy. 'async' is the checkout "
+                   "flow with independent steps overlapped")
+@click.option("--no-cache", is_flag=True, help="Do not use the saved hunk resolution cache")
+@click.option("--strategy", default=DEFAULT_STRATEGY, show_default=True,
+              type=click.Choice(list(STRATEGIES)),
+              help="How conflict hunks are resolved; 'trivial' keeps the side that changed")
+@click.option("--worktree-dir", type=click.Path(file_okay=False),
+              help="Parent directory for the worktree engine's temporary checkout (e.g. tmpfs)")
+@click.option("--depth", type=int, help="Shallow fetch: only this many commits of history")
+@click.option("--filter-blobs", is_flag=True,
+              help="Partial fetch (--filter=blob:none); file contents download on demand")
+@click.option("--fetch-ttl", default=0, show_default=True, type=int,
+              help="Skip fetching branches that were fetched less than this many seconds ago")
+@click.option("--branches", default="",
+              help="Comma separated list of branches to integrate, ordered by conflict "
+                   "risk (instead of the FRIEND/YOUR prompts)")
+@click.option("--targets", default="",
+              help="Comma separated target branches to merge into (default main); all "
+                   "results are pushed in one git push")
+@click.option("--scan-tree", is_flag=True,
+              help="Check every file for leftover conflict markers before committing, "
+                   "not only the files the merge changed")
+@click.option("--resume", is_flag=True,
+              help="Continue the last interrupted merge (into each of --targets, if "
+                   "given) instead of starting a new one")
+@click.option("--trace", "trace_file", type=click.Path(dir_okay=False),
+              help="Record git calls and phases to this file (.jsonl or Chrome trace .json)")
+def start(workers, engine, no_cache, strategy, worktree_dir, depth, filter_blobs, fetch_ttl,
+          branches, targets, scan_tree, resume, trace_file):
+    if resume:
+        _resume(split_branches(targets))
+        return
+    fetch_options = {"fetch_depth": depth, "blob_filter": filter_blobs, "fetch_ttl": fetch_ttl,
+                     "targets": split_branches(targets), "scan_whole_tree": scan_tree}
+    branches = split_branches(branches)
+    if trace_file:
+        tracing.enable()
+        try:
+            _start(workers, engine, no_cache, strategy, worktree_dir, fetch_options, branches)
+        finally:
+            count = tracing.dump(trace_file)
+            click.echo(f"\n⏱️  Wrote {count} trace event(s) to {trace_file}")
+            for line in tracing.format_summary(top=10):
+                click.echo(f"  {line}")
+    else:
+        _start(workers, engine, no_cache, strategy, worktree_dir, fetch_options, branches)
+
+def _start(workers, engine, no_cache, strategy, worktree_dir, fetch_options, branches):
     click.echo("🚀 Git Conflict Solver")
     click.echo("=" * 40)
     
@@ -27,90 +81,45 @@ def start():
         click.echo("✅ Origin added")
     
     click.echo("")
-    friend_branch = click.prompt("Enter FRIEND branch name")
-    your_branch = click.prompt("Enter YOUR branch name")
+    if branches:
+        click.echo(f"🚂 Integrating {len(branches)} branches: {', '.join(branches)}")
+    else:
+        friend_branch = click.prompt("Enter FRIEND branch name")
+        your_branch = click.prompt("Enter YOUR branch name")
     proceed = click.confirm("Proceed with merge?", default=True)
 
     if not proceed:
         click.echo("❌ Merge cancelled")
         return
 
-    stashed = False
+    options = dict(
+        engine=engine, workers=workers, use_cache=not no_cache, strategy=strategy,
+        worktree_root=worktree_dir, **fetch_options
+    )
     try:
-        # Clean up any stale lock files
-        if cleanup_lock_files():
-            click.echo("🧹 Cleaned up stale git lock files...")
-        
-        # Check for uncommitted changes and stash them
-        if has_uncommitted_changes():
-            click.echo("📦 Stashing uncommitted changes...")
-            stash_changes()
-            stashed = True
-        
-        run_git("fetch origin")
-        
-        # Validate branches exist
-        your_branch_ref = branch_exists(your_branch)
-        friend_branch_ref = branch_exists(friend_branch)
-        
-        if not your_branch_ref:
-            raise RuntimeError(f"Branch '{your_branch}' not found locally or on origin")
-        if not friend_branch_ref:
-            raise RuntimeError(f"Branch '{friend_branch}' not found locally or on origin")
-        
-        click.echo(f"📍 Found your branch: {your_branch_ref}")
-        click.echo(f"📍 Found friend branch: {friend_branch_ref}")
-        
-        run_git("checkout main")
-        run_git("pull origin main")
-        
-        # Delete integration branch if it exists from a previous run
-        try:
-            run_git("branch -D auto-integration-branch")
-        except:
-            pass  # Branch doesn't exist, that's fine
-            
-        run_git("checkout -b auto-integration-branch")
-
-        click.echo("🔀 Merging your branch...")
-        has_conflicts_your = run_git_merge(your_branch_ref)
-        
-        if has_conflicts_your:
-            click.echo("🛠 Resolving conflicts from your branch...")
-            resolve_conflicts()
-            run_git("add -A")
-            run_git("commit --no-edit")
-
-        click.echo("🔀 Merging friend branch...")
-        has_conflicts_friend = run_git_merge(friend_branch_ref)
-
-        if has_conflicts_friend:
-            click.echo("🛠 Resolving conflicts from friend branch...")
-            resolve_conflicts()
-            run_git("add -A")
-            run_git("commit --no-edit")
+        if branches:
+            results = run_train(branches, **options)
+        else:
+            results = run_integration(friend_branch, your_branch, **options)
+        report_cache(results)
+    except RuntimeError as e:
+        click.echo(f"❌ Error: {str(e)}")
+        return
 
-        run_git("checkout main")
-        run_git("merge auto-integration-branch")
-        run_git("push origin main")
+def _resume(targets=()):
+    from journal import resumable
 
-        click.echo("✅ Successfully merged branches into main")
-        
-        # Restore stashed changes if any
-        if stashed:
-            click.echo("📦 Restoring your stashed changes...")
-            unstash_changes()
-            
+    if not is_git_repo():
+        click.echo("❌ Error: Current directory is not a git repository")
+        return
+    try:
+        for target in targets or [None]:
+            journal = resumable(target)
+            for line in journal.describe():
+                click.echo(line)
+            report_cache(resume_integration(journal))
     except RuntimeError as e:
         click.echo(f"❌ Error: {str(e)}")
-        # Try to restore stashed changes even on error
-        if stashed:
-            try:
-                click.echo("📦 Restoring your stashed changes...")
-                unstash_changes()
-            except:
-                click.echo("⚠️ Warning: Could not restore stashed changes. Run 'git stash pop' manually.")
-        return
 
 if __name__ == "__main__":
     start()
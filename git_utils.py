@@ -1,97 +1,126 @@
-import subprocess
+import atexit
 import os
+import shlex
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from git_backend import get_backend, close_all, discard_backend
+from ref_index import needs_rev_parse
 
-# Try to find Git executable
-GIT_EXECUTABLE = None
-possible_paths = [
+# Where Git for Windows usually lives when it is not on PATH
+WINDOWS_GIT_PATHS = [
     "C:\\Program Files\\Git\\cmd\\git.exe",
     "C:\\Program Files (x86)\\Git\\cmd\\git.exe",
     "C:\\Git\\cmd\\git.exe"
 ]
 
-for path in possible_paths:
-    if os.path.exists(path):
-        GIT_EXECUTABLE = path
-        break
+_git_executable = None
 
-if not GIT_EXECUTABLE:
-    GIT_EXECUTABLE = "git"  # Fallback to system PATH
+def git_executable():
+    """Path of the git executable, looked up once on first use"""
+    global _git_executable
+    if _git_executable is None:
+        _git_executable = shutil.which("git") or next(
+            (path for path in WINDOWS_GIT_PATHS if os.path.exists(path)), "git"
+        )
+    return _git_executable
+
+# Message of the stash made before a checkout merge, found again to pop it
+STASH_MESSAGE = "git-conflict-solver-auto-stash"
+
+# Conflict markers carry the merge base so strategies can tell which side changed
+DIFF3_CONFIG = ["-c", "merge.conflictStyle=diff3"]
+
+# The worktree temporary_worktree() switched this thread to, if any
+_worktree = threading.local()
+
+def git():
+    """Shared git backend for this thread's temporary worktree, or else the
+    current working directory"""
+    return get_backend(git_executable(), getattr(_worktree, "path", None))
+
+atexit.register(close_all)
+
+def _git_args(command):
+    return shlex.split(command) if isinstance(command, str) else list(command)
 
 def run_git(command):
-    result = subprocess.run(f'"{GIT_EXECUTABLE}" {command}', shell=True, capture_output=True, text=True)
+    """Run a git command (string or argument list), raising on failure"""
+    result = git().run(_git_args(command))
     if result.returncode != 0:
         error_msg = result.stderr.strip() or result.stdout.strip() or "Unknown error"
         raise RuntimeError(f"Git command failed: {error_msg}")
     return result
 
-def run_git_merge(branch):
+def run_git_merge(branch, message=None):
     """Run git merge, allowing conflicts (returns True if conflicts exist)"""
-    result = subprocess.run(
-        f'"{GIT_EXECUTABLE}" merge {branch} --no-edit',
-        shell=True,
-        capture_output=True,
-        text=True
-    )
+    args = DIFF3_CONFIG + ["merge", branch, "--no-edit"]
+    result = git().run(args + ["-m", message] if message else args)
+    if result.returncode == 0:
+        return False
     # Return code 1 with conflicts is OK, we'll resolve them
-    if result.returncode != 0 and not has_conflicts():
+    conflicted = has_conflicts()
+    if not conflicted:
         error_msg = result.stderr.strip() or result.stdout.strip() or "Unknown error"
         raise RuntimeError(f"Merge failed: {error_msg}")
-    return has_conflicts()
+    return conflicted
 
 def branch_exists(branch):
     """Check if a branch exists locally or remotely"""
-    # Check local
-    result = subprocess.run(
-        f'"{GIT_EXECUTABLE}" rev-parse --verify {branch}',
-        shell=True,
-        capture_output=True,
-        text=True
-    )
-    if result.returncode == 0:
-        return branch
-    
-    # Check remote
-    result = subprocess.run(
-        f'"{GIT_EXECUTABLE}" rev-parse --verify origin/{branch}',
-        shell=True,
-        capture_output=True,
-        text=True
-    )
-    if result.returncode == 0:
-        return f"origin/{branch}"
-    
+    ref = git().refs().resolve(branch)
+    if ref or not needs_rev_parse(branch):
+        return ref
+    # Commit ids and revision expressions are not in the ref index
+    for ref in (branch, f"origin/{branch}"):
+        result = git().run(["rev-parse", "--verify", "--quiet", ref])
+        if result.returncode == 0:
+            return ref
     return None
 
+def repo_state():
+    """RepoState snapshot of the current repository, or None outside one.
+
+    Served from the backend's cache until a git command that changes the
+    index or working tree runs; call refresh_state() after changing files
+    without git.
+    """
+    return git().state()
+
+def refresh_state():
+    """Forget the RepoState snapshot so the next repo_state() re-reads it"""
+    git().forget("state")
+
 def has_conflicts():
-    result = subprocess.run(
-        f'"{GIT_EXECUTABLE}" diff --name-only --diff-filter=U',
-        shell=True,
-        capture_output=True,
-        text=True
-    )
-    return bool(result.stdout.strip())
+    state = repo_state()
+    return bool(state and state.conflicted)
+
+def stage_paths(paths):
+    """Stage exactly these paths with one index update; deleted files are removed.
+
+    Paths are relative to the top of the working tree, as `git status`
+    lists them, wherever the command runs from.
+    """
+    if not paths:
+        return
+    root = git().toplevel() or ""
+    stdin = b"".join(os.fsencode(os.path.join(root, path)) + b"\0" for path in paths)
+    result = git().run(["update-index", "-z", "--add", "--remove", "--stdin"],
+                       input=stdin, text=False)
+    if result.returncode != 0:
+        raise RuntimeError(f"Git command failed: {os.fsdecode(result.stderr).strip()}")
 
 def is_git_repo():
     """Check if current directory is a git repository"""
-    result = subprocess.run(
-        f'"{GIT_EXECUTABLE}" rev-parse --git-dir',
-        shell=True,
-        capture_output=True,
-        text=True
-    )
-    return result.returncode == 0
+    return git().git_dir() is not None
 
 def get_git_dir():
     """Get the .git directory path"""
-    result = subprocess.run(
-        f'"{GIT_EXECUTABLE}" rev-parse --git-dir',
-        shell=True,
-        capture_output=True,
-        text=True
-    )
-    if result.returncode == 0:
-        return result.stdout.strip()
-    return None
+    return git().git_dir()
+
+def get_common_dir():
+    """Get the git directory shared by every worktree of the repository"""
+    return git().common_dir()
 
 def cleanup_lock_files():
     """Remove stale git lock files that can block operations"""
@@ -106,40 +135,61 @@ def cleanup_lock_files():
                 pass
     return False
 
+def merge_in_progress():
+    """True while a merge stopped for conflicts has not been committed or aborted"""
+    git_dir = get_git_dir()
+    return bool(git_dir) and os.path.exists(os.path.join(git_dir, "MERGE_HEAD"))
+
 def has_uncommitted_changes():
     """Check if there are uncommitted changes in the working directory"""
-    result = subprocess.run(
-        f'"{GIT_EXECUTABLE}" status --porcelain',
-        shell=True,
-        capture_output=True,
-        text=True
-    )
-    return bool(result.stdout.strip())
+    state = repo_state()
+    return bool(state and state.dirty)
 
 def stash_changes():
     """Stash any uncommitted changes"""
-    run_git("stash push -m 'git-conflict-solver-auto-stash'")
+    run_git(["stash", "push", "-m", STASH_MESSAGE])
     return True
 
 def unstash_changes():
     """Restore stashed changes if they exist"""
-    result = subprocess.run(
-        f'"{GIT_EXECUTABLE}" stash list',
-        shell=True,
-        capture_output=True,
-        text=True
-    )
-    if 'git-conflict-solver-auto-stash' in result.stdout:
+    result = git().run(["stash", "list"])
+    if STASH_MESSAGE in result.stdout:
         run_git("stash pop")
 
+def push_branches(updates, remote="origin"):
+    """Push [(branch, commit, expected)] in a single `git push`.
+
+    Each branch gets an explicit refspec and --force-with-lease against
+    expected, the commit fetched before merging (None when the branch did
+    not exist), so a concurrent push is never overwritten.
+    """
+    if not updates:
+        return
+    args = ["push", "--porcelain", remote]
+    args += [f"--force-with-lease=refs/heads/{branch}:{expected or ''}"
+             for branch, _, expected in updates]
+    args += [f"{commit}:refs/heads/{branch}" for branch, commit, _ in updates]
+    result = git().run(args)
+    if result.returncode == 0:
+        return
+    # --porcelain prints "!<TAB><from>:<to><TAB><reason>" for every rejected ref
+    rejected = []
+    for line in result.stdout.splitlines():
+        flag, _, rest = line.partition("\t")
+        if flag == "!":
+            refspec, _, reason = rest.partition("\t")
+            rejected.append((refspec.split(":refs/heads/", 1)[-1], reason))
+    if not rejected:
+        error_msg = result.stderr.strip() or result.stdout.strip() or "Unknown error"
+        raise RuntimeError(f"Git command failed: {error_msg}")
+    message = ", ".join(f"{branch} {reason}" for branch, reason in rejected)
+    if any("stale info" in reason for _, reason in rejected):
+        message += f"; {remote} changed since it was fetched, merge again"
+    raise RuntimeError(f"Push rejected: {message}")
+
 def get_origin_url():
     """Get the current origin remote URL"""
-    result = subprocess.run(
-        f'"{GIT_EXECUTABLE}" remote get-url origin',
-        shell=True,
-        capture_output=True,
-        text=True
-    )
+    result = git().run(["remote", "get-url", "origin"])
     if result.returncode == 0:
         return result.stdout.strip()
     return None
@@ -148,7 +198,34 @@ def set_origin_url(url):
     """Set or update the origin remote URL"""
     current_url = get_origin_url()
     if current_url:
-        run_git(f"remote set-url origin {url}")
+        run_git(["remote", "set-url", "origin", url])
     else:
-        run_git(f"remote add origin {url}")
+        run_git(["remote", "add", "origin", url])
     return True
+
+def branch_checked_out(branch):
+    """Check if a local branch is checked out in any worktree"""
+    result = git().run(["worktree", "list", "--porcelain"])
+    return f"branch refs/heads/{branch}" in result.stdout.splitlines()
+
+@contextmanager
+def temporary_worktree(start, root=None):
+    """Check out start (detached) in a throwaway worktree and run this
+    thread's git commands there.
+
+    The process working directory is left alone, so other threads keep
+    their own repository. root picks the parent directory, e.g. a tmpfs
+    mount. The worktree is removed on exit.
+    """
+    path = tempfile.mkdtemp(prefix="git-solver-wt-", dir=root)
+    run_git(["worktree", "add", "--detach", "--quiet", path, start])
+    previous = getattr(_worktree, "path", None)
+    _worktree.path = path
+    try:
+        yield path
+    finally:
+        _worktree.path = previous
+        discard_backend(path)
+        git().run(["worktree", "remove", "--force", path])
+        shutil.rmtree(path, ignore_errors=True)
+        git().run(["worktree", "prune"])
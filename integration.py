@@ -0,0 +1,886 @@
+"""Integration flows shared by the interactive shell and git_cli.
+
+Every flow merges YOUR branch and then FRIEND branch (or any list of
+branches) on top of the latest main, resolves conflicts automatically and
+pushes main back to origin. The engines differ in where the merge happens:
+the user's checkout, the object database only (in-memory) or a temporary
+worktree. The async engine is the checkout flow run as a step graph, so
+independent git work overlaps.
+"""
+import asyncio
+import os
+import subprocess
+import click
+from git_utils import (
+    DIFF3_CONFIG, STASH_MESSAGE, git, run_git, run_git_merge, has_conflicts,
+    has_uncommitted_changes, stash_changes, unstash_changes, branch_exists,
+    cleanup_lock_files, get_common_dir, branch_checked_out, merge_in_progress, push_branches,
+    refresh_state, repo_state, stage_paths, temporary_worktree
+)
+from conflict_model import DEFAULT_STRATEGY, get_strategy
+from conflict_solver import resolve_conflicts
+from fetch_planner import FetchPlan, ensure_merge_base, fetch, is_shallow
+from marker_scan import check_markers, describe, scan_file
+from merge_engine import merge_commits, octopus_commit, rev_parse
+from merge_planner import plan_merges
+from resolution_cache import cache_path, open_cache
+from tracing import span
+from utils import report_fetch, report_plan, report_resolution
+
+TARGET_BRANCH = "main"
+INTEGRATION_BRANCH = "auto-integration-branch"
+ENGINES = ("checkout", "in-memory", "worktree", "async")
+
+
+def validate_branches(branches):
+    """Resolve (label, name) pairs to (label, ref), raising if any is missing"""
+    refs = []
+    for label, name in branches:
+        ref = branch_exists(name)
+        if not ref:
+            raise RuntimeError(f"Branch '{name}' not found locally or on origin")
+        refs.append((label, ref))
+
+    for label, ref in refs:
+        click.echo(f"📍 Found {label} branch: {ref}")
+    return refs
+
+
+class IntegrationOptions:
+    """Knobs shared by every integration flow"""
+
+    __slots__ = ("workers", "use_cache", "strategy", "target", "worktree_root",
+                 "fetch_depth", "blob_filter", "fetch_ttl", "conflict_order", "journal",
+                 "pushes", "scan_whole_tree")
+
+    def __init__(self, workers=1, use_cache=True, strategy=DEFAULT_STRATEGY,
+                 target=TARGET_BRANCH, worktree_root=None, fetch_depth=None,
+                 blob_filter=False, fetch_ttl=0, conflict_order=False, journal=None,
+                 pushes=None, scan_whole_tree=False):
+        self.workers = workers
+        self.use_cache = use_cache
+        self.strategy = strategy
+        self.target = target
+        # Parent directory for the worktree engine (e.g. a tmpfs mount)
+        self.worktree_root = worktree_root
+        # Shallow (--depth) / partial (--filter=blob:none) fetches, and how
+        # many seconds a fetched branch counts as fresh enough to skip
+        self.fetch_depth = fetch_depth
+        self.blob_filter = blob_filter
+        self.fetch_ttl = fetch_ttl
+        # Reorder branches by predicted conflicts and octopus-merge clean ones
+        self.conflict_order = conflict_order
+        # journal.Journal the flow records completed phases in (and skips on resume)
+        self.journal = journal
+        # A list collecting (target, commit, expected) instead of pushing, so
+        # several integrations go out in one `git push`
+        self.pushes = pushes
+        # Scan every file for leftover conflict markers, not only changed ones
+        self.scan_whole_tree = scan_whole_tree
+
+    def as_dict(self):
+        """The options a journal needs to rerun the flow"""
+        return {name: getattr(self, name) for name in self.__slots__
+                if name not in ("journal", "pushes")}
+
+    def record(self, phase, commit=None, refs=None, **details):
+        if self.journal is not None:
+            self.journal.record(phase, commit, refs, **details)
+
+    def completed(self, phase):
+        return self.journal is not None and self.journal.completed(phase)
+
+    def resumed_head(self):
+        """Integration commit the interrupted run had reached, or None"""
+        return self.journal.head if self.journal is not None else None
+
+    def cache_path(self):
+        """Resolution cache location, shared by every worktree of the repo"""
+        return cache_path(get_common_dir()) if self.use_cache else None
+
+
+def fetch_branches(names, options):
+    """Fetch only the target and the named branches, in one round trip.
+
+    Returns the FetchPlan so the history can be deepened the same way.
+    """
+    plan = FetchPlan([options.target] + list(names),
+                     depth=options.fetch_depth, blob_filter=options.blob_filter)
+    click.echo("🔄 Fetching from origin...")
+    with span("fetch"):
+        fetched = fetch(plan, options.fetch_ttl)
+    report_fetch(fetched, options.fetch_ttl)
+    return plan
+
+
+def fetch_and_validate(branches, options):
+    """Fetch and resolve the branches, returning (fetch plan, [(label, ref)]).
+
+    On resume nothing is fetched (the plan is None): the refs the journal
+    recorded are reused after checking that none of them moved.
+    """
+    entry = options.journal.entry("validate") if options.journal is not None else None
+    if entry is not None:
+        with span("validate"):
+            options.journal.verify()
+        refs = [(label, entry["labels"][label]) for label, _ in branches]
+        for label, ref in refs:
+            click.echo(f"📍 Found {label} branch: {ref}")
+        return None, refs
+
+    plan = fetch_branches([name for _, name in branches], options)
+    with span("validate"):
+        refs = validate_branches(branches)
+    options.record("validate", refs=ref_commits(options.target, refs), labels=dict(refs))
+    return plan, refs
+
+
+def ref_commits(target, refs):
+    """{ref: commit} of the target, origin/target and every (label, ref)"""
+    names = [target, f"origin/{target}"] + [ref for _, ref in refs]
+    commits = {name: rev_parse(name) for name in dict.fromkeys(names)}
+    return {name: commit for name, commit in commits.items() if commit}
+
+
+def pending(refs, options):
+    """The (label, ref) pairs the journal has not recorded as merged"""
+    return [(label, ref) for label, ref in refs if not options.completed(f"merge:{label}")]
+
+
+def deepen_for_merge(plan, target_ref, refs):
+    """Make sure a shallow history reaches the merge base of every ref"""
+    if plan is None or not (plan.depth or is_shallow()):
+        return
+    with span("deepen"):
+        for ref in refs:
+            if ref:
+                ensure_merge_base(plan, target_ref, ref)
+
+
+def merge_groups(target_commit, refs, options):
+    """(label, ref) groups to merge in order; a group of several is one octopus merge"""
+    if not options.conflict_order or len(refs) < 2:
+        return [[ref] for ref in refs]
+    with span("plan"):
+        plan = plan_merges(target_commit, refs)
+    report_plan(plan)
+    return plan.groups()
+
+
+def octopus_message(group, into):
+    names = [f"'{ref}'" for _, ref in group]
+    return f"Merge branches {', '.join(names[:-1])} and {names[-1]} into {into}"
+
+
+def merge_and_resolve(label, ref, options, results, message=None):
+    """Merge ref into the current checkout, resolving and committing conflicts.
+
+    message replaces git's default merge message, which names HEAD when
+    no branch is checked out.
+    """
+    click.echo(f"🔀 Merging {label} branch...")
+    with span(f"merge:{label}"):
+        conflicted = run_git_merge(ref, message)
+    if not conflicted:
+        return
+    click.echo(f"🛠 Resolving conflicts from {label} branch...")
+    with span(f"resolve:{label}"):
+        resolved = resolve_conflicts(
+            workers=options.workers, cache_path=options.cache_path(),
+            strategy=options.strategy
+        )
+    results += resolved
+    report_resolution(resolved)
+    # Every unmerged path gets staged: rewritten ones and those git left
+    # without markers (e.g. modify/delete), never unrelated files
+    paths = [result.path for result in resolved]
+    with span("verify"):
+        check_markers("HEAD", options.scan_whole_tree)
+    with span("add"):
+        stage_paths(paths)
+    if has_conflicts():
+        raise RuntimeError("Some paths are still unmerged; merge left in progress")
+    with span("commit"):
+        run_git("commit --no-edit")
+
+
+def octopus_merge(group, into):
+    """Merge several refs into the current checkout in one commit.
+
+    Returns False (with the checkout restored) if git refuses, e.g. because
+    the branches conflict after all.
+    """
+    click.echo(f"🐙 Merging {len(group)} non-overlapping branches in one octopus merge...")
+    with span("merge:octopus", branches=len(group)):
+        result = git().run(["merge", "--no-edit", "-m", octopus_message(group, into)]
+                           + [ref for _, ref in group])
+        if result.returncode == 0:
+            return True
+        run_git(["reset", "--merge"])
+    click.echo("   Octopus merge did not apply cleanly; merging those branches one by one")
+    return False
+
+
+def merge_in_checkout(refs, options, results, into=INTEGRATION_BRANCH, moved=None):
+    """Merge every (label, ref) into the current checkout, in planned groups.
+
+    moved names the branch checked out, if any, so the journal can check
+    it on resume; without one the merge messages name into.
+    """
+    for group in merge_groups(rev_parse("HEAD"), refs, options):
+        if len(group) > 1 and octopus_merge(group, into):
+            record_merges(options, group, rev_parse("HEAD"), moved)
+            continue
+        for label, ref in group:
+            message = None if moved else f"Merge branch '{ref}' into {into}"
+            merge_and_resolve(label, ref, options, results, message)
+            record_merges(options, [(label, ref)], rev_parse("HEAD"), moved)
+
+
+def record_merges(options, group, head, moved=None):
+    for label, _ in group:
+        options.record(f"merge:{label}", head, {moved: head} if moved else None)
+
+
+def checkout_integration(branches, options):
+    """Merge in the working tree: stash, checkout, merge, resolve, commit, push.
+
+    branches is a list of (label, name) pairs merged in that order.
+    Returns the FileResult of every resolved file.
+    """
+    target = options.target
+    results = []
+    stashed = False
+    try:
+        with span("prepare"):
+            # Clean up lock files
+            if cleanup_lock_files():
+                click.echo("🧹 Cleaned up stale git lock files")
+
+            if options.completed("branch") and merge_in_progress():
+                # The interrupted run stopped mid-merge; that merge is redone
+                click.echo("↩️  Abandoning the merge the interrupted run left in progress")
+                run_git(["merge", "--abort"])
+
+            # Stash changes
+            if has_uncommitted_changes():
+                click.echo("📦 Stashing uncommitted changes...")
+                stash_changes()
+                stashed = True
+
+        plan, refs = fetch_and_validate(branches, options)
+        fetched = rev_parse(f"origin/{target}")
+
+        if not options.completed("pull"):
+            with span("checkout"):
+                run_git(["checkout", target])
+            deepen_for_merge(plan, target, [ref for _, ref in refs])
+            if git().refs().is_remote(f"origin/{target}"):
+                # The fetch above already brought origin/main; merging it is the pull
+                with span("pull"):
+                    run_git(["merge", "--no-edit", f"origin/{target}"])
+            pulled = rev_parse(target)
+            options.record("pull", pulled, {target: pulled})
+
+        if not options.completed("finalize"):
+            with span("checkout"):
+                if options.completed("branch"):
+                    run_git(["checkout", INTEGRATION_BRANCH])
+                else:
+                    # (Re)create the integration branch at the pulled target
+                    run_git(["checkout", "-B", INTEGRATION_BRANCH, target])
+                    start = rev_parse("HEAD")
+                    options.record("branch", start, {INTEGRATION_BRANCH: start})
+
+            merge_in_checkout(pending(refs, options), options, results,
+                              moved=INTEGRATION_BRANCH)
+
+            head = rev_parse("HEAD")
+            with span("verify"):
+                check_markers(target, options.scan_whole_tree)
+            with span("finalize"):
+                finalize_target(target, head, options.journal.entry("pull")["commit"])
+            options.record("finalize", head, {target: head})
+        push_target(options, rev_parse(target), fetched)
+
+        click.echo(f"✅ Successfully merged branches into {target}")
+        return results
+    finally:
+        if stashed:
+            try:
+                click.echo("📦 Restoring your stashed changes...")
+                with span("unstash"):
+                    unstash_changes()
+            except RuntimeError:
+                click.echo("⚠️  Could not restore stashed changes. Run 'git stash pop' manually.")
+
+
+class AsyncIntegration:
+    """The checkout flow as a pipeline.Pipeline step graph.
+
+    Steps only wait for what they need: the fetch runs while the working
+    tree is stashed and the target checked out, local branches are
+    validated without waiting for the fetch, the merge plan is computed
+    while the target is pulled, and resolved files are streamed into one
+    `git update-index --stdin` while later files are still being resolved.
+    """
+
+    def __init__(self, branches, options):
+        from pipeline import Pipeline
+
+        self.branches = branches
+        self.options = options
+        self.results = []
+        self.stashed = False
+        self.fetch_plan = FetchPlan([options.target] + [name for _, name in branches],
+                                    depth=options.fetch_depth, blob_filter=options.blob_filter)
+        self.octopus = {}
+        self.pipeline = Pipeline()
+        add = self.pipeline.add
+        add("stash", self.stash, phase="prepare")
+        add("fetch", self.fetch)
+        for label, name in branches:
+            add(f"validate:{label}", self.validate_step(label, name), phase="validate")
+        validated = [f"validate:{label}" for label, _ in branches]
+        add("deepen", self.deepen, deps=["fetch"] + validated, phase="fetch")
+        add("checkout", self.checkout, deps=["stash"], phase="prepare")
+        add("pull", self.pull, deps=["checkout", "deepen"])
+        add("branch", self.branch, deps=["pull"], phase="prepare")
+        # Adds the merge chain, finalize and push once the order is known
+        add("plan", self.plan, deps=["deepen"])
+
+    def run(self):
+        try:
+            self.pipeline.run()
+        finally:
+            if self.stashed:
+                try:
+                    click.echo("📦 Restoring your stashed changes...")
+                    with span("unstash"):
+                        unstash_changes()
+                except RuntimeError:
+                    click.echo("⚠️  Could not restore stashed changes. Run 'git stash pop' manually.")
+        click.echo(f"✅ Successfully merged branches into {self.options.target}")
+        for line in self.pipeline.format_report():
+            click.echo(line)
+        return self.results
+
+    async def stash(self, step):
+        from pipeline import run_git_async, status_async
+
+        if cleanup_lock_files():
+            click.echo("🧹 Cleaned up stale git lock files")
+        if (await status_async()).dirty:
+            click.echo("📦 Stashing uncommitted changes...")
+            await run_git_async(["stash", "push", "-m", STASH_MESSAGE])
+            self.stashed = True
+
+    async def fetch(self, step):
+        from fetch_planner import fetch_async
+
+        click.echo("🔄 Fetching from origin...")
+        fetched = await fetch_async(self.fetch_plan, self.options.fetch_ttl)
+        report_fetch(fetched, self.options.fetch_ttl)
+        # What the push's lease expects origin to still have
+        return await _in_executor(rev_parse, f"origin/{self.options.target}")
+
+    def validate_step(self, label, name):
+        async def validate(step):
+            # A local branch does not change with the fetch, anything else might
+            if not git().refs().is_local(name):
+                await step.wait("fetch")
+            ref = branch_exists(name)
+            if not ref:
+                raise RuntimeError(f"Branch '{name}' not found locally or on origin")
+            click.echo(f"📍 Found {label} branch: {ref}")
+            return ref
+        return validate
+
+    def refs(self):
+        results = self.pipeline.results
+        return [(label, results[f"validate:{label}"]) for label, _ in self.branches]
+
+    def deepen(self, step):
+        refs = self.refs()
+        self.options.record("validate", refs=ref_commits(self.options.target, refs),
+                            labels=dict(refs))
+        deepen_for_merge(self.fetch_plan, self.options.target, [ref for _, ref in refs])
+
+    async def checkout(self, step):
+        from pipeline import run_git_async
+
+        if not git().refs().is_local(self.options.target):
+            await step.wait("fetch")  # created from origin/<target>
+        await run_git_async(["checkout", self.options.target])
+
+    async def pull(self, step):
+        from pipeline import run_git_async
+
+        target = self.options.target
+        if git().refs().is_remote(f"origin/{target}"):
+            await run_git_async(["merge", "--no-edit", f"origin/{target}"])
+        pulled = await _in_executor(rev_parse, target)
+        await _in_executor(self.options.record, "pull", pulled, {target: pulled})
+
+    async def branch(self, step):
+        from pipeline import git_async, run_git_async
+
+        await git_async(["branch", "-D", INTEGRATION_BRANCH])
+        await run_git_async(["checkout", "-b", INTEGRATION_BRANCH])
+        start = await _in_executor(rev_parse, "HEAD")
+        await _in_executor(self.options.record, "branch", start, {INTEGRATION_BRANCH: start})
+
+    async def plan(self, step):
+        """Plan against origin/<target>, so it overlaps checking out and pulling"""
+        target = self.options.target
+        remote = f"origin/{target}"
+        start = await _in_executor(rev_parse, remote if git().refs().is_remote(remote) else target)
+        groups = await _in_executor(merge_groups, start, self.refs(), self.options)
+
+        add = self.pipeline.add
+        tail = ["branch", "plan"]
+        for number, group in enumerate(groups, 1):
+            octopus = None
+            if len(group) > 1:
+                octopus = f"merge:octopus{number}"
+                add(octopus, self.octopus_step(octopus, group), deps=tail)
+                tail = [octopus]
+            for label, ref in group:
+                add(f"merge:{label}", self.merge_step(label, ref, octopus), deps=tail)
+                add(f"resolve:{label}", self.resolve_step(label), deps=[f"merge:{label}"])
+                add(f"commit:{label}", self.commit_step(label), deps=[f"resolve:{label}"])
+                tail = [f"commit:{label}"]
+        add("finalize", self.finalize, deps=tail)
+        add("push", self.push, deps=["finalize"])
+
+    def octopus_step(self, name, group):
+        async def octopus(step):
+            from pipeline import git_async, run_git_async
+
+            click.echo(f"🐙 Merging {len(group)} non-overlapping branches in one octopus merge...")
+            message = octopus_message(group, INTEGRATION_BRANCH)
+            result = await git_async(["merge", "--no-edit", "-m", message]
+                                     + [ref for _, ref in group])
+            self.octopus[name] = result.returncode == 0
+            if result.returncode != 0:
+                await run_git_async(["reset", "--merge"])
+                click.echo("   Octopus merge did not apply cleanly; "
+                           "merging those branches one by one")
+        return octopus
+
+    def merge_step(self, label, ref, octopus=None):
+        async def merge(step):
+            """True when the merge stopped with conflicts"""
+            from pipeline import git_async
+
+            if self.octopus.get(octopus):
+                return False  # already merged by the octopus step
+            click.echo(f"🔀 Merging {label} branch...")
+            result = await git_async(DIFF3_CONFIG + ["merge", ref, "--no-edit"])
+            if result.returncode == 0:
+                return False
+            if not await _has_conflicts_async():
+                error_msg = result.stderr.strip() or result.stdout.strip() or "Unknown error"
+                raise RuntimeError(f"Merge failed: {error_msg}")
+            return True
+        return merge
+
+    def resolve_step(self, label):
+        async def resolve(step):
+            if not await step.wait(f"merge:{label}"):
+                return None
+            click.echo(f"🛠 Resolving conflicts from {label} branch...")
+            resolved = await self.resolve_and_stage()
+            self.results += resolved
+            report_resolution(resolved)
+            return resolved
+        return resolve
+
+    async def resolve_and_stage(self):
+        """Resolve conflicts in the thread pool, staging each file as it is
+        done; files marker_scan still finds markers in are held back"""
+        from pipeline import start_git
+
+        loop = asyncio.get_event_loop()
+        done = asyncio.Queue()
+        options = self.options
+        root = await _in_executor(git().toplevel)
+
+        def work():
+            try:
+                return resolve_conflicts(
+                    workers=options.workers, cache_path=options.cache_path(),
+                    strategy=options.strategy,
+                    on_result=lambda result: loop.call_soon_threadsafe(done.put_nowait, result)
+                )
+            finally:
+                loop.call_soon_threadsafe(done.put_nowait, None)
+
+        resolving = loop.run_in_executor(None, work)
+        stager = None
+        held = []
+        while True:
+            result = await done.get()
+            if result is None:
+                break
+            if result.error:
+                continue  # reported (and raised) by report_resolution
+            path = os.path.join(root, result.path)
+            hit = await _in_executor(scan_file, path, result.path)
+            if hit is not None:
+                held.append(hit)
+                continue
+            if stager is None:
+                # Started after the whole-file picks, which need the index
+                stager = await start_git(["update-index", "-z", "--add", "--remove", "--stdin"],
+                                         stdin=subprocess.PIPE)
+            stager.stdin.write(os.fsencode(path) + b"\0")
+            await stager.stdin.drain()
+        resolved = await resolving
+        if stager is not None:
+            stager.stdin.close()  # communicate() only closes it when given input
+            _, stderr = await stager.communicate()
+            if stager.returncode != 0:
+                raise RuntimeError(f"Git command failed: {os.fsdecode(stderr).strip()}")
+        if held:
+            raise RuntimeError(
+                f"Conflict markers left in {len(held)} file(s); merge left in progress\n"
+                + "\n".join(describe(held))
+            )
+        return resolved
+
+    def commit_step(self, label):
+        async def commit(step):
+            from pipeline import run_git_async
+
+            if await step.wait(f"resolve:{label}") is not None:
+                if await _has_conflicts_async():
+                    raise RuntimeError("Some paths are still unmerged; merge left in progress")
+                await _in_executor(check_markers, "HEAD", self.options.scan_whole_tree)
+                await run_git_async(["commit", "--no-edit"])
+            head = await _in_executor(rev_parse, "HEAD")
+            await _in_executor(record_merges, self.options, [(label, None)], head,
+                               INTEGRATION_BRANCH)
+        return commit
+
+    def finalize(self, step):
+        target = self.options.target
+        head = rev_parse("HEAD")
+        check_markers(target, self.options.scan_whole_tree)
+        finalize_target(target, head, self.options.journal.entry("pull")["commit"])
+        self.options.record("finalize", head, {target: head})
+
+    async def push(self, step):
+        fetched = await step.wait("fetch")
+        head = await _in_executor(rev_parse, self.options.target)
+        await _in_executor(push_target, self.options, head, fetched)
+
+
+async def _in_executor(func, *args):
+    """Run a blocking call (git, file or journal I/O) in the loop's thread pool"""
+    return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+
+async def _has_conflicts_async():
+    from pipeline import status_async
+
+    return bool((await status_async()).conflicted)
+
+
+def async_integration(branches, options):
+    """Checkout flow with independent git work overlapped on an asyncio loop.
+
+    Prints the critical path per phase at the end. Returns the FileResult
+    of every resolved file.
+    """
+    return AsyncIntegration(branches, options).run()
+
+
+def in_memory_integration(branches, options):
+    """Merge with `git merge-tree` and only move refs; no checkout, no stash.
+
+    Conflicted blobs are resolved in memory, so workers is not used here.
+    Returns the FileResult of every resolved file.
+    """
+    cache = open_cache(get_common_dir()) if options.use_cache else None
+    try:
+        return _in_memory_integration(branches, cache, options)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def _in_memory_integration(branches, cache, options):
+    target = options.target
+    strategy = options.strategy
+    results = []
+    plan, refs = fetch_and_validate(branches, options)
+    with span("validate"):
+        old_target = rev_parse(target)
+        remote_target = rev_parse(f"origin/{target}")
+    if not old_target and not remote_target:
+        raise RuntimeError(f"Branch '{target}' not found locally or on origin")
+
+    if options.completed("pull"):
+        head = options.resumed_head()
+    else:
+        deepen_for_merge(plan, old_target or remote_target,
+                         [remote_target] + [ref for _, ref in refs])
+        # Equivalent of `pull origin main` on top of the local main
+        head = old_target or remote_target
+        if old_target and remote_target:
+            head = _merge_step(
+                head, remote_target, f"origin/{target}", target,
+                results, cache, strategy
+            )
+        options.record("pull", head)
+
+    for group in merge_groups(head, pending(refs, options), options):
+        if len(group) > 1:
+            click.echo(f"🐙 Merging {len(group)} non-overlapping branches in one octopus merge...")
+            with span("merge:octopus", branches=len(group)):
+                commit = octopus_commit(head, [rev_parse(ref) for _, ref in group],
+                                        octopus_message(group, INTEGRATION_BRANCH))
+            if commit:
+                head = commit
+                record_merges(options, group, head)
+                continue
+            click.echo("   Octopus merge did not apply cleanly; merging those branches one by one")
+        for label, ref in group:
+            click.echo(f"🔀 Merging {label} branch...")
+            head = _merge_step(
+                head, rev_parse(ref), ref, INTEGRATION_BRANCH, results, cache, strategy, label
+            )
+            record_merges(options, [(label, ref)], head)
+
+    if not options.completed("finalize"):
+        with span("verify"):
+            check_markers(old_target or remote_target, options.scan_whole_tree, commit=head)
+        with span("finalize"):
+            # A dirty checkout of target is detected before any ref moves
+            moved = {target: head} if finalize_target(target, head, old_target) else {}
+            run_git(["update-ref", f"refs/heads/{INTEGRATION_BRANCH}", head])
+        options.record("finalize", head, dict(moved, **{INTEGRATION_BRANCH: head}))
+    push_target(options, head, remote_target)
+
+    click.echo(f"✅ Successfully merged branches into {target}")
+    return results
+
+
+def worktree_integration(branches, options):
+    """Merge inside a temporary `git worktree`; the user's checkout is never touched.
+
+    Work happens on a detached HEAD, so several integrations of the same
+    repository can run at once in separate worktrees. Returns the
+    FileResult of every resolved file.
+    """
+    target = options.target
+    results = []
+    plan, refs = fetch_and_validate(branches, options)
+    with span("validate"):
+        old_target = rev_parse(target)
+        remote_target = rev_parse(f"origin/{target}")
+    if not old_target and not remote_target:
+        raise RuntimeError(f"Branch '{target}' not found locally or on origin")
+
+    # The worktree is gone after a failure, but its commits are not
+    pulled = options.completed("pull")
+    if not pulled:
+        deepen_for_merge(plan, old_target or remote_target,
+                         [remote_target] + [ref for _, ref in refs])
+    start = options.resumed_head() if pulled else old_target or remote_target
+    with temporary_worktree(start, options.worktree_root) as path:
+        click.echo(f"🌳 Working in temporary worktree {path}")
+        if not pulled:
+            if old_target and remote_target and old_target != remote_target:
+                with span("pull"):
+                    merge_and_resolve(f"origin/{target}", remote_target, options, results,
+                                      f"Merge branch 'origin/{target}' into {target}")
+            options.record("pull", rev_parse("HEAD"))
+        merge_in_checkout(pending(refs, options), options, results)
+        with span("verify"):
+            check_markers(start, options.scan_whole_tree)
+        head = rev_parse("HEAD")
+
+    push_target(options, head, remote_target)
+    with span("finalize"):
+        run_git(["update-ref", f"refs/heads/{INTEGRATION_BRANCH}", head])
+        moved = {INTEGRATION_BRANCH: head}
+        if branch_checked_out(target):
+            click.echo(f"ℹ️  '{target}' is checked out in your working copy; "
+                       f"run 'git pull' there to pick up the merge")
+        else:
+            run_git(["update-ref", f"refs/heads/{target}", head, old_target or ""])
+            moved[target] = head
+    options.record("finalize", head, moved)
+
+    click.echo(f"✅ Successfully merged branches into {target}")
+    return results
+
+
+def _merge_step(ours, theirs, theirs_name, into, results, cache=None,
+                strategy=DEFAULT_STRATEGY, label=None):
+    message = f"Merge branch '{theirs_name}' into {into}"
+    with span(f"merge:{label or theirs_name}"):
+        commit, resolved = merge_commits(ours, theirs, message, cache, strategy)
+    if resolved:
+        click.echo(f"🛠 Resolving conflicts from {label or theirs_name} branch...")
+        results += resolved
+        report_resolution(resolved)
+    return commit
+
+
+def finalize_target(target, head, old_target):
+    """Fast-forward target to head without checking it out again.
+
+    The ref moves with `update-ref` only if it still points at old_target.
+    When the integration branch is checked out at head, HEAD is then
+    switched to target; the working tree already matches. A checked out
+    target only moves when its working tree has no changes, and its index
+    and files are then updated with `git read-tree -m -u`. Returns False
+    when the target was left alone.
+    """
+    current = git().run(["symbolic-ref", "--quiet", "HEAD"]).stdout.strip()
+    if current == f"refs/heads/{target}":
+        return _finalize_checked_out(target, head, old_target)
+    run_git(["update-ref", "-m", f"merge {INTEGRATION_BRANCH}: Fast-forward",
+             f"refs/heads/{target}", head, old_target or ""])
+    if current == f"refs/heads/{INTEGRATION_BRANCH}" and rev_parse("HEAD") == head:
+        run_git(["symbolic-ref", "HEAD", f"refs/heads/{target}"])
+    return True
+
+
+def _finalize_checked_out(target, head, old_target):
+    refresh_state()
+    state = repo_state()
+    if state.changed or state.conflicted:
+        click.echo(f"ℹ️  '{target}' is checked out with uncommitted changes; "
+                   f"run 'git pull' there to pick up the merge")
+        return False
+    run_git(["update-ref", "-m", f"merge {INTEGRATION_BRANCH}: Fast-forward",
+             f"refs/heads/{target}", head, old_target or ""])
+    # Untracked files in the way make read-tree refuse; the ref is put back
+    result = git().run(["read-tree", "-m", "-u"] + ([old_target] if old_target else []) + [head])
+    if result.returncode != 0:
+        run_git(["update-ref", f"refs/heads/{target}", old_target, head] if old_target
+                else ["update-ref", "-d", f"refs/heads/{target}", head])
+        raise RuntimeError(f"Could not update the '{target}' checkout: {result.stderr.strip()}")
+    return True
+
+
+def push_target(options, head, fetched):
+    """Push head to origin's target with a lease on the fetched commit, or
+    queue it when options.pushes collects the pushes of several targets"""
+    target = options.target
+    if options.completed("push"):
+        return
+    if options.pushes is not None:
+        options.pushes.append((target, head, fetched))
+        return
+    with span("push"):
+        push_branches([(target, head, fetched)])
+    options.record("push", head, {f"origin/{target}": head})
+
+
+def integrate_branches(branches, engine="checkout", journal=None, **options):
+    """Merge a list of (label, name) branches into the target with the chosen
+    engine, returning all FileResults.
+
+    Keyword options are those of IntegrationOptions. Completed phases are
+    recorded in a new journal.Journal, or in journal when resuming one. A
+    journal whose push is queued in pushes is left running for
+    integrate_targets to finish.
+    """
+    from journal import Journal
+
+    options = IntegrationOptions(**options)
+    get_strategy(options.strategy)  # fail before fetching on a bad name
+    refresh_state()
+    if engine == "in-memory":
+        flow = in_memory_integration
+    elif engine == "worktree":
+        flow = worktree_integration
+    elif engine == "checkout":
+        flow = checkout_integration
+    elif engine == "async":
+        flow = async_integration
+    else:
+        raise RuntimeError(f"Unknown merge engine '{engine}' (choose from {', '.join(ENGINES)})")
+    if journal is None:
+        journal = Journal.start(engine, branches, options.as_dict())
+    else:
+        journal.resume()
+    options.journal = journal
+    with span("integration", engine=engine, branches=len(branches)):
+        try:
+            results = flow(branches, options)
+        except BaseException as e:
+            journal.fail(e)
+            raise
+    if options.pushes is None or options.completed("push"):
+        journal.finish()
+    return results
+
+
+def integrate_targets(branches, targets, engine="checkout", **options):
+    """Integrate the branches into each target in turn, then push every
+    result in one `git push`; nothing is pushed if any integration fails.
+
+    Each target's journal is finished only once the push went out, so a
+    rejected push can be resumed per target.
+    """
+    from journal import Journal
+
+    if len(set(targets)) != len(targets):
+        raise RuntimeError("Each target can only be listed once")
+    options.pop("target", None)
+    pushes = []
+    results = []
+    try:
+        for target in targets:
+            click.echo(f"🎯 Integrating into {target}")
+            results += integrate_branches(branches, engine, target=target, pushes=pushes,
+                                          **options)
+        with span("push", branches=len(pushes)):
+            push_branches(pushes)
+    except BaseException as e:
+        for target, _, _ in pushes:
+            Journal.load(target).fail(e)
+        raise
+    for target, head, _ in pushes:
+        journal = Journal.load(target)
+        journal.record("push", head, {f"origin/{target}": head})
+        journal.finish()
+    click.echo(f"🚀 Pushed {', '.join(target for target, _, _ in pushes)} in one push")
+    return results
+
+
+def run_integration(friend_branch, your_branch, engine="checkout", targets=None, **options):
+    """Merge your branch, then friend branch, into the target (or each of targets)"""
+    branches = [("your", your_branch), ("friend", friend_branch)]
+    if targets:
+        return integrate_targets(branches, targets, engine, **options)
+    return integrate_branches(branches, engine, **options)
+
+
+def run_train(names, engine="checkout", targets=None, **options):
+    """Merge many branches, ordered to keep conflicts low and with the
+    non-overlapping ones merged in a single octopus merge"""
+    if len(set(names)) != len(names):
+        raise RuntimeError("Each branch can only be listed once")
+    options.setdefault("conflict_order", True)
+    branches = [(name, name) for name in names]
+    if targets:
+        return integrate_targets(branches, targets, engine, **options)
+    return integrate_branches(branches, engine, **options)
+
+
+def resume_integration(journal):
+    """Continue a journaled run after its last completed phase.
+
+    Runs of the async engine continue with the checkout flow, which
+    records the same phases.
+    """
+    engine = "checkout" if journal.engine == "async" else journal.engine
+    branches = [tuple(branch) for branch in journal.branches]
+    return integrate_branches(branches, engine, journal=journal, **journal.options)
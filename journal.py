@@ -0,0 +1,212 @@
+"""On-disk journal of an integration run, so a failed run can be resumed.
+
+<git dir>/git-solver/journals/<target>.json holds the engine, branches and
+options of the last run into that target and, as each phase completes, the
+commit it produced and the refs it moved. Runs into different targets, e.g.
+from separate worktrees, keep separate journals. `resume` reloads it, checks that every recorded ref still
+points where the run left it, and continues after the last completed phase:
+a push that was rejected is retried without fetching or merging again, and
+a crash while resolving the second branch keeps the first merge.
+"""
+import json
+import os
+import threading
+import time
+
+import click
+
+from git_utils import get_common_dir, is_git_repo
+
+JOURNAL_DIR = os.path.join("git-solver", "journals")
+
+# Steps of the async engine record phases from the loop's thread pool
+_lock = threading.Lock()
+
+
+def _journal_dir():
+    common_dir = get_common_dir()
+    if common_dir is None:
+        raise RuntimeError("Not a git repository")
+    return os.path.join(common_dir, JOURNAL_DIR)
+
+
+def _journal_path(target):
+    # Branch names are valid relative paths; "a/b" nests like refs/heads does
+    return os.path.join(_journal_dir(), f"{target}.json")
+
+
+class Journal:
+    """Completed phases of one integration run"""
+
+    __slots__ = ("path", "engine", "branches", "options", "phases", "refs",
+                 "status", "error", "started")
+
+    def __init__(self, path, engine, branches, options, phases=None, refs=None,
+                 status="running", error=None, started=None):
+        self.path = path
+        self.engine = engine
+        # [label, name] pairs as passed to integration.integrate_branches
+        self.branches = [list(branch) for branch in branches]
+        self.options = options
+        # [{"phase", "commit", "time", ...}] in completion order
+        self.phases = phases or []
+        # {ref: commit} every ref must still point at for a resume
+        self.refs = refs or {}
+        self.status = status
+        self.error = error
+        self.started = started or time.time()
+
+    @classmethod
+    def start(cls, engine, branches, options):
+        """A new journal for a run, replacing the previous one into the same target"""
+        journal = cls(_journal_path(options["target"]), engine, branches, options)
+        journal.save()
+        return journal
+
+    @classmethod
+    def load(cls, target):
+        """The journal of the last run into target, or None"""
+        return cls._read(_journal_path(target))
+
+    @classmethod
+    def all(cls):
+        """The journal of every target, in the order their runs started"""
+        journals = []
+        for parent, _, names in os.walk(_journal_dir()):
+            for name in names:
+                if name.endswith(".json"):
+                    journal = cls._read(os.path.join(parent, name))
+                    if journal is not None:
+                        journals.append(journal)
+        return sorted(journals, key=lambda journal: journal.started)
+
+    @classmethod
+    def _read(cls, path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return cls(path, **data)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != "path"}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.as_dict(), f, indent=1)
+        os.replace(tmp, self.path)
+
+    def record(self, phase, commit=None, refs=None, **details):
+        """Mark phase as done; refs maps each ref it moved to its new commit"""
+        entry = {"phase": phase, "commit": commit, "time": time.time()}
+        entry.update(details)
+        with _lock:
+            self.phases.append(entry)
+            self.refs.update(refs or {})
+            self.save()
+
+    def entry(self, phase):
+        for entry in reversed(self.phases):
+            if entry["phase"] == phase:
+                return entry
+        return None
+
+    def completed(self, phase):
+        return self.entry(phase) is not None
+
+    @property
+    def head(self):
+        """The integration commit as of the last completed phase, or None"""
+        for entry in reversed(self.phases):
+            if entry["commit"]:
+                return entry["commit"]
+        return None
+
+    @property
+    def last_phase(self):
+        return self.phases[-1]["phase"] if self.phases else None
+
+    def moved_refs(self):
+        """(ref, recorded, current) for every ref that no longer matches"""
+        from merge_engine import rev_parse
+
+        moved = []
+        for ref, commit in sorted(self.refs.items()):
+            current = rev_parse(ref)
+            if current != commit:
+                moved.append((ref, commit, current))
+        return moved
+
+    def verify(self):
+        """Raise if any recorded ref moved since the run stopped"""
+        moved = self.moved_refs()
+        if moved:
+            details = ", ".join(
+                f"{ref} {(old or 'missing')[:10]} → {(new or 'missing')[:10]}"
+                for ref, old, new in moved
+            )
+            raise RuntimeError(
+                f"Refs moved since the interrupted merge ({details}); start a new merge instead"
+            )
+
+    def resume(self):
+        self.status = "running"
+        self.error = None
+        self.save()
+
+    def fail(self, error):
+        self.status = "failed"
+        self.error = f"{type(error).__name__}: {error}"
+        self.save()
+
+    def finish(self):
+        self.status = "done"
+        self.save()
+
+    def describe(self):
+        names = ", ".join(name for _, name in self.branches)
+        done = ", ".join(entry["phase"] for entry in self.phases) or "nothing"
+        return [f"⏯  {self.engine} merge of {names} into {self.options['target']} "
+                f"({self.status}{': ' + self.error if self.error else ''})",
+                f"   Completed: {done}"]
+
+
+def resumable(target=None):
+    """The journal of the interrupted run into target (or the only
+    interrupted run), raising if there is nothing to resume"""
+    if target is not None:
+        journal = Journal.load(target)
+        if journal is None or journal.status == "done":
+            raise RuntimeError(f"No interrupted merge into '{target}' to resume")
+        return journal
+    journals = [journal for journal in Journal.all() if journal.status != "done"]
+    if not journals:
+        raise RuntimeError("No interrupted merge to resume")
+    if len(journals) > 1:
+        targets = ", ".join(journal.options["target"] for journal in journals)
+        raise RuntimeError(f"Interrupted merges into {targets}; name the target to resume")
+    return journals[0]
+
+
+@click.command("resume")
+@click.argument("target", required=False)
+@click.option("--show", is_flag=True, help="Only print what the interrupted run completed")
+def resume_command(target, show):
+    """Continue the interrupted merge into TARGET (or the only interrupted
+    merge) from its last completed phase"""
+    from integration import resume_integration
+    from utils import report_cache
+
+    if not is_git_repo():
+        raise click.ClickException("Current directory is not a git repository")
+    try:
+        journal = resumable(target)
+        for line in journal.describe():
+            click.echo(line)
+        if not show:
+            report_cache(resume_integration(journal))
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
@@ -0,0 +1,217 @@
+"""Line-level three-way merge inside one conflict hunk.
+
+git marks the whole region where both sides' changes overlap in the base
+as one conflict. Inside it most lines are often shared (import blocks,
+config lists) and only a few really collide. merge_lines aligns ours and
+theirs with the base using a patience/histogram diff, takes every change that only
+one side made and leaves just the overlapping lines as residual conflicts
+for the resolution strategy.
+
+Every distinct line is interned to a small int first, so the diff loops
+compare ints instead of byte strings.
+"""
+import bisect
+
+# Lines occurring more often than this in a region are not used as anchors
+# (like git's histogram diff); a region without anchors counts as changed
+MAX_CHAIN = 64
+
+
+def split_lines(data):
+    """Lines of data, each keeping its "\\n" (and "\\r" before it)"""
+    parts = bytes(data).split(b"\n")
+    lines = [part + b"\n" for part in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
+
+
+def _longest_rare_run(a, b, a0, a1, b0, b1):
+    """(a start, b start, length) of the common run whose rarest line occurs
+    least often in a[a0:a1], preferring longer runs; None without anchors"""
+    positions = {}
+    for i in range(a0, a1):
+        positions.setdefault(a[i], []).append(i)
+    best = None
+    best_count = MAX_CHAIN + 1
+    bi = b0
+    while bi < b1:
+        next_bi = bi + 1
+        where = positions.get(b[bi], ())
+        if len(where) > best_count or len(where) > MAX_CHAIN:
+            where = ()  # cannot beat the best run, or too common to anchor on
+        for ai in where:
+            start_a, start_b = ai, bi
+            while start_a > a0 and start_b > b0 and a[start_a - 1] == b[start_b - 1]:
+                start_a -= 1
+                start_b -= 1
+            end_a, end_b = ai + 1, bi + 1
+            while end_a < a1 and end_b < b1 and a[end_a] == b[end_b]:
+                end_a += 1
+                end_b += 1
+            count = min(len(positions[a[i]]) for i in range(start_a, end_a))
+            if best is None or count < best_count or (
+                    count == best_count and end_a - start_a > best[2]):
+                best = (start_a, start_b, end_a - start_a)
+                best_count = count
+            next_bi = max(next_bi, end_b)
+        bi = next_bi
+    return best
+
+
+def _unique_anchors(a, b, a0, a1, b0, b1):
+    """Patience diff anchors: [(index in a, index in b)] of the longest
+    increasing run of lines that occur exactly once in both regions"""
+    counts = {}
+    for i in range(a0, a1):
+        count, _ = counts.get(a[i], (0, None))
+        counts[a[i]] = (count + 1, i)
+    in_b = {}
+    for j in range(b0, b1):
+        if counts.get(b[j], (0, None))[0] == 1:
+            in_b[b[j]] = -1 if b[j] in in_b else j
+    pairs = [(counts[line][1], j) for line, j in in_b.items() if j >= 0]
+    pairs.sort()
+    # Longest increasing subsequence of the b indexes (patience sorting)
+    tails = []
+    tail_index = []
+    previous = [None] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pile = bisect.bisect_left(tails, j)
+        if pile == len(tails):
+            tails.append(j)
+            tail_index.append(k)
+        else:
+            tails[pile] = j
+            tail_index[pile] = k
+        previous[k] = tail_index[pile - 1] if pile else None
+    anchors = []
+    k = tail_index[-1] if tail_index else None
+    while k is not None:
+        anchors.append(pairs[k])
+        k = previous[k]
+    return anchors[::-1]
+
+
+def match_lines(a, b):
+    """{index in a: index in b} of lines a diff keeps unchanged.
+
+    Lines unique to both sides anchor the regions in one pass (patience);
+    regions without such lines are split at their rarest common run
+    (histogram).
+    """
+    matched = {}
+    regions = [(0, len(a), 0, len(b))]
+    while regions:
+        a0, a1, b0, b1 = regions.pop()
+        while a0 < a1 and b0 < b1 and a[a0] == b[b0]:
+            matched[a0] = b0
+            a0 += 1
+            b0 += 1
+        while a0 < a1 and b0 < b1 and a[a1 - 1] == b[b1 - 1]:
+            a1 -= 1
+            b1 -= 1
+            matched[a1] = b1
+        if a0 == a1 or b0 == b1:
+            continue
+        anchors = _unique_anchors(a, b, a0, a1, b0, b1)
+        if anchors:
+            for i, j in anchors:
+                matched[i] = j
+            starts = [(a0, b0)] + [(i + 1, j + 1) for i, j in anchors]
+            ends = anchors + [(a1, b1)]
+            regions += [(start_a, end_a, start_b, end_b)
+                        for (start_a, start_b), (end_a, end_b) in zip(starts, ends)
+                        if start_a < end_a and start_b < end_b]
+            continue
+        run = _longest_rare_run(a, b, a0, a1, b0, b1)
+        if run is None:
+            continue
+        start_a, start_b, length = run
+        for offset in range(length):
+            matched[start_a + offset] = start_b + offset
+        regions.append((a0, start_a, b0, start_b))
+        regions.append((start_a + length, a1, start_b + length, b1))
+    return matched
+
+
+def merge_lines(ours, base, theirs):
+    """Three-way merge of one hunk's sections, line by line.
+
+    Returns a list of segments in file order: bytes that merged cleanly,
+    or (ours, base, theirs) bytes of a residual conflict. base is None for
+    the pieces a conflicting chunk was split into (see _split_conflict).
+    """
+    ids = {}
+    lines = [split_lines(section) for section in (ours, base, theirs)]
+    o, b, t = [[ids.setdefault(line, len(ids)) for line in section] for section in lines]
+    to_ours = match_lines(b, o)
+    to_theirs = match_lines(b, t)
+
+    segments = []
+    prev_b = prev_o = prev_t = 0
+    # Base lines both sides kept are sync points; the chunks between them
+    # changed on one side (take it), identically on both, or really conflict
+    syncs = [(i, to_ours[i], to_theirs[i]) for i in range(len(b))
+             if i in to_ours and i in to_theirs]
+    for sync_b, sync_o, sync_t in syncs + [(len(b), len(o), len(t))]:
+        chunk_o, chunk_b, chunk_t = o[prev_o:sync_o], b[prev_b:sync_b], t[prev_t:sync_t]
+        if chunk_o == chunk_b:
+            segments += lines[2][prev_t:sync_t]
+        elif chunk_t == chunk_b or chunk_o == chunk_t:
+            segments += lines[0][prev_o:sync_o]
+        else:
+            segments += _split_conflict(
+                chunk_o, chunk_t, lines[0][prev_o:sync_o], lines[1][prev_b:sync_b],
+                lines[2][prev_t:sync_t],
+            )
+        if sync_b < len(b):
+            segments.append(lines[0][sync_o])
+        prev_b, prev_o, prev_t = sync_b + 1, sync_o + 1, sync_t + 1
+    return _join_clean(segments)
+
+
+def _split_conflict(o, t, ours_lines, base_lines, theirs_lines):
+    """Segments of one chunk both sides changed differently.
+
+    Lines both sides ended up with (e.g. the same entries of a rewritten
+    import block) merge; what differs between them stays in conflict. Once
+    split, the pieces have no base of their own, like in git's zealous
+    merge without diff3.
+    """
+    matched = match_lines(o, t)
+    if not matched:
+        return [tuple(b"".join(section) for section in (ours_lines, base_lines, theirs_lines))]
+    segments = []
+    prev_o = prev_t = 0
+    for index_o in sorted(matched) + [len(o)]:
+        index_t = matched.get(index_o, len(t))
+        if prev_o < index_o or prev_t < index_t:
+            segments.append((b"".join(ours_lines[prev_o:index_o]), None,
+                             b"".join(theirs_lines[prev_t:index_t])))
+        if index_o < len(o):
+            segments.append(ours_lines[index_o])
+        prev_o, prev_t = index_o + 1, index_t + 1
+    return segments
+
+
+def _join_clean(segments):
+    """Merge runs of clean lines into single bytes segments"""
+    joined = []
+    clean = []
+    for segment in segments:
+        if isinstance(segment, bytes):
+            clean.append(segment)
+            continue
+        if clean:
+            joined.append(b"".join(clean))
+            clean = []
+        joined.append(segment)
+    if clean:
+        joined.append(b"".join(clean))
+    return joined
+
+
+def conflict_lines(ours, theirs):
+    """Size of a conflict as the number of lines on both sides"""
+    return len(split_lines(ours)) + len(split_lines(theirs))
@@ -0,0 +1,157 @@
+"""Find leftover conflict markers without decoding any file.
+
+Files are memory-mapped and searched for `<<<<<<<` / `>>>>>>>` at the start
+of a line (followed by a space or the end of the line, as git writes
+them); line numbers are only counted for files that have markers. Big
+path lists are spread over a process pool. Binary files are skipped.
+
+check_markers guards the integration flows: before a merge commit, and
+before the target is moved to the integration result, it scans the paths
+that changed (or the whole tree) and raises if any marker is left.
+"""
+import mmap
+import os
+from collections import namedtuple
+from conflict_model import CONFLICT_END, CONFLICT_START, MARKER_LENGTH
+from file_classifier import SNIFF_SIZE, is_binary
+from git_utils import git, run_git
+
+# Below this many files the pool costs more than it saves
+PARALLEL_THRESHOLD = 2000
+
+# lines: 1-based line numbers of every start and end marker
+MarkerHit = namedtuple("MarkerHit", ["path", "lines", "hunks"])
+
+
+def find_markers(buf):
+    """(lines, hunks) of the conflict markers in buf, or None without any"""
+    found = []
+    for kind, marker in ((0, CONFLICT_START), (1, CONFLICT_END)):
+        pos = 0 if buf[:MARKER_LENGTH] == marker else _next_line(buf, marker, 0)
+        while pos >= 0:
+            after = buf[pos + MARKER_LENGTH:pos + MARKER_LENGTH + 1]
+            if after in (b"", b" ", b"\n", b"\r"):
+                found.append((pos, kind))
+            pos = _next_line(buf, marker, pos)
+    if not found:
+        return None
+    found.sort()
+    lines = []
+    line = 1
+    last = 0
+    for pos, _ in found:
+        line += buf[last:pos].count(b"\n")
+        last = pos
+        lines.append(line)
+    starts = sum(1 for _, kind in found if kind == 0)
+    return lines, max(starts, len(found) - starts)
+
+
+def _next_line(buf, marker, pos):
+    """Start of the next line after pos that begins with marker, or -1"""
+    found = buf.find(b"\n" + marker, pos)
+    return found if found < 0 else found + 1
+
+
+def scan_file(path, name=None):
+    """MarkerHit for one file (reported as name), or None if it is clean,
+    binary, empty or gone"""
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                if is_binary(buf[:SNIFF_SIZE]):
+                    return None
+                markers = find_markers(buf)
+    except (OSError, ValueError):
+        return None
+    if markers is None:
+        return None
+    return MarkerHit(name or path, *markers)
+
+
+def scan_paths(names, root=None, workers=None):
+    """MarkerHits of the files named (relative to root), sorted by path.
+
+    workers=None uses one process per CPU once there are enough files.
+    """
+    names = list(names)
+    paths = [os.path.join(root, name) for name in names] if root else names
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(names) < PARALLEL_THRESHOLD:
+        hits = map(scan_file, paths, names)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            hits = list(pool.map(scan_file, paths, names,
+                                 chunksize=max(1, len(names) // (workers * 8))))
+    return sorted((hit for hit in hits if hit), key=lambda hit: hit.path)
+
+
+def changed_paths(base="HEAD"):
+    """Paths (relative to the top level) whose working tree file differs from base"""
+    result = run_git(["diff", "--name-only", "--no-renames", "-z", base, "--"])
+    return [name for name in result.stdout.split("\0") if name]
+
+
+def tree_paths():
+    """Every tracked or untracked, not ignored path (relative to the top level)"""
+    result = run_git(["ls-files", "-z", "--full-name", "--cached", "--others",
+                      "--exclude-standard", "--", ":/"])
+    return list(dict.fromkeys(name for name in result.stdout.split("\0") if name))
+
+
+def scan_tree(base=None, workers=None):
+    """MarkerHits in the working tree: files changed since base, or all of them"""
+    names = tree_paths() if base is None else changed_paths(base)
+    return scan_paths(names, git().toplevel(), workers)
+
+
+def scan_commit(commit, base=None):
+    """MarkerHits in the blobs of commit: those changed since base, or all"""
+    if base is None:
+        args = ["ls-tree", "-r", "--name-only", "-z", commit]
+    else:
+        args = ["diff", "--name-only", "--no-renames", "--diff-filter=d", "-z", base, commit]
+    hits = []
+    for name in run_git(args).stdout.split("\0"):
+        obj = git().read_object(f"{commit}:{name}") if name else None
+        if obj is None or obj[0] != "blob" or is_binary(obj[1][:SNIFF_SIZE]):
+            continue
+        markers = find_markers(obj[1])
+        if markers is not None:
+            hits.append(MarkerHit(name, *markers))
+    return hits
+
+
+def describe(hits, limit=10):
+    """Human readable lines for a list of MarkerHits"""
+    lines = []
+    for hit in hits[:limit]:
+        at = ", ".join(str(line) for line in hit.lines[:8])
+        more = ", ..." if len(hit.lines) > 8 else ""
+        lines.append(f"   {hit.path}: {hit.hunks} hunk(s), line(s) {at}{more}")
+    if len(hits) > limit:
+        lines.append(f"   ... and {len(hits) - limit} more file(s)")
+    return lines
+
+
+def check_markers(base, whole_tree=False, commit=None, workers=None):
+    """Raise if conflict markers are left in what changed since base.
+
+    Scans the working tree, or the blobs of commit when given (the
+    in-memory engine has no checkout); whole_tree scans every path.
+    """
+    base = None if whole_tree else base
+    if commit is None:
+        hits = scan_tree(base, workers)
+    else:
+        hits = scan_commit(commit, base)
+    if hits:
+        raise RuntimeError(
+            f"Conflict markers left in {len(hits)} file(s); merge left in progress\n"
+            + "\n".join(describe(hits))
+        )
@@ -0,0 +1,214 @@
+"""Checkout-free merges built on `git merge-tree --write-tree`.
+
+Both sides are merged inside the object database: conflicted blobs are
+read through the cat-file batch pipe, resolved in memory, written back with
+hash-object and assembled into a tree using a throwaway index file. The
+user's working tree and real index are never touched.
+"""
+import os
+import tempfile
+from conflict_model import DEFAULT_STRATEGY
+from conflict_solver import FileResult, cache_counts, failed_result, resolve_bytes
+from file_classifier import REGENERATE, SNIFF_SIZE, STRUCTURED, classify, fallback_plan
+from git_utils import DIFF3_CONFIG, git, run_git
+
+
+def rev_parse(ref):
+    """Commit id for ref, or None if it does not resolve"""
+    result = git().run(["rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"])
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
+
+
+def is_ancestor(ancestor, descendant):
+    return git().run(["merge-base", "--is-ancestor", ancestor, descendant]).returncode == 0
+
+
+def merge_tree(ours, theirs):
+    """Merge two commits into a tree.
+
+    Returns (tree, conflicts) where conflicts maps each conflicted path to
+    {stage: (mode, oid)} with stages 1/2/3 for base/ours/theirs.
+    """
+    result = git().run(
+        DIFF3_CONFIG + ["merge-tree", "--write-tree", "-z", ours, theirs], text=False
+    )
+    if result.returncode not in (0, 1):
+        error_msg = os.fsdecode(result.stderr).strip() or "Unknown error"
+        raise RuntimeError(f"Merge failed: {error_msg}")
+
+    records = result.stdout.split(b"\0")
+    tree = records[0].decode()
+    conflicts = {}
+    if result.returncode == 1:
+        for record in records[1:]:
+            if not record:
+                break  # blank record ends the conflicted file list
+            info, path = record.split(b"\t", 1)
+            mode, oid, stage = info.decode().split()
+            conflicts.setdefault(os.fsdecode(path), {})[int(stage)] = (mode, oid)
+    return tree, conflicts
+
+
+def hash_blob(data):
+    """Write data as a blob object and return its id"""
+    result = git().run(["hash-object", "-w", "--stdin"], input=data, text=False)
+    if result.returncode != 0:
+        raise RuntimeError(f"Git command failed: {os.fsdecode(result.stderr).strip()}")
+    return result.stdout.decode().strip()
+
+
+def hash_file(path):
+    """Write a file as a blob object without reading it into memory"""
+    result = git().run(["hash-object", "-w", "--", path])
+    if result.returncode != 0:
+        raise RuntimeError(f"Git command failed: {result.stderr.strip()}")
+    return result.stdout.strip()
+
+
+def merge_structured_blob(path, stages):
+    """(mode, oid, size, format) of a JSON/YAML/TOML path merged entry by
+    entry from its stages; raises when it cannot be"""
+    from structured_merge import merge_stages
+
+    fd, tmp_name = tempfile.mkstemp(prefix="git-solver-structured-")
+    os.close(fd)
+    try:
+        kind = merge_stages(path, stages, tmp_name)
+        return stages[2][0], hash_file(tmp_name), os.path.getsize(tmp_name), kind
+    finally:
+        os.remove(tmp_name)
+
+
+def write_tree(base_tree, updates):
+    """Return a tree equal to base_tree with (mode, oid, path) updates applied"""
+    fd, index_file = tempfile.mkstemp(prefix="git-solver-index-")
+    os.close(fd)
+    os.remove(index_file)  # read-tree wants to create the index itself
+    env = {"GIT_INDEX_FILE": index_file}
+    try:
+        steps = [
+            (["read-tree", base_tree], None),
+            (["update-index", "-z", "--index-info"], b"".join(
+                f"{mode} {oid}\t".encode() + os.fsencode(path) + b"\0"
+                for mode, oid, path in updates
+            )),
+            (["write-tree"], None),
+        ]
+        for args, stdin in steps:
+            result = git().run(args, input=stdin, text=False, env=env)
+            if result.returncode != 0:
+                error_msg = os.fsdecode(result.stderr).strip() or "Unknown error"
+                raise RuntimeError(f"Git command failed: {error_msg}")
+        return result.stdout.decode().strip()
+    finally:
+        if os.path.exists(index_file):
+            os.remove(index_file)
+
+
+def commit_tree(tree, parents, message):
+    args = ["commit-tree", tree, "-m", message]
+    for parent in parents:
+        args += ["-p", parent]
+    return run_git(args).stdout.strip()
+
+
+def resolve_tree_conflicts(tree, conflicts, cache=None, strategy=DEFAULT_STRATEGY):
+    """Resolve conflicted blobs of a merge-tree result in memory.
+
+    Returns (tree, results) with results being one FileResult per path.
+    Paths classified as binary, generated or lockfiles take one side's
+    blob as is; paths git left without a blob (modify/delete) keep git's
+    choice otherwise. JSON/YAML/TOML paths are merged entry by entry first
+    and fall back to the text strategy when that fails.
+    """
+    blobs = {}
+
+    def read_head(path):
+        obj = git().read_object(f"{tree}:{path}")
+        blobs[path] = obj
+        return obj[1][:SNIFF_SIZE] if obj else b""
+
+    updates = []
+    results = []
+    notes = {}
+    for plan in classify(sorted(conflicts), strategy, read_head):
+        path = plan.path
+        stages = conflicts[path]
+        if plan.action == STRUCTURED:
+            try:
+                mode, oid, size, kind = merge_structured_blob(path, stages)
+                updates.append((mode, oid, path))
+                results.append(FileResult(path, 0, size, None, 0, 0, STRUCTURED, (), kind))
+                continue
+            except Exception as e:  # any plugin failure falls back to the text strategy
+                plan = fallback_plan(plan, e)
+                notes[path] = f"structured merge failed: {e}"
+        try:
+            if plan.action != "text":
+                side = 2 if plan.action in ("ours", REGENERATE) else 3
+                if side in stages:
+                    mode, oid = stages[side]
+                    size = git().object_info(oid)[2]
+                else:  # that side deleted the file
+                    mode, oid, size = "0", "0" * len(stages[5 - side][1]), 0
+                updates.append((mode, oid, path))
+                results.append(FileResult(path, 0, size, None, 0, 0, plan.action))
+                continue
+
+            obj = blobs[path] if path in blobs else git().read_object(f"{tree}:{path}")
+            if obj is None or obj[0] != "blob":
+                results.append(FileResult(path, 0, 0, None, 0, 0))
+                continue
+            hits, misses = cache_counts(cache)
+            shrink = []
+            hunks, resolved = resolve_bytes(obj[1], cache, plan.strategy, shrink)
+            if hunks:
+                mode = (stages.get(2) or stages.get(3) or stages[1])[0]
+                updates.append((mode, hash_blob(resolved), path))
+            hits_after, misses_after = cache_counts(cache)
+            results.append(FileResult(
+                path, hunks, len(resolved), None, hits_after - hits, misses_after - misses,
+                "text", tuple(shrink)
+            ))
+        except Exception as e:
+            results.append(failed_result(path, e))
+
+    if updates:
+        tree = write_tree(tree, updates)
+    results = [r._replace(note=notes[r.path]) if r.path in notes else r for r in results]
+    return tree, results
+
+
+def merge_commits(ours, theirs, message, cache=None, strategy=DEFAULT_STRATEGY):
+    """Merge commit theirs into commit ours without a checkout.
+
+    Fast-forwards when possible. Returns (commit, results) where results
+    lists the FileResult of every resolved path.
+    """
+    if is_ancestor(theirs, ours):
+        return ours, []
+    if is_ancestor(ours, theirs):
+        return theirs, []
+
+    tree, conflicts = merge_tree(ours, theirs)
+    tree, results = resolve_tree_conflicts(tree, conflicts, cache, strategy)
+    if any(result.error for result in results):
+        return None, results
+    return commit_tree(tree, [ours, theirs], message), results
+
+
+def octopus_commit(ours, theirs_list, message):
+    """One merge commit of ours with several commits, built from pairwise
+    merge-tree steps. Returns None if any step conflicts."""
+    current = ours
+    tree = None
+    for theirs in theirs_list:
+        tree, conflicts = merge_tree(current, theirs)
+        if conflicts:
+            return None
+        current = commit_tree(tree, [current, theirs], message)
+    if tree is None:
+        return ours
+    return commit_tree(tree, [ours] + list(theirs_list), message)
@@ -0,0 +1,121 @@
+"""Conflict-aware ordering for integrating many branches at once.
+
+Each branch's changed paths are listed against its merge base with the
+target (one `git diff-tree` per branch, no checkout). Two branches are
+likely to conflict when they touch the same paths, so:
+
+- branches already contained in the target are skipped;
+- branches whose paths overlap no other branch, and none of the target's
+  own changes since the merge base, are merged together in one octopus
+  merge;
+- the rest are merged one at a time, always picking next the branch that
+  overlaps least with what has been merged so far.
+"""
+import os
+from itertools import combinations
+from git_utils import git
+from merge_engine import rev_parse
+
+
+class BranchChanges:
+    """Paths a branch changed since its merge base with the target"""
+
+    __slots__ = ("label", "ref", "commit", "base", "paths", "target_paths")
+
+    def __init__(self, label, ref, commit, base, paths, target_paths):
+        self.label = label
+        self.ref = ref
+        self.commit = commit
+        self.base = base
+        self.paths = paths
+        # What the target changed since the same merge base
+        self.target_paths = target_paths
+
+    @property
+    def merged(self):
+        return self.commit == self.base
+
+
+class MergePlan:
+    """Branches grouped into merge steps"""
+
+    __slots__ = ("merged", "clean", "ordered", "overlaps")
+
+    def __init__(self, merged, clean, ordered, overlaps):
+        self.merged = merged
+        self.clean = clean
+        self.ordered = ordered
+        # {(label_a, label_b): shared path count} for every overlapping pair
+        self.overlaps = overlaps
+
+    def groups(self):
+        """(label, ref) groups in merge order; a group of several is one octopus merge"""
+        groups = [[(c.label, c.ref) for c in self.clean]] if self.clean else []
+        return groups + [[(c.label, c.ref)] for c in self.ordered]
+
+
+def merge_base(ours, theirs):
+    result = git().run(["merge-base", ours, theirs])
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def changed_paths(old, new):
+    """Paths that differ between two commits"""
+    result = git().run(
+        ["diff-tree", "-r", "--name-only", "--no-renames", "-z", old, new], text=False
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Git command failed: {os.fsdecode(result.stderr).strip()}")
+    return frozenset(os.fsdecode(path) for path in result.stdout.split(b"\0") if path)
+
+
+def collect_changes(target_commit, branches):
+    """BranchChanges for each (label, ref) relative to target_commit"""
+    target_paths = {}
+    changes = []
+    for label, ref in branches:
+        commit = rev_parse(ref)
+        if commit is None:
+            raise RuntimeError(f"Branch '{ref}' does not point at a commit")
+        # Unrelated or too-shallow histories: compare against the target itself
+        base = merge_base(target_commit, commit) or target_commit
+        if base not in target_paths:
+            target_paths[base] = changed_paths(base, target_commit)
+        changes.append(BranchChanges(
+            label, ref, commit, base, changed_paths(base, commit), target_paths[base]
+        ))
+    return changes
+
+
+def overlaps(changes):
+    """Shared path counts for every pair of branches that touch the same paths"""
+    pairs = {}
+    for a, b in combinations(changes, 2):
+        shared = len(a.paths & b.paths)
+        if shared:
+            pairs[(a.label, b.label)] = shared
+    return pairs
+
+
+def plan_merges(target_commit, branches):
+    """Order (label, ref) branches for merging into target_commit"""
+    changes = collect_changes(target_commit, branches)
+    merged = [c for c in changes if c.merged]
+    pending = [c for c in changes if not c.merged]
+    pairs = overlaps(pending)
+
+    overlapping = {label for pair in pairs for label in pair}
+    clean = [c for c in pending
+             if c.label not in overlapping and not c.paths & c.target_paths]
+    remaining = [c for c in pending if c not in clean]
+
+    ordered = []
+    merged_paths = set()
+    while remaining:
+        best = min(remaining, key=lambda c: (
+            len(c.paths & merged_paths) + len(c.paths & c.target_paths), len(c.paths)
+        ))
+        remaining.remove(best)
+        ordered.append(best)
+        merged_paths |= best.paths
+    return MergePlan(merged, clean, ordered, pairs)
@@ -0,0 +1,270 @@
+"""A small asyncio step graph for overlapping independent git work.
+
+Each step names the steps it depends on; a step starts as soon as those
+have finished, so a fetch can run while the working tree is stashed and
+checked out. Coroutine steps run git through
+`asyncio.create_subprocess_exec`, plain functions run in the loop's thread
+pool. Steps can also wait on another step from inside (Step.wait), e.g.
+only when a branch turns out not to exist locally, and can add further
+steps while the graph runs.
+
+After a run, critical_path() is the chain of steps that decided the wall
+time and format_report() breaks it down per phase.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import tracing
+from git_utils import git, git_executable
+from repo_state import RepoState
+
+
+class StepSkipped(RuntimeError):
+    """A step did not run because a step it needed failed"""
+
+
+class Step:
+    """One node of a Pipeline and its timing"""
+
+    __slots__ = ("pipeline", "name", "action", "deps", "phase", "waited",
+                 "start", "end", "task")
+
+    def __init__(self, pipeline, name, action, deps, phase):
+        self.pipeline = pipeline
+        self.name = name
+        self.action = action
+        self.deps = list(deps)
+        self.phase = phase or name.split(":", 1)[0]
+        # Every step this one actually waited for, including Step.wait calls
+        self.waited = []
+        self.start = None
+        self.end = None
+        self.task = None
+
+    @property
+    def seconds(self):
+        return self.end - self.start if self.end is not None else 0.0
+
+    async def wait(self, name):
+        """Wait for another step and return its result"""
+        if name not in self.waited:
+            self.waited.append(name)
+        return await self.pipeline._wait(name)
+
+
+class Pipeline:
+    """Steps with explicit dependencies, run concurrently on one event loop"""
+
+    def __init__(self):
+        self.steps = {}
+        self.results = {}
+        self.error = None
+        self.started = None
+        self.finished = None
+        self._loop = None
+
+    def add(self, name, action, deps=(), phase=None):
+        """Add a step; action(step) is a coroutine function or a plain function.
+
+        phase groups steps in the report and defaults to the part of name
+        before ':' ('merge:your' is in phase 'merge').
+        """
+        if name in self.steps:
+            raise RuntimeError(f"Pipeline step '{name}' added twice")
+        step = self.steps[name] = Step(self, name, action, deps, phase)
+        if self._loop is not None:
+            step.task = self._loop.create_task(self._run_step(step))
+        return step
+
+    def run(self):
+        """Run every step, returning {name: result}; raises the first failure"""
+        loop = _new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self.started = time.perf_counter()
+        try:
+            loop.run_until_complete(self._run_all())
+        finally:
+            self.finished = time.perf_counter()
+            self._loop = None
+            asyncio.set_event_loop(None)
+            loop.close()
+        if self.error is not None:
+            raise self.error
+        return self.results
+
+    async def _run_all(self):
+        for step in self.steps.values():
+            step.task = self._loop.create_task(self._run_step(step))
+        # Steps may add more steps while running, so wait until none is left
+        while True:
+            pending = [step.task for step in self.steps.values() if not step.task.done()]
+            if not pending:
+                return
+            await asyncio.wait(pending)
+
+    async def _wait(self, name):
+        step = self.steps.get(name)
+        if step is None:
+            raise RuntimeError(f"Unknown pipeline step '{name}'")
+        await asyncio.wait([step.task])
+        if name not in self.results:
+            raise StepSkipped(name)
+        return self.results[name]
+
+    async def _run_step(self, step):
+        try:
+            for name in step.deps:
+                await step.wait(name)
+            if self.error is not None:
+                return  # something else failed; start nothing new
+            step.start = time.perf_counter()
+            try:
+                if asyncio.iscoroutinefunction(step.action):
+                    result = await step.action(step)
+                else:
+                    result = await self._loop.run_in_executor(None, step.action, step)
+            finally:
+                step.end = time.perf_counter()
+                tracer = tracing.current()
+                if tracer is not None:
+                    tracer.add("span", step.name, step.start, step.end, phase=step.phase)
+            self.results[step.name] = result
+        except StepSkipped:
+            pass
+        except Exception as e:
+            if self.error is None:
+                self.error = e
+
+    def critical_path(self):
+        """Steps on the longest dependency chain, ending with the last to finish"""
+        done = [step for step in self.steps.values() if step.end is not None]
+        if not done:
+            return []
+        step = max(done, key=lambda s: s.end)
+        path = [step]
+        while True:
+            before = [self.steps[name] for name in step.waited
+                      if self.steps[name].end is not None]
+            if not before:
+                break
+            step = max(before, key=lambda s: s.end)
+            path.append(step)
+        return path[::-1]
+
+    def phase_times(self):
+        """{phase: (seconds on the critical path, seconds of all its steps)}"""
+        times = {}
+        for step in self.steps.values():
+            critical, busy = times.get(step.phase, (0.0, 0.0))
+            times[step.phase] = (critical, busy + step.seconds)
+        for step in self.critical_path():
+            critical, busy = times[step.phase]
+            times[step.phase] = (critical + step.seconds, busy)
+        return times
+
+    def format_report(self):
+        """Human readable wall time, overlap and critical path per phase"""
+        if self.started is None or self.finished is None:
+            return []
+        wall = self.finished - self.started
+        busy = sum(step.seconds for step in self.steps.values())
+        lines = [f"⏱  Pipeline: {wall:.2f}s wall for {busy:.2f}s of steps "
+                 f"({busy / wall if wall else 1:.2f}x overlap)"]
+        # Steps that had nothing to do (e.g. a clean merge's commit) are left out
+        path = [step for step in self.critical_path() if step.seconds >= 0.001]
+        if path:
+            chain = " → ".join(f"{step.name} {step.seconds:.2f}s" for step in path)
+            lines.append(f"   Critical path: {chain}")
+        ranked = sorted(self.phase_times().items(), key=lambda item: item[1], reverse=True)
+        for phase, (critical, total) in ranked:
+            share = critical / wall * 100 if wall else 0
+            lines.append(f"   {phase:<10} {critical:>7.2f}s critical ({share:>3.0f}%)"
+                         f"  {total:>7.2f}s total")
+        return lines
+
+
+def _new_event_loop():
+    # Subprocesses need the proactor loop on Windows (the default from 3.8)
+    if sys.platform == "win32":
+        return asyncio.ProactorEventLoop()
+    return asyncio.new_event_loop()
+
+
+class GitProcess:
+    """A git started by start_git; communicate() waits for it and records
+    the call like git_async does"""
+
+    def __init__(self, process, args, start):
+        self.process = process
+        self.args = args
+        self.start = start
+
+    @property
+    def stdin(self):
+        return self.process.stdin
+
+    @property
+    def returncode(self):
+        return self.process.returncode
+
+    async def communicate(self, input=None):
+        stdout, stderr = await self.process.communicate(input)
+        git().invalidate(self.args)
+        tracing.record_command(["git"] + list(self.args), self.start, self.process.returncode,
+                               len(stdout or b"") + len(stderr or b""))
+        return stdout, stderr
+
+
+async def start_git(args, stdin=None):
+    """Start git without waiting for it; stdout is discarded, stderr piped"""
+    backend = git()
+    backend.invalidate(args)
+    start = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        git_executable(), *args, cwd=backend.cwd,
+        stdin=stdin, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    return GitProcess(process, args, start)
+
+
+async def git_async(args, input=None, text=True):
+    """Run git with an argument list on the event loop, returning a CompletedProcess"""
+    backend = git()
+    backend.invalidate(args)
+    start = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        git_executable(), *args, cwd=backend.cwd,
+        stdin=subprocess.DEVNULL if input is None else subprocess.PIPE,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    if text and input is not None:
+        input = input.encode()
+    stdout, stderr = await process.communicate(input)
+    # Another step may have reloaded the ref index or status while this ran
+    backend.invalidate(args)
+    tracing.record_command(["git"] + list(args), start, process.returncode,
+                           len(stdout) + len(stderr))
+    if text:
+        stdout = stdout.decode(errors="replace")
+        stderr = stderr.decode(errors="replace")
+    return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+
+
+async def run_git_async(args):
+    """git_async that raises on failure, like git_utils.run_git"""
+    result = await git_async(args)
+    if result.returncode != 0:
+        error_msg = result.stderr.strip() or result.stdout.strip() or "Unknown error"
+        raise RuntimeError(f"Git command failed: {error_msg}")
+    return result
+
+
+async def status_async():
+    """RepoState from a `git status` run on the event loop"""
+    result = await git_async(["status", "--porcelain=v2", "--branch", "-z"], text=False)
+    if result.returncode != 0:
+        raise RuntimeError(f"Git command failed: {os.fsdecode(result.stderr).strip()}")
+    return RepoState([os.fsdecode(record) for record in result.stdout.split(b"\0") if record])
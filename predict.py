@@ -0,0 +1,183 @@
+"""Dry-run conflict prediction that only reads the object database.
+
+`git merge-tree --write-tree` merges two commits without touching the
+working tree, the index or any ref. The conflicted blobs of its result
+tree are read through the cat-file batch pipe and their hunks counted, so
+one branch pair costs one merge-tree call. Results are cached per pair of
+commit ids under <git dir>/git-solver/, so polling the same branches again
+(e.g. from CI on every push) is free until one of them moves.
+"""
+import json
+import os
+import time
+from itertools import combinations
+
+import click
+
+from conflict_model import parse_conflicts
+from git_utils import branch_exists, get_common_dir, git, is_git_repo
+
+CACHE_FILE = os.path.join("git-solver", "predictions.json")
+MAX_CACHED = 2000
+
+
+class Prediction:
+    """Predicted outcome of merging two commits"""
+
+    __slots__ = ("ours", "theirs", "ours_commit", "theirs_commit", "paths",
+                 "conflicted_bytes", "seconds", "cached")
+
+    def __init__(self, ours, theirs, ours_commit, theirs_commit, paths,
+                 conflicted_bytes, seconds, cached=False):
+        self.ours = ours
+        self.theirs = theirs
+        self.ours_commit = ours_commit
+        self.theirs_commit = theirs_commit
+        # {path: hunk count}; 0 for conflicts without markers (modify/delete, binary)
+        self.paths = paths
+        self.conflicted_bytes = conflicted_bytes
+        # Time merge-tree and the hunk count took when first measured
+        self.seconds = seconds
+        self.cached = cached
+
+    @property
+    def hunks(self):
+        return sum(self.paths.values())
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _cache_path():
+    return os.path.join(get_common_dir(), CACHE_FILE)
+
+
+def load_cache():
+    try:
+        with open(_cache_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache):
+    """Write the cache, keeping the MAX_CACHED most recently used pairs"""
+    if len(cache) > MAX_CACHED:
+        recent = sorted(cache.items(), key=lambda item: item[1]["used"], reverse=True)
+        cache = dict(recent[:MAX_CACHED])
+    path = _cache_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp, path)
+
+
+def pair_key(ours_commit, theirs_commit):
+    # Which paths conflict does not depend on the merge direction
+    return "..".join(sorted((ours_commit, theirs_commit)))
+
+
+def measure(ours_commit, theirs_commit):
+    """Merge two commits in the object database and count conflict hunks"""
+    from merge_engine import merge_tree
+
+    start = time.perf_counter()
+    tree, conflicts = merge_tree(ours_commit, theirs_commit)
+    paths = {}
+    size = 0
+    for path in sorted(conflicts):
+        obj = git().read_object(f"{tree}:{path}")
+        if obj is None or obj[0] != "blob":
+            paths[path] = 0
+            continue
+        paths[path] = len(parse_conflicts(obj[1]))
+        size += len(obj[1])
+    return {"paths": paths, "conflicted_bytes": size,
+            "seconds": time.perf_counter() - start}
+
+
+def _commit(name):
+    from merge_engine import rev_parse
+
+    ref = branch_exists(name)
+    commit = ref and rev_parse(ref)
+    if not commit:
+        raise RuntimeError(f"Branch '{name}' not found locally or on origin")
+    return commit
+
+
+def predict(names, target="main", between_branches=True, use_cache=True):
+    """Predictions for merging each branch into target and, optionally,
+    for every pair of branches"""
+    commits = {name: _commit(name) for name in [target] + list(names)}
+    pairs = [(target, name) for name in names if name != target]
+    if between_branches:
+        pairs += list(combinations([name for name in names if name != target], 2))
+
+    cache = load_cache() if use_cache else {}
+    predictions = []
+    now = time.time()
+    for ours, theirs in pairs:
+        key = pair_key(commits[ours], commits[theirs])
+        entry = cache.get(key)
+        cached = entry is not None
+        if not cached:
+            entry = cache[key] = measure(commits[ours], commits[theirs])
+        entry["used"] = now
+        predictions.append(Prediction(
+            ours, theirs, commits[ours], commits[theirs], entry["paths"],
+            entry["conflicted_bytes"], entry["seconds"], cached
+        ))
+    if use_cache and pairs:
+        save_cache(cache)
+    return predictions
+
+
+def format_predictions(predictions, target="main"):
+    """Human readable lines for a list of predictions"""
+    lines = []
+    for prediction in predictions:
+        arrow = "←" if prediction.ours == target else "↔"
+        source = " (cached)" if prediction.cached else ""
+        title = f"{prediction.ours} {arrow} {prediction.theirs}"
+        if not prediction.paths:
+            lines.append(f"✅ {title}: clean ({prediction.seconds:.2f}s){source}")
+            continue
+        lines.append(
+            f"⚠️  {title}: {len(prediction.paths)} conflicted file(s), "
+            f"{prediction.hunks} hunk(s), {prediction.conflicted_bytes / 1024:.1f} KB "
+            f"to resolve ({prediction.seconds:.2f}s){source}"
+        )
+        for path, hunks in prediction.paths.items():
+            lines.append(f"     {path} ({hunks} hunk(s))" if hunks else f"     {path} (no markers)")
+    conflicting = sum(1 for prediction in predictions if prediction.paths)
+    lines.append(f"🔮 {len(predictions)} merge(s) checked, {conflicting} with conflicts")
+    return lines
+
+
+@click.command("predict")
+@click.argument("branches", nargs=-1, required=True)
+@click.option("--target", default="main", show_default=True,
+              help="Branch the others would be merged into")
+@click.option("--target-only", is_flag=True,
+              help="Only check each branch against the target, not against each other")
+@click.option("--no-cache", is_flag=True, help="Recompute instead of using saved predictions")
+@click.option("--json", "as_json", is_flag=True, help="Print the predictions as JSON")
+@click.option("--exit-code", is_flag=True, help="Exit with 1 when any merge would conflict")
+def predict_command(branches, target, target_only, no_cache, as_json, exit_code):
+    """Predict the conflicts of merging BRANCHES without touching the repository"""
+    if not is_git_repo():
+        raise click.ClickException("Current directory is not a git repository")
+    try:
+        predictions = predict(branches, target, not target_only, not no_cache)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+    if as_json:
+        click.echo(json.dumps([p.as_dict() for p in predictions], indent=2))
+    else:
+        for line in format_predictions(predictions, target):
+            click.echo(line)
+    if exit_code and any(prediction.paths for prediction in predictions):
+        raise SystemExit(1)
@@ -0,0 +1,89 @@
+"""In-memory index of branches and tags built from one `git for-each-ref`.
+
+Lookups are dictionary hits instead of a `rev-parse` subprocess per probe.
+The index is cached on the repository's GitBackend and dropped whenever a
+git command that can move refs runs through it (fetch, commit, merge...).
+"""
+import fnmatch
+import re
+
+REF_FORMAT = "%(refname)%00%(objectname)"
+REF_PREFIXES = ("refs/heads/", "refs/remotes/", "refs/tags/")
+
+# Things rev-parse understands that are not plain ref names
+_REVISION_SYNTAX = re.compile(r"[~^:@]|^[0-9a-fA-F]{7,64}$")
+
+
+class RefIndex:
+    """Branch and tag names mapped to object ids"""
+
+    __slots__ = ("local", "remote", "tags")
+
+    def __init__(self, rows):
+        self.local = {}
+        self.remote = {}
+        self.tags = {}
+        for refname, oid in rows:
+            if refname.startswith("refs/heads/"):
+                self.local[refname[len("refs/heads/"):]] = oid
+            elif refname.startswith("refs/remotes/"):
+                name = refname[len("refs/remotes/"):]
+                if not name.endswith("/HEAD"):
+                    self.remote[name] = oid
+            elif refname.startswith("refs/tags/"):
+                self.tags[refname[len("refs/tags/"):]] = oid
+
+    @classmethod
+    def load(cls, backend):
+        return cls(backend.for_each_ref(REF_FORMAT, REF_PREFIXES))
+
+    def resolve(self, branch, remote="origin"):
+        """The ref to merge for branch: 'branch', 'origin/branch' or None"""
+        if branch in self.local:
+            return branch
+        remote_name = f"{remote}/{branch}"
+        if remote_name in self.remote:
+            return remote_name
+        if branch in self.remote or branch in self.tags:
+            return branch
+        return None
+
+    def is_local(self, branch):
+        return branch in self.local
+
+    def is_remote(self, name):
+        return name in self.remote
+
+    def names(self, kind="all", pattern=None):
+        """Sorted branch names of a kind ('local', 'remote' or 'all'),
+        optionally filtered by a glob or substring pattern"""
+        names = []
+        if kind in ("local", "all"):
+            names += sorted(self.local)
+        if kind in ("remote", "all"):
+            names += sorted(self.remote)
+        if pattern:
+            names = [n for n in names if _matches(n, pattern)]
+        return names
+
+
+def _matches(name, pattern):
+    """Glob or substring match against the full name or, for remote
+    branches, the name without its remote"""
+    candidates = (name, name.split("/", 1)[-1])
+    if any(ch in pattern for ch in "*?["):
+        return any(fnmatch.fnmatchcase(candidate, pattern) for candidate in candidates)
+    return pattern in name
+
+
+def page(items, number=1, size=50):
+    """Slice out 1-based page number, returning (items, total_pages)"""
+    size = max(1, size)
+    total_pages = max(1, -(-len(items) // size))
+    number = min(max(1, number), total_pages)
+    return items[(number - 1) * size:number * size], total_pages
+
+
+def needs_rev_parse(name):
+    """True when name is a revision expression or id rather than a ref name"""
+    return bool(_REVISION_SYNTAX.search(name))
@@ -0,0 +1,135 @@
+"""Working tree snapshot built from one `git status --porcelain=v2 --branch -z`.
+
+Branch, upstream, ahead/behind, unmerged paths with their stages, changed
+paths and the untracked count all come from the same call. The snapshot is
+cached on the repository's GitBackend like the ref index. It is dropped
+whenever a git command that can change the index or working tree runs
+through the backend, and dropped explicitly (git_utils.refresh_state())
+where files may have changed behind git's back: at the start of every
+shell command, integration and daemon request.
+"""
+ZERO_MODE = "000000"
+
+# What each unmerged XY code means, as `git status` words it
+CONFLICT_KINDS = {
+    "DD": "both deleted",
+    "AU": "added by us",
+    "UD": "deleted by them",
+    "UA": "added by them",
+    "DU": "deleted by us",
+    "AA": "both added",
+    "UU": "both modified",
+}
+
+
+class RepoState:
+    """Parsed `git status --porcelain=v2 --branch` output"""
+
+    __slots__ = ("oid", "branch", "upstream", "ahead", "behind",
+                 "conflicted", "changed", "untracked")
+
+    def __init__(self, records):
+        self.oid = None
+        # None on a detached HEAD
+        self.branch = None
+        self.upstream = None
+        self.ahead = 0
+        self.behind = 0
+        # {path: (xy, {stage: (mode, oid)})} for stages 1/2/3 that exist,
+        # in the same shape as merge_engine.merge_tree's conflicts
+        self.conflicted = {}
+        # {path: xy} of tracked paths with staged or unstaged changes
+        self.changed = {}
+        self.untracked = 0
+
+        records = iter(records)
+        for record in records:
+            kind = record[:1]
+            if kind == "#":
+                self._header(record[2:])
+            elif kind == "1":
+                fields = record.split(" ", 8)
+                self.changed[fields[8]] = fields[1]
+            elif kind == "2":
+                fields = record.split(" ", 9)
+                self.changed[fields[9]] = fields[1]
+                next(records, None)  # the path it was renamed or copied from
+            elif kind == "u":
+                fields = record.split(" ", 10)
+                stages = {
+                    stage: (mode, oid)
+                    for stage, mode, oid in zip((1, 2, 3), fields[3:6], fields[7:10])
+                    if mode != ZERO_MODE
+                }
+                self.conflicted[fields[10]] = (fields[1], stages)
+            elif kind == "?":
+                self.untracked += 1
+
+    def _header(self, header):
+        key, _, value = header.partition(" ")
+        if key == "branch.oid":
+            self.oid = None if value == "(initial)" else value
+        elif key == "branch.head":
+            self.branch = None if value == "(detached)" else value
+        elif key == "branch.upstream":
+            self.upstream = value
+        elif key == "branch.ab":
+            ahead, behind = value.split()
+            self.ahead = int(ahead)
+            self.behind = -int(behind)
+
+    @classmethod
+    def load(cls, backend):
+        """Snapshot of backend's repository, or None outside a repository"""
+        if backend.git_dir() is None:
+            return None
+        return cls(backend.status_records("--branch"))
+
+    @property
+    def dirty(self):
+        """Anything `git status --porcelain` would list"""
+        return bool(self.changed or self.conflicted or self.untracked)
+
+    def conflict_kind(self, path):
+        return CONFLICT_KINDS.get(self.conflicted[path][0], "unmerged")
+
+    def as_dict(self):
+        return {
+            "branch": self.branch, "oid": self.oid, "upstream": self.upstream,
+            "ahead": self.ahead, "behind": self.behind,
+            "conflicted": list(self.conflicted),
+            "conflict_kinds": {path: self.conflict_kind(path) for path in self.conflicted},
+            "changed": sorted(self.changed), "untracked": self.untracked,
+        }
+
+
+def describe(state, limit=10):
+    """Human readable lines for a RepoState"""
+    where = f"On branch {state.branch}" if state.branch else f"HEAD detached at {state.oid}"
+    if state.upstream:
+        counts = []
+        if state.ahead:
+            counts.append(f"ahead {state.ahead}")
+        if state.behind:
+            counts.append(f"behind {state.behind}")
+        where += f" → {state.upstream} ({', '.join(counts) or 'up to date'})"
+    lines = [f"🌿 {where}"]
+    if state.conflicted:
+        lines.append(f"⚠️  {len(state.conflicted)} conflicted path(s):")
+        lines += [f"     {path} ({state.conflict_kind(path)})"
+                  for path in list(state.conflicted)[:limit]]
+        lines += _more(state.conflicted, limit)
+    if state.changed:
+        lines.append(f"✏️  {len(state.changed)} changed path(s):")
+        lines += [f"     {xy.replace('.', ' ')} {path}"
+                  for path, xy in list(state.changed.items())[:limit]]
+        lines += _more(state.changed, limit)
+    if state.untracked:
+        lines.append(f"❓ {state.untracked} untracked path(s)")
+    if not state.dirty:
+        lines.append("✅ Working tree clean")
+    return lines
+
+
+def _more(paths, limit):
+    return [f"     ... and {len(paths) - limit} more"] if len(paths) > limit else []
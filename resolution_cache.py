@@ -0,0 +1,111 @@
+"""Persistent rerere-style cache of conflict hunk resolutions.
+
+Entries are keyed by a hash of the normalized ours/base/theirs sections of
+a hunk and live in a small SQLite database under the git dir. The total
+size is bounded; the least recently used entries are evicted first.
+"""
+import hashlib
+import os
+import sqlite3
+import time
+
+CACHE_DIR = "git-solver"
+CACHE_FILE = "resolution-cache.sqlite"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Part of every key; bumped when the same hunk would now be resolved
+# differently (2: diff3 hunks are merged line by line first)
+KEY_VERSION = 2
+
+
+def normalize(section):
+    """Line endings do not change what a hunk means"""
+    return section.replace(b"\r\n", b"\n")
+
+
+def hunk_key(ours, base, theirs, strategy):
+    digest = hashlib.sha256(f"{KEY_VERSION}:{strategy}".encode())
+    for section in (ours, base, theirs):
+        digest.update(b"\0" if section is None else b"\1" + normalize(section))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def cache_path(git_dir):
+    return os.path.join(git_dir, CACHE_DIR, CACHE_FILE)
+
+
+class ResolutionCache:
+    """Hunk hash -> resolution store with LRU eviction"""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A pool thread's connection is closed by the thread that ran the pool
+        # once the worker has exited; it is never used by two threads at once
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS resolutions ("
+            " key TEXT PRIMARY KEY, resolution BLOB NOT NULL,"
+            " size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS resolutions_last_used ON resolutions (last_used)"
+        )
+        self._db.commit()
+
+    def get(self, key):
+        """Stored resolution for key (LF line endings), or None"""
+        row = self._db.execute(
+            "SELECT resolution FROM resolutions WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._db.execute(
+            "UPDATE resolutions SET last_used = ? WHERE key = ?", (time.time(), key)
+        )
+        return bytes(row[0])
+
+    def put(self, key, resolution):
+        resolution = normalize(resolution)
+        if len(resolution) > self.max_bytes:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO resolutions (key, resolution, size, last_used)"
+            " VALUES (?, ?, ?, ?)",
+            (key, resolution, len(resolution), time.time()),
+        )
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits max_bytes"""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM resolutions").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        evicted = 0
+        rows = self._db.execute("SELECT key, size FROM resolutions ORDER BY last_used").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM resolutions WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        return evicted
+
+    def commit(self):
+        self._db.commit()
+
+    def close(self):
+        self.evict()
+        self._db.commit()
+        self._db.close()
+
+
+def open_cache(git_dir, max_bytes=DEFAULT_MAX_BYTES):
+    """Open the cache under git_dir, or None when there is no git dir"""
+    if not git_dir:
+        return None
+    return ResolutionCache(cache_path(git_dir), max_bytes)
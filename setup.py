@@ -6,7 +6,14 @@ setup(
     description="Interactive CLI tool to automatically resolve git merge conflicts",
     author="Your Name",
     packages=find_packages(),
-    py_modules=["cli_shell", "git_cli", "git_utils", "conflict_solver", "utils"],
+    py_modules=["cli_shell", "git_cli", "git_utils", "conflict_solver", "utils",
+                "git_backend", "integration", "merge_engine",
+                "resolution_cache", "conflict_model",
+                "tracing", "batch",
+                "ref_index", "fetch_planner", "merge_planner",
+                "predict", "file_classifier", "solver_daemon",
+                "pipeline", "repo_state", "journal",
+                "line_merge", "marker_scan", "structured_merge"],
     install_requires=[
         "click>=8.0.0",
     ],
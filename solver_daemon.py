@@ -0,0 +1,373 @@
+"""Long-running server that keeps per-repository state warm.
+
+`git-solver daemon` listens on a Unix domain socket. Each connection sends
+one JSON request on a single line and gets one JSON response back:
+
+    {"command": "predict", "repo": "/path/to/repo", "branches": ["feature-a"]}
+    {"ok": true, "result": [...], "log": "..."}
+
+Commands are merge, predict, status, resolve and ping. Every repository
+gets its own worker process that stays in that repository with its
+modules, git backend, cat-file pipes and ref index loaded. Requests for
+one repository run one at a time, requests for different repositories run
+concurrently. Idle workers are stopped after IDLE_TIMEOUT seconds.
+
+`git-solver request` is the thin client; when no daemon is listening it
+runs the request in-process instead.
+"""
+import io
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from contextlib import redirect_stdout
+
+import click
+
+COMMANDS = ("merge", "predict", "status", "resolve", "ping")
+SOCKET_ENV = "GIT_SOLVER_SOCKET"
+IDLE_TIMEOUT = 15 * 60
+
+
+def default_socket_path():
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return os.path.join(runtime, "git-solver.sock")
+    uid = os.getuid() if hasattr(os, "getuid") else "user"
+    return os.path.join(tempfile.gettempdir(), f"git-solver-{uid}.sock")
+
+
+def repo_root(path):
+    """Closest directory at or above path containing .git (path itself if none)"""
+    path = os.path.realpath(path)
+    probe = path
+    while not os.path.exists(os.path.join(probe, ".git")):
+        parent = os.path.dirname(probe)
+        if parent == probe:
+            return path
+        probe = parent
+    return probe
+
+
+def _status():
+    from git_utils import repo_state
+
+    state = repo_state()
+    if state is None:
+        raise RuntimeError("Not a git repository")
+    return dict(state.as_dict(), dirty=state.dirty)
+
+
+def _predict(request):
+    from predict import predict
+
+    predictions = predict(request.get("branches") or [], request.get("target", "main"),
+                          not request.get("target_only", False),
+                          request.get("use_cache", True))
+    return [prediction.as_dict() for prediction in predictions]
+
+
+def _resolve(request):
+    from conflict_model import DEFAULT_STRATEGY
+    from conflict_solver import resolve_conflicts
+    from git_utils import get_common_dir
+    from resolution_cache import cache_path
+
+    results = resolve_conflicts(
+        workers=request.get("workers", 1),
+        cache_path=cache_path(get_common_dir()) if request.get("use_cache", True) else None,
+        strategy=request.get("strategy", DEFAULT_STRATEGY),
+    )
+    return [dict(result._asdict()) for result in results]
+
+
+def handle(request):
+    """Run one request in the current directory and return its response"""
+    from git_utils import refresh_state
+
+    refresh_state()  # the repository may have changed since the last request
+    command = request.get("command")
+    if command == "merge":
+        from batch import run_job
+
+        entry = run_job(0, dict(request, repo=os.getcwd()))
+        return {"ok": entry["status"] == "ok", "result": entry, "error": entry["error"],
+                "log": entry.pop("log")}
+
+    log = io.StringIO()
+    try:
+        with redirect_stdout(log):
+            if command == "ping":
+                result = {"pid": os.getpid(), "repo": os.getcwd()}
+            elif command == "status":
+                result = _status()
+            elif command == "predict":
+                result = _predict(request)
+            elif command == "resolve":
+                result = _resolve(request)
+            else:
+                raise RuntimeError(
+                    f"Unknown command '{command}' (choose from {', '.join(COMMANDS)})"
+                )
+        return {"ok": True, "result": result, "error": None, "log": log.getvalue()}
+    except Exception as e:
+        if not isinstance(e, RuntimeError):
+            log.write(traceback.format_exc())
+        return {"ok": False, "result": None, "error": f"{type(e).__name__}: {e}",
+                "log": log.getvalue()}
+
+
+def _worker_main(repo, conn):
+    """Serve requests for one repository until told to stop"""
+    os.chdir(repo)
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        conn.send(handle(request))
+    from git_backend import close_all
+    close_all()
+
+
+class RepoWorker:
+    """A worker process bound to one repository, used by one request at a time"""
+
+    def __init__(self, repo, context):
+        self.repo = repo
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(repo, child), daemon=True)
+        self.process.start()
+        child.close()
+
+    def call(self, request):
+        try:
+            self.conn.send(request)
+            return self.conn.recv()
+        except (EOFError, OSError) as e:
+            return {"ok": False, "result": None, "log": "",
+                    "error": f"Worker for {self.repo} exited ({type(e).__name__})"}
+        finally:
+            self.last_used = time.monotonic()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+class Daemon:
+    """Routes requests to per-repository workers"""
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT):
+        import multiprocessing
+
+        # spawn: forking a process that runs server threads is not safe
+        self.context = multiprocessing.get_context("spawn")
+        self.idle_timeout = idle_timeout
+        self.workers = {}
+        self._lock = threading.Lock()
+
+    def _worker(self, repo):
+        with self._lock:
+            worker = self.workers.get(repo)
+            if worker is None or not worker.process.is_alive():
+                worker = self.workers[repo] = RepoWorker(repo, self.context)
+            return worker
+
+    def dispatch(self, request):
+        if not isinstance(request, dict):
+            raise RuntimeError("Request must be a JSON object")
+        repo = repo_root(request.get("repo") or os.getcwd())
+        if not os.path.isdir(repo):
+            raise RuntimeError(f"Repository not found: {repo}")
+        while True:
+            worker = self._worker(repo)
+            with worker.lock:
+                # The reaper may have stopped it while we waited for the lock
+                if worker.process.is_alive():
+                    return worker.call(request)
+
+    def reap(self):
+        """Stop workers that have been idle for longer than idle_timeout"""
+        now = time.monotonic()
+        with self._lock:
+            idle = [(repo, worker) for repo, worker in self.workers.items()
+                    if now - worker.last_used > self.idle_timeout]
+        for repo, worker in idle:
+            if worker.lock.acquire(blocking=False):
+                try:
+                    worker.stop()
+                    with self._lock:
+                        if self.workers.get(repo) is worker:
+                            del self.workers[repo]
+                finally:
+                    worker.lock.release()
+
+    def close(self):
+        with self._lock:
+            workers, self.workers = list(self.workers.values()), {}
+        for worker in workers:
+            with worker.lock:
+                worker.stop()
+
+
+def serve(socket_path, idle_timeout=IDLE_TIMEOUT):
+    """Run the daemon until interrupted or sent {"command": "shutdown"}"""
+    import socketserver
+
+    if is_running(socket_path):
+        raise RuntimeError(f"A daemon is already listening on {socket_path}")
+    if os.path.exists(socket_path):
+        os.remove(socket_path)  # left behind by a daemon that died
+
+    daemon = Daemon(idle_timeout)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            line = self.rfile.readline()
+            try:
+                request = json.loads(line.decode() or "null")
+                if isinstance(request, dict) and request.get("command") == "shutdown":
+                    response = {"ok": True, "result": None, "error": None, "log": ""}
+                    threading.Thread(target=self.server.shutdown).start()
+                else:
+                    response = daemon.dispatch(request)
+            except Exception as e:
+                response = {"ok": False, "result": None, "log": "",
+                            "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    def reaper():
+        while True:
+            time.sleep(min(60, idle_timeout))
+            daemon.reap()
+
+    old_umask = os.umask(0o077)  # only the owner may talk to the socket
+    try:
+        server = Server(socket_path, Handler)
+    finally:
+        os.umask(old_umask)
+    threading.Thread(target=reaper, daemon=True).start()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        daemon.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def send_request(request, socket_path=None):
+    """Send one request to the daemon; raises OSError when none is listening"""
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("Unix domain sockets are not available on this platform")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path or default_socket_path())
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b"".join(chunks).decode())
+
+
+def is_running(socket_path=None):
+    try:
+        return send_request({"command": "ping"}, socket_path)["ok"]
+    except (OSError, ValueError):
+        return False
+
+
+def request(payload, socket_path=None, fallback=True):
+    """Run payload through the daemon, or in-process when none is listening"""
+    payload = dict(payload)
+    payload["repo"] = os.path.abspath(payload.get("repo") or os.getcwd())
+    try:
+        return send_request(payload, socket_path)
+    except OSError:
+        if not fallback:
+            raise
+    cwd = os.getcwd()
+    os.chdir(payload["repo"])
+    try:
+        return handle(payload)
+    finally:
+        os.chdir(cwd)
+
+
+@click.command("daemon")
+@click.option("--socket", "socket_path", type=click.Path(dir_okay=False),
+              help=f"Socket to listen on (default: ${SOCKET_ENV} or a per-user path)")
+@click.option("--idle-timeout", default=IDLE_TIMEOUT, show_default=True, type=int,
+              help="Stop a repository's worker after this many idle seconds")
+@click.option("--stop", is_flag=True, help="Ask the running daemon to shut down")
+def daemon_command(socket_path, idle_timeout, stop):
+    """Serve merge/predict/status/resolve requests over a Unix socket"""
+    socket_path = socket_path or default_socket_path()
+    if stop:
+        try:
+            send_request({"command": "shutdown"}, socket_path)
+            click.echo("👋 Daemon stopped")
+        except OSError:
+            click.echo("ℹ️  No daemon is running")
+        return
+    if not hasattr(socket, "AF_UNIX"):
+        raise click.ClickException("Daemon mode needs Unix domain sockets")
+    click.echo(f"🛰  Listening on {socket_path} (Ctrl+C to stop)")
+    try:
+        serve(socket_path, idle_timeout)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    except KeyboardInterrupt:
+        click.echo("\n👋 Daemon stopped")
+
+
+@click.command("request")
+@click.argument("payload", default="-")
+@click.option("--socket", "socket_path", type=click.Path(dir_okay=False),
+              help="Daemon socket (default: the daemon's default)")
+@click.option("--no-fallback", is_flag=True,
+              help="Fail instead of running in-process when no daemon is listening")
+def request_command(payload, socket_path, no_fallback):
+    """Send a JSON request (argument or '-' for stdin) to the daemon.
+
+    The repository defaults to the current directory, e.g.
+    git-solver request '{"command": "predict", "branches": ["feature-a"]}'
+    """
+    text = sys.stdin.read() if payload == "-" else payload
+    try:
+        payload = json.loads(text)
+    except ValueError as e:
+        raise click.ClickException(f"Invalid JSON request: {e}")
+    if not isinstance(payload, dict):
+        raise click.ClickException("The request must be a JSON object")
+    try:
+        response = request(payload, socket_path, fallback=not no_fallback)
+    except OSError as e:
+        raise click.ClickException(f"Could not reach the daemon: {e}")
+    click.echo(json.dumps(response, indent=2))
+    if not response.get("ok"):
+        raise SystemExit(1)
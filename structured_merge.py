@@ -0,0 +1,502 @@
+"""Entry-level three-way merge of JSON, YAML and TOML (lock)files.
+
+Line markers make invalid files out of package-lock.json, poetry.lock or a
+big YAML config. Instead, a plugin picked by file pattern splits each
+version (base/ours/theirs, streamed from git into temporary files and
+memory-mapped) into keyed entries: an entry only one side changed is
+taken from that side, an identical change is kept once and an object
+both sides changed is merged one level down. Untouched entries are copied
+byte for byte, so formatting survives, and the output goes straight to a
+file, so memory stays bounded by the key index, not the file size.
+
+Two different values for the same key raise Unmergeable (except
+VOLATILE_KEYS such as lockfile content hashes, which keep ours) and the
+output must parse again before it is used; otherwise the caller falls
+back to the text strategy.
+"""
+import fnmatch
+import json
+import mmap
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from contextlib import ExitStack
+from git_utils import git
+
+# Keys whose values are derived from the rest of the file; when both sides
+# changed them ours is kept (the lockfile needs regenerating anyway)
+VOLATILE_KEYS = {"content-hash"}
+
+# Values are compared in blocks of this size instead of being copied whole
+COMPARE_BLOCK = 1024 * 1024
+
+# key: the entry's identity; start/end: its whole text; value_start/
+# value_end: the part compared and merged; child: whether the value is a
+# container the plugin can split further
+Member = namedtuple("Member", ["key", "start", "end", "value_start", "value_end", "child"])
+
+
+class Unmergeable(RuntimeError):
+    """Both sides changed the same entry differently, or the file cannot be split"""
+
+
+def _same(buf_a, span_a, buf_b, span_b):
+    """True if two byte ranges are equal, without copying either whole"""
+    if span_a[1] - span_a[0] != span_b[1] - span_b[0]:
+        return False
+    for offset in range(0, span_a[1] - span_a[0], COMPARE_BLOCK):
+        a = span_a[0] + offset
+        b = span_b[0] + offset
+        length = min(COMPARE_BLOCK, span_a[1] - a)
+        if buf_a[a:a + length] != buf_b[b:b + length]:
+            return False
+    return True
+
+
+class _Output:
+    """File writer remembering the last byte written"""
+
+    __slots__ = ("file", "last")
+
+    def __init__(self, file):
+        self.file = file
+        self.last = None
+
+    def write(self, data):
+        if data:
+            self.file.write(data)
+            self.last = data[-1:]
+
+
+def _value(member):
+    return member.value_start, member.value_end
+
+
+def _decide(name, base, ours, theirs, bufs):
+    """How one key merges: ('take', side, member), ('merge', None, None)
+    or ('drop', None, None); raises Unmergeable on a real conflict"""
+    b_buf, o_buf, t_buf = bufs
+    if ours is not None and theirs is not None:
+        if _same(o_buf, _value(ours), t_buf, _value(theirs)):
+            return "take", 1, ours
+        if base is not None:
+            if _same(b_buf, _value(base), o_buf, _value(ours)):
+                return "take", 2, theirs
+            if _same(b_buf, _value(base), t_buf, _value(theirs)):
+                return "take", 1, ours
+            if base.child and ours.child and theirs.child:
+                return "merge", None, None
+        if name.rsplit(".", 1)[-1] in VOLATILE_KEYS:
+            return "take", 1, ours
+        raise Unmergeable(f"'{name}' changed on both sides")
+    if ours is None and theirs is None:
+        return "drop", None, None  # deleted on both sides
+    # Present on one side only: added there, or deleted on the other side
+    side, member, side_buf = (1, ours, o_buf) if ours is not None else (2, theirs, t_buf)
+    if base is None:
+        return "take", side, member
+    if _same(b_buf, _value(base), side_buf, _value(member)):
+        return "drop", None, None
+    raise Unmergeable(f"'{name}' changed on one side and deleted on the other")
+
+
+def _index(members):
+    index = {}
+    for member in members:
+        if member.key in index:
+            raise Unmergeable(f"duplicate key '{member.key}'")
+        index[member.key] = member
+    return index
+
+
+def merge_container(plugin, out, bufs, spans, depth=0, where=""):
+    """Write the merge of one container (a whole file at depth 0) to out.
+
+    bufs are the base/ours/theirs buffers and spans the container's
+    (start, end) in each; the result keeps ours' order, with entries only
+    theirs added placed after the entry they follow in theirs. where is
+    the container's key path, for error messages.
+    """
+    containers = []
+    for buf, (start, end) in zip(bufs, spans):
+        container = plugin.container(buf, start, end, depth)
+        if container is None:
+            raise Unmergeable("not a mapping")
+        containers.append(container)
+    base, ours, theirs = (_index(container[1]) for container in containers)
+
+    added = {}
+    anchor = None
+    for member in containers[2][1]:
+        if member.key in ours:
+            anchor = member.key
+        elif member.key not in base:
+            added.setdefault(anchor, []).append(member)
+
+    o_buf = bufs[1]
+    head_end, members, tail_start = containers[1]
+    out.write(o_buf[spans[1][0]:head_end])
+    first = True
+    for member in added.get(None, []):
+        plugin.write_member(out, bufs[2], member, first)
+        first = False
+    for member in members:
+        action, side, chosen = _decide(where + str(member.key), base.get(member.key), member,
+                                       theirs.get(member.key), bufs)
+        if action == "take":
+            plugin.write_member(out, bufs[side], chosen, first)
+            first = False
+        elif action == "merge":
+            plugin.write_member(out, o_buf, member, first, end=member.value_start)
+            first = False
+            entries = [base[member.key], member, theirs[member.key]]
+            merge_container(plugin, out, bufs,
+                            [(entry.value_start, entry.value_end) for entry in entries],
+                            depth + 1, f"{where}{member.key}.")
+            out.write(o_buf[member.value_end:member.end])
+        for extra in added.get(member.key, []):
+            plugin.write_member(out, bufs[2], extra, first)
+            first = False
+    for key in base:
+        if key not in ours:
+            _decide(where + str(key), base[key], None, theirs.get(key), bufs)
+    out.write(o_buf[tail_start:spans[1][1]])
+
+
+class FormatPlugin(ABC):
+    """Splits one file format into keyed entries; subclasses fill in the rest"""
+
+    name = None
+    patterns = ()
+    # What a missing base (both sides added the file) counts as
+    empty = b""
+
+    def available(self):
+        return True
+
+    def matches(self, path):
+        name = path.rsplit("/", 1)[-1]
+        return any(fnmatch.fnmatchcase(path, glob) or fnmatch.fnmatchcase(name, glob)
+                   for glob in self.patterns)
+
+    @abstractmethod
+    def container(self, buf, start, end, depth):
+        """(head end, [Member], tail start) of the container in buf[start:end],
+        or None when it is not a mapping"""
+
+    def write_member(self, out, buf, member, first, end=None):
+        """Write a member's text (up to end) with any separator it needs"""
+        if out.last not in (None, b"\n"):
+            out.write(b"\n")
+        out.write(buf[member.start:member.end if end is None else end])
+
+    @abstractmethod
+    def validate(self, path):
+        """Raise ValueError if the file at path does not parse"""
+
+
+_JSON_STRING = rb'"[^"\\]*(?:\\.[^"\\]*)*"'
+_JSON_SPACE = re.compile(rb"[ \t\r\n]*")
+_JSON_KEY = re.compile(rb"[ \t\r\n]*(" + _JSON_STRING + rb")[ \t\r\n]*:[ \t\r\n]*")
+# Scalars and strings up to the next bracket, comma or brace; nested
+# values are skipped a bracket at a time, never token by token
+_JSON_VALUE = re.compile(rb'[^"{}\[\],]*(?:' + _JSON_STRING + rb'[^"{}\[\],]*)*')
+_JSON_BRACKET = re.compile(rb'[^"{}\[\]]*(?:' + _JSON_STRING + rb'[^"{}\[\]]*)*([{}\[\]])')
+# Fast path: a whole member whose value is a scalar, a string or an object
+# without nesting (most lockfile entries), up to the comma or brace after it
+_JSON_FLAT_MEMBER = re.compile(
+    rb"[ \t\r\n]*(" + _JSON_STRING + rb")[ \t\r\n]*:[ \t\r\n]*"
+    rb'(' + _JSON_STRING + rb'|[^"{}\[\], \t\r\n]+|\{[^"{}\[\]]*(?:' + _JSON_STRING
+    + rb'[^"{}\[\]]*)*\})[ \t\r\n]*([,}])'
+)
+
+
+def _skip_json_value(buf, pos, end):
+    """Position of the "," or "}" after the JSON value starting at pos"""
+    while True:
+        pos = _JSON_VALUE.match(buf, pos, end).end()
+        if buf[pos:pos + 1] not in (b"{", b"["):
+            return pos
+        nested = 0
+        for match in _JSON_BRACKET.finditer(buf, pos, end):
+            if match.group(1) in b"{[":
+                nested += 1
+            else:
+                nested -= 1
+                if not nested:
+                    pos = match.end()
+                    break
+        else:
+            raise ValueError(f"Unterminated JSON value at byte {pos}")
+
+
+class JsonPlugin(FormatPlugin):
+    """JSON objects, merged key by key at any depth"""
+
+    name = "json"
+    patterns = ("package-lock.json", "npm-shrinkwrap.json", "composer.lock", "Pipfile.lock",
+                "*.json")
+    empty = b"{}"
+    # Values bigger than this are validated member by member
+    VALIDATE_BLOCK = 1024 * 1024
+
+    def container(self, buf, start, end, depth):
+        open_brace = _JSON_SPACE.match(buf, start).end()
+        if buf[open_brace:open_brace + 1] != b"{":
+            return None
+        pos = open_brace + 1
+        close = _JSON_SPACE.match(buf, pos, end).end()
+        if buf[close:close + 1] == b"}":
+            return pos, [], close
+        members = []
+        while True:
+            match = _JSON_FLAT_MEMBER.match(buf, pos, end)
+            if match is not None:
+                value_start, value_end = match.span(2)
+                next_pos = match.start(3)
+            else:
+                match = _JSON_KEY.match(buf, pos, end)
+                if match is None:
+                    raise ValueError(f"Invalid JSON at byte {pos}")
+                value_start = match.end()
+                value_end = next_pos = _skip_json_value(buf, value_start, end)
+                while value_end > value_start and buf[value_end - 1:value_end] in b" \t\r\n":
+                    value_end -= 1
+                if value_end == value_start:
+                    raise ValueError(f"Invalid JSON at byte {value_start}")
+            key = match.group(1)
+            key = (key[1:-1].decode("utf-8") if b"\\" not in key
+                   else json.loads(key.decode("utf-8")))
+            members.append(Member(key, pos, value_end, value_start, value_end,
+                                  buf[value_start:value_start + 1] == b"{"))
+            char = buf[next_pos:next_pos + 1]
+            if char == b"}":
+                if depth == 0 and _JSON_SPACE.match(buf, next_pos + 1).end() != end:
+                    raise ValueError("Trailing data after the top-level object")
+                return open_brace + 1, members, value_end
+            if char != b",":
+                raise ValueError(f"Invalid JSON at byte {next_pos}")
+            pos = next_pos + 1
+
+    def write_member(self, out, buf, member, first, end=None):
+        if not first:
+            out.write(b",")
+        out.write(buf[member.start:member.end if end is None else end])
+
+    def validate(self, path):
+        with ExitStack() as stack:
+            buf = _map_file(stack, path)
+            self._validate(buf, 0, len(buf), 0)
+
+    def _validate(self, buf, start, end, depth):
+        container = self.container(buf, start, end, depth)
+        if container is None:
+            raise ValueError("Top level is not a JSON object")
+        for member in container[1]:
+            if member.child and member.value_end - member.value_start > self.VALIDATE_BLOCK:
+                self._validate(buf, member.value_start, member.value_end, depth + 1)
+            else:
+                json.loads(buf[member.value_start:member.value_end].decode("utf-8"))
+
+
+_YAML_LINE = re.compile(rb"^( *)([^ \r\n][^\r\n]*)", re.M)
+
+
+class YamlPlugin(FormatPlugin):
+    """Block mappings of YAML files, split by indentation; needs PyYAML to validate"""
+
+    name = "yaml"
+    patterns = ("pnpm-lock.yaml", "*.yaml", "*.yml")
+
+    def available(self):
+        try:
+            import yaml  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def container(self, buf, start, end, depth):
+        members = []
+        indent = None
+        head_end = None
+        key = None
+        for match in _YAML_LINE.finditer(buf, start, end):
+            spaces, text = match.group(1), match.group(2)
+            if text.startswith(b"#"):
+                continue
+            if indent is None:
+                if text.startswith((b"---", b"%")):
+                    continue  # document start and directives
+                indent = len(spaces)
+            if len(spaces) > indent:
+                continue
+            if key is not None and (text.startswith(b"- ") or text.rstrip() == b"-"):
+                continue  # a sequence may sit at its key's indentation
+            if len(spaces) < indent or text.startswith((b"- ", b"---", b"...")) or text == b"-":
+                return None
+            name, colon, rest = text.partition(b":")
+            if not colon or (rest and rest[:1] not in b" \t"):
+                return None
+            if key is not None:
+                members.append(self._member(buf, key, members_start, match.start()))
+            elif head_end is None:
+                head_end = match.start()
+            key = (name.strip().decode("utf-8", "replace"), rest.strip())
+            members_start = match.start()
+        if key is None:
+            return end, [], end  # nothing but comments
+        members.append(self._member(buf, key, members_start, end))
+        return head_end, members, end
+
+    def _member(self, buf, key, start, end):
+        name, rest = key
+        line_end = buf.find(b"\n", start, end)
+        line_end = end if line_end < 0 else line_end + 1
+        # "key:" followed by an indented block may be a nested mapping
+        child = (not rest or rest.startswith(b"#")) and line_end < end
+        return Member(name, start, end, line_end if child else start, end, child)
+
+    def validate(self, path):
+        import yaml
+
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        try:
+            with open(path, "rb") as f:
+                # Parse events only, so nothing is built in memory
+                for _ in yaml.parse(f, Loader=loader):
+                    pass
+        except yaml.YAMLError as e:
+            raise ValueError(str(e))
+
+
+_TOML_HEADER = re.compile(rb"^\[(\[?)\s*([^\]\n]*?)\s*\]", re.M)
+_TOML_KEY = re.compile(rb"^([A-Za-z0-9_\"'.-][^=\n]*?)\s*=", re.M)
+_TOML_NAME = re.compile(rb'^(name|version)\s*=\s*"([^"\n]*)"', re.M)
+
+
+class TomlLockPlugin(FormatPlugin):
+    """TOML lockfiles: top-level keys, [[package]] entries (with their
+    [package.*] sub-tables) keyed by name, and other tables by header;
+    inside an entry, key by key. Needs tomllib or tomli to validate."""
+
+    name = "toml"
+
+    def __init__(self, patterns, versioned=False):
+        self.patterns = patterns
+        # Cargo.lock may hold several versions of one crate
+        self.versioned = versioned
+
+    def available(self):
+        return self._toml() is not None
+
+    @staticmethod
+    def _toml():
+        try:
+            import tomllib
+            return tomllib
+        except ImportError:
+            try:
+                import tomli
+                return tomli
+            except ImportError:
+                return None
+
+    def container(self, buf, start, end, depth):
+        if depth > 1:
+            return None
+        tables = []
+        array = None
+        for match in _TOML_HEADER.finditer(buf, start, end):
+            name = match.group(2)
+            if array is not None and name.startswith(array + b"."):
+                continue  # a sub-table of the entry before it
+            array = name if match.group(1) else None
+            tables.append(match.start())
+        first_table = tables[0] if tables else end
+        keys = [match.start() for match in _TOML_KEY.finditer(buf, start, first_table)]
+        # Inside an entry (depth 1) its sub-tables are leaves after its own keys
+        starts = keys + tables
+        if not starts:
+            return start, [], end
+        members = [self._member(buf, pos, next_pos, depth)
+                   for pos, next_pos in zip(starts, starts[1:] + [end])]
+        return starts[0], members, end
+
+    def _member(self, buf, start, end, depth):
+        line_end = buf.find(b"\n", start, end)
+        line_end = end if line_end < 0 else line_end + 1
+        header = _TOML_HEADER.match(buf, start, line_end)
+        if header is None:
+            name = buf[start:line_end].partition(b"=")[0].strip().decode("utf-8", "replace")
+            return Member(name, start, end, start, end, False)
+        key = buf[start:header.end()].decode("utf-8", "replace")
+        if depth == 0 and header.group(1) and header.group(2) == b"package":
+            own = _TOML_HEADER.search(buf, line_end, end)
+            fields = {}
+            for field, value in _TOML_NAME.findall(buf, line_end, own.start() if own else end):
+                fields.setdefault(field, value.decode("utf-8", "replace"))
+            key = f"package {fields.get(b'name', '')}"
+            if self.versioned:
+                key += f" {fields.get(b'version', '')}"
+        return Member(key, start, end, line_end, end, depth == 0)
+
+    def validate(self, path):
+        toml = self._toml()
+        with open(path, "rb") as f:
+            try:
+                toml.load(f)
+            except toml.TOMLDecodeError as e:
+                raise ValueError(str(e))
+
+
+PLUGINS = [
+    TomlLockPlugin(("Cargo.lock",), versioned=True),
+    TomlLockPlugin(("poetry.lock", "uv.lock")),
+    JsonPlugin(),
+    YamlPlugin(),
+]
+
+
+def plugin_for(path):
+    """The first available plugin whose patterns match path, or None"""
+    for plugin in PLUGINS:
+        if plugin.matches(path) and plugin.available():
+            return plugin
+    return None
+
+
+def _map_file(stack, path):
+    """Read-only mmap of a file, closed with stack (b"" for an empty file)"""
+    if os.path.getsize(path) == 0:
+        return b""
+    f = stack.enter_context(open(path, "rb"))
+    return stack.enter_context(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def merge_stages(path, stages, dst):
+    """Merge the index stages ({stage: (mode, oid)}) of path into the file
+    dst, returning the plugin's name.
+
+    Raises Unmergeable when the entries conflict and ValueError when a
+    version or the result does not parse.
+    """
+    plugin = plugin_for(path)
+    if plugin is None:
+        raise Unmergeable("no structured merge plugin")
+    if 2 not in stages or 3 not in stages:
+        raise Unmergeable("deleted on one side")
+    with tempfile.TemporaryDirectory(prefix="git-solver-structured-") as tmp, \
+            ExitStack() as stack:
+        bufs = []
+        for stage in (1, 2, 3):
+            if stage in stages:
+                name = git().blob_to_file(stages[stage][1], os.path.join(tmp, str(stage)))
+                bufs.append(_map_file(stack, name))
+            else:
+                bufs.append(plugin.empty)
+        with open(dst, "wb") as f:
+            merge_container(plugin, _Output(f), bufs, [(0, len(buf)) for buf in bufs])
+    plugin.validate(dst)
+    return plugin.name
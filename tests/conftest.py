@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Repo:
+    """A scratch git repository that is also the current directory"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def git(self, *args, input=None, check=True):
+        result = subprocess.run(["git"] + list(args), cwd=str(self.path), input=input,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                universal_newlines=True)
+        assert result.returncode == 0 or not check, result.stderr
+        return result.stdout.strip()
+
+    def write(self, name, data):
+        path = self.path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data if isinstance(data, bytes) else data.encode())
+
+    def commit(self, message="change"):
+        self.git("add", "-A")
+        self.git("commit", "-q", "-m", message)
+        return self.git("rev-parse", "HEAD")
+
+    def conflicted_merge(self, base, ours, theirs):
+        """Leave a diff3 merge of branch feature into main in progress;
+        base/ours/theirs map file names to contents"""
+        for files, message in ((base, "base"), (theirs, "theirs"), (ours, "ours")):
+            if message == "theirs":
+                self.git("checkout", "-q", "-b", "feature")
+            elif message == "ours":
+                self.git("checkout", "-q", "main")
+            for name, data in files.items():
+                self.write(name, data)
+            self.commit(message)
+        self.git("-c", "merge.conflictStyle=diff3", "merge", "-q", "feature", check=False)
+        from git_utils import refresh_state
+        refresh_state()
+
+    def blob(self, data):
+        return self.git("hash-object", "-w", "--stdin", input=data)
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    path = tmp_path / "repo"
+    path.mkdir()
+    monkeypatch.chdir(str(path))
+    repo = Repo(path)
+    repo.git("init", "-q", "-b", "main")
+    repo.git("config", "user.email", "dev@example.com")
+    repo.git("config", "user.name", "Dev")
+    repo.git("config", "commit.gpgsign", "false")
+    from git_utils import refresh_state
+    refresh_state()
+    return repo
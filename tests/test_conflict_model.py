@@ -0,0 +1,80 @@
+import mmap
+
+import pytest
+
+from conflict_model import get_strategy, parse_conflicts, take_trivial
+
+DIFF3 = (b"head\n"
+         b"<<<<<<< HEAD\nours\n||||||| base\nbase\n=======\ntheirs\n>>>>>>> feature\n"
+         b"middle\n"
+         b"<<<<<<< HEAD\nsame\n=======\nsame\n>>>>>>> feature\n"
+         b"tail\n")
+
+
+def section(buf, span):
+    return buf[span[0]:span[1]]
+
+
+def test_diff3_hunk_offsets_and_labels():
+    first, second = parse_conflicts(DIFF3)
+    assert section(DIFF3, first.ours) == b"ours\n"
+    assert section(DIFF3, first.base) == b"base\n"
+    assert section(DIFF3, first.theirs) == b"theirs\n"
+    assert (first.ours_label, first.base_label, first.theirs_label) == (
+        b"HEAD", b"base", b"feature")
+    assert DIFF3[first.start:first.end].startswith(b"<<<<<<<")
+    assert DIFF3[first.end:].startswith(b"middle\n")
+    assert second.base is None
+    assert DIFF3[second.end:] == b"tail\n"
+
+
+def test_parses_from_an_mmap(tmp_path):
+    path = tmp_path / "conflicted.txt"
+    path.write_bytes(DIFF3)
+    with open(str(path), "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        assert [hunk.size for hunk in parse_conflicts(buf)] == [
+            hunk.size for hunk in parse_conflicts(DIFF3)]
+
+
+@pytest.mark.parametrize("data", [
+    b"plain text\n",
+    b"<<<<<<< HEAD\nours\n=======\ntheirs\n",  # never closed
+    b"x <<<<<<< not at line start\n=======\n>>>>>>> y\n",
+])
+def test_no_hunks(data):
+    assert parse_conflicts(data) == []
+
+
+def test_marker_without_newline_at_end_of_file():
+    data = b"<<<<<<< HEAD\nours\n=======\ntheirs\n>>>>>>> feature"
+    hunk, = parse_conflicts(data)
+    assert hunk.end == len(data)
+    assert hunk.theirs_label == b"feature"
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("ours", [b"ours\n"]),
+    ("theirs", [b"theirs\n"]),
+    ("union", [b"ours\n", b"theirs\n"]),
+])
+def test_strategies(name, expected):
+    hunk = parse_conflicts(DIFF3)[0]
+    assert [section(DIFF3, span) for span in get_strategy(name)(DIFF3, hunk)] == expected
+
+
+@pytest.mark.parametrize("ours, theirs, expected", [
+    (b"base\n", b"new\n", [b"new\n"]),
+    (b"new\n", b"base\n", [b"new\n"]),
+    (b"same\n", b"same\n", [b"same\n"]),
+    (b"one\n", b"two\n", [b"one\n", b"two\n"]),
+])
+def test_trivial_keeps_the_side_that_changed(ours, theirs, expected):
+    data = (b"<<<<<<< HEAD\n" + ours + b"||||||| base\nbase\n=======\n" + theirs
+            + b">>>>>>> feature\n")
+    hunk, = parse_conflicts(data)
+    assert [section(data, span) for span in take_trivial(data, hunk)] == expected
+
+
+def test_unknown_strategy():
+    with pytest.raises(RuntimeError, match="Unknown resolution strategy 'nope'"):
+        get_strategy("nope")
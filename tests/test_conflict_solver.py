@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+import conflict_solver
+from conflict_solver import resolve_conflicts
+
+NAMES = ["a.txt", "b.txt", "c.txt", "d.txt"]
+
+
+def conflicted(repo):
+    repo.conflicted_merge({name: "x\nshared\ny\n" for name in NAMES},
+                          {name: "x\nours\ny\n" for name in NAMES},
+                          {name: "x\ntheirs\ny\n" for name in NAMES})
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_resolves_every_file_in_parallel(repo, use_processes):
+    conflicted(repo)
+    results = resolve_conflicts(workers=2, use_processes=use_processes, strategy="union")
+    assert [result.path for result in results] == NAMES
+    assert all(result.error is None and result.hunks == 1 for result in results)
+    assert (repo.path / "c.txt").read_text() == "x\nours\ntheirs\ny\n"
+
+
+def test_one_failing_file_does_not_abort_the_batch(repo, monkeypatch):
+    resolve_one = conflict_solver._resolve_one
+
+    def flaky(path, cache_path=None, strategy="union"):
+        if os.path.basename(path) == "b.txt":
+            raise MemoryError("worker died")
+        return resolve_one(path, cache_path, strategy)
+
+    monkeypatch.setattr(conflict_solver, "_resolve_one", flaky)
+    conflicted(repo)
+    results = resolve_conflicts(workers=2, use_processes=False, strategy="union")
+    errors = {result.path: result.error for result in results}
+    assert "worker died" in errors.pop("b.txt")
+    assert set(errors.values()) == {None}
+
+
+def test_error_in_one_file_is_recorded_in_its_result(repo, monkeypatch):
+    resolve_file = conflict_solver.resolve_file
+
+    def broken(path, *args):
+        if os.path.basename(path) == "a.txt":
+            raise KeyError("parser bug")
+        return resolve_file(path, *args)
+
+    monkeypatch.setattr(conflict_solver, "resolve_file", broken)
+    conflicted(repo)
+    results = resolve_conflicts(strategy="ours")
+    assert "parser bug" in results[0].error
+    assert [result.error for result in results[1:]] == [None] * 3
+
+
+def test_thread_pool_closes_worker_caches(repo, tmp_path, monkeypatch):
+    import sqlite3
+
+    opened = []
+
+    class Recording(conflict_solver.ResolutionCache):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            opened.append(self)
+
+    monkeypatch.setattr(conflict_solver, "ResolutionCache", Recording)
+    conflicted(repo)
+    results = resolve_conflicts(workers=2, use_processes=False, strategy="union",
+                                cache_path=str(tmp_path / "cache" / "cache.sqlite"))
+    assert sum(result.cache_hits + result.cache_misses for result in results) == len(NAMES)
+    assert len(opened) >= 2
+    for cache in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            cache._db.execute("SELECT 1")
+    assert not any(not thread.is_alive() for thread in conflict_solver._thread_caches)
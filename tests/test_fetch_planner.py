@@ -0,0 +1,91 @@
+import pytest
+
+import fetch_planner
+from fetch_planner import FetchPlan, ensure_merge_base, fetch, is_shallow
+from git_utils import git
+
+
+@pytest.fixture
+def origin(repo, tmp_path):
+    """A bare origin with 20 commits of history, then main (5 commits past
+    the fork) and feature (3)"""
+    upstream = tmp_path / "upstream"
+    repo.git("init", "-q", "-b", "main", str(upstream))
+    work = type(repo)(upstream)
+    work.git("config", "user.email", "dev@example.com")
+    work.git("config", "user.name", "Dev")
+    for i in range(20):
+        work.write("a.txt", f"history {i}\n")
+        work.commit(f"history {i}")
+    work.git("checkout", "-q", "-b", "feature")
+    for i in range(3):
+        work.write("feature.txt", f"{i}\n")
+        work.commit(f"feature {i}")
+    work.git("checkout", "-q", "main")
+    for i in range(5):
+        work.write("main.txt", f"{i}\n")
+        work.commit(f"main {i}")
+    bare = tmp_path / "origin.git"
+    repo.git("clone", "-q", "--bare", str(upstream), str(bare))
+    repo.git("remote", "add", "origin", f"file://{bare}")
+    return bare
+
+
+def test_fetch_args():
+    plan = FetchPlan(["main", "origin/feature", "feature", None], depth=10, blob_filter=True)
+    assert plan.branches == ["main", "feature"]
+    assert plan.args() == [
+        "fetch", "--no-tags", "--depth=10", "--filter=blob:none", "origin",
+        "+refs/heads/main:refs/remotes/origin/main",
+        "+refs/heads/feature:refs/remotes/origin/feature",
+    ]
+    assert plan.args(["feature"], history="--deepen=50")[2:4] == ["--deepen=50",
+                                                                  "--filter=blob:none"]
+    assert "--depth=10" not in plan.args(history="--unshallow")
+
+
+def test_fetch_drops_branches_missing_on_the_remote(origin, capsys):
+    from utils import report_fetch
+
+    result = fetch(FetchPlan(["main", "local-only", "feature"]))
+    assert result == (["main", "feature"], ["local-only"], [])
+    assert git().refs().is_remote("origin/feature")
+
+    result = fetch(FetchPlan(["gone", "also-gone"]), ttl=60)
+    assert result == ([], ["gone", "also-gone"], [])
+    report_fetch(result, 60)
+    out = capsys.readouterr().out
+    assert "Not on origin, using the local branch: gone, also-gone" in out
+    assert "skipping fetch" not in out
+
+
+def test_fetch_skips_branches_fetched_within_the_ttl(origin, monkeypatch, capsys):
+    from utils import report_fetch
+
+    plan = FetchPlan(["main", "feature"])
+    assert fetch(plan, ttl=60).fetched == ["main", "feature"]
+    git().forget()
+
+    result = fetch(plan, ttl=60)
+    assert result == ([], [], ["main", "feature"])
+    report_fetch(result, 60)
+    assert "fetched less than 60s ago; skipping fetch" in capsys.readouterr().out
+
+    # ttl=0 always fetches, and an expired entry is fetched again
+    assert fetch(plan).fetched == ["main", "feature"]
+    now = fetch_planner.time.time()
+    monkeypatch.setattr(fetch_planner.time, "time", lambda: now + 61)
+    assert fetch(plan, ttl=60).fetched == ["main", "feature"]
+
+
+def test_shallow_fetch_is_deepened_to_the_merge_base(origin):
+    plan = FetchPlan(["main", "feature"], depth=1)
+    fetch(plan)
+    git().forget()
+    assert is_shallow()
+    assert git().run(["merge-base", "origin/main", "origin/feature"]).returncode != 0
+
+    ensure_merge_base(plan, "origin/main", "origin/feature", step=2)
+    assert git().run(["merge-base", "origin/main", "origin/feature"]).returncode == 0
+    # Deepened a few commits at a time, not unshallowed at once
+    assert is_shallow()
@@ -0,0 +1,86 @@
+import pytest
+
+from file_classifier import (
+    DEFAULT_PATH_STRATEGIES, PathPlan, classify, fallback_plan, is_binary,
+    regenerate_command, sniff
+)
+
+
+def plans(paths, heads=None, patterns=DEFAULT_PATH_STRATEGIES, strategy="union"):
+    heads = heads or {}
+    return {plan.path: plan
+            for plan in classify(paths, strategy, lambda path: heads.get(path, b"text\n"),
+                                 patterns)}
+
+
+def test_default_precedence(repo):
+    result = plans(["web/package-lock.json", "dist/app.min.js", "config/settings.json",
+                    "yarn.lock", "src/app.py"])
+    assert result["web/package-lock.json"] == PathPlan(
+        "web/package-lock.json", "structured", "union", "package-lock.json")
+    assert result["dist/app.min.js"].action == "theirs"
+    assert result["config/settings.json"] == PathPlan(
+        "config/settings.json", "structured", "union", "*.json")
+    assert result["yarn.lock"].action == "regenerate"
+    assert result["src/app.py"] == PathPlan("src/app.py", "text", "union", None)
+    assert regenerate_command("web/package-lock.json") == "npm install --package-lock-only"
+
+
+def test_binary_sniffing(repo, tmp_path):
+    heads = {"logo.png": b"\x89PNG\0\0", "notes.txt": b"plain\n"}
+    result = plans(["logo.png", "notes.txt"], heads)
+    assert result["logo.png"] == PathPlan("logo.png", "ours", None, "binary file")
+    assert result["notes.txt"].action == "text"
+
+    path = tmp_path / "blob.bin"
+    path.write_bytes(b"x" * 9000 + b"\0")
+    assert not is_binary(sniff(str(path)))  # past the sniffed block, like git
+    assert sniff(str(tmp_path / "missing")) == b""
+
+
+def test_globs_are_checked_before_reading_content(repo):
+    def no_read(path):
+        raise AssertionError(f"read {path}")
+
+    plan, = classify(["a.min.js"], "union", no_read, DEFAULT_PATH_STRATEGIES)
+    assert plan.action == "theirs"
+
+
+def test_configured_strategies_override_the_defaults(repo):
+    from file_classifier import path_strategies
+
+    repo.git("config", "--add", "git-solver.pathStrategy", "*.json=ours")
+    repo.git("config", "--add", "git-solver.pathStrategy", "binary=theirs")
+    repo.git("config", "--add", "git-solver.pathStrategy", "docs/*=trivial")
+    result = plans(["package-lock.json", "img.png", "docs/a.md"], {"img.png": b"\0"},
+                   patterns=path_strategies())
+    assert result["package-lock.json"].action == "ours"
+    assert result["img.png"].action == "theirs"
+    assert result["docs/a.md"] == PathPlan("docs/a.md", "text", "trivial", "docs/*")
+
+
+@pytest.mark.parametrize("value", ["no-separator", "*.json=nonsense"])
+def test_bad_configured_strategy(repo, value):
+    from file_classifier import path_strategies
+
+    repo.git("config", "--add", "git-solver.pathStrategy", value)
+    with pytest.raises(RuntimeError):
+        path_strategies()
+
+
+def test_merge_attributes_win(repo):
+    repo.write(".gitattributes", "*.dat -merge\nCHANGELOG merge=union\n"
+                                 "*.json merge=theirs\n")
+    result = plans(["x.dat", "CHANGELOG", "package-lock.json", "plain.txt"],
+                   strategy="ours")
+    assert result["x.dat"] == PathPlan("x.dat", "ours", None, "merge=binary attribute")
+    assert result["CHANGELOG"] == PathPlan("CHANGELOG", "text", "union",
+                                           "merge=union attribute")
+    assert result["package-lock.json"].action == "theirs"
+    assert result["plain.txt"] == PathPlan("plain.txt", "text", "ours", None)
+
+
+def test_fallback_plan_resolves_hunk_by_hunk():
+    plan = PathPlan("a.json", "structured", "trivial", "*.json")
+    assert fallback_plan(plan, "bad JSON") == PathPlan(
+        "a.json", "text", "trivial", "*.json, structured merge failed: bad JSON")
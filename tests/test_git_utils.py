@@ -0,0 +1,84 @@
+import subprocess
+
+import pytest
+
+import git_utils
+from git_utils import push_branches
+
+
+class Recorder:
+    def __init__(self, returncode=0, stdout="", stderr=""):
+        self.calls = []
+        self.result = subprocess.CompletedProcess([], returncode, stdout, stderr)
+
+    def run(self, args, **kwargs):
+        self.calls.append(args)
+        return self.result
+
+
+def test_push_argv_leases_every_branch(monkeypatch):
+    backend = Recorder()
+    monkeypatch.setattr(git_utils, "git", lambda: backend)
+    push_branches([("main", "c1", "e1"), ("release", "c2", None)])
+    assert backend.calls == [[
+        "push", "--porcelain", "origin",
+        "--force-with-lease=refs/heads/main:e1",
+        "--force-with-lease=refs/heads/release:",
+        "c1:refs/heads/main", "c2:refs/heads/release",
+    ]]
+
+
+def test_nothing_to_push_runs_nothing(monkeypatch):
+    backend = Recorder()
+    monkeypatch.setattr(git_utils, "git", lambda: backend)
+    push_branches([])
+    assert backend.calls == []
+
+
+def test_porcelain_rejections_are_reported(monkeypatch):
+    stdout = ("To origin\n"
+              "!\tc1:refs/heads/main\t[rejected] (stale info)\n"
+              "=\tc2:refs/heads/release\t[up to date]\n"
+              "Done\n")
+    monkeypatch.setattr(git_utils, "git", lambda: Recorder(1, stdout))
+    with pytest.raises(RuntimeError, match=r"Push rejected: main \[rejected\] \(stale info\); "
+                                           r"origin changed since it was fetched"):
+        push_branches([("main", "c1", "e1"), ("release", "c2", "e2")])
+
+
+def test_stale_lease_is_rejected_by_a_real_remote(repo, tmp_path):
+    origin = tmp_path / "origin.git"
+    repo.git("init", "-q", "--bare", str(origin))
+    repo.git("remote", "add", "origin", str(origin))
+    repo.write("a.txt", "one\n")
+    fetched = repo.commit("one")
+    repo.git("push", "-q", "origin", "main")
+    repo.write("a.txt", "two\n")
+    ours = repo.commit("two")
+
+    # Someone else pushes after our fetch
+    repo.git("push", "-q", "origin", f"{ours}:refs/heads/main")
+    repo.write("a.txt", "three\n")
+    newer = repo.commit("three")
+    with pytest.raises(RuntimeError, match="stale info"):
+        push_branches([("main", newer, fetched)])
+    assert repo.git("--git-dir", str(origin), "rev-parse", "main") == ours
+
+    push_branches([("main", newer, ours)])
+    assert repo.git("--git-dir", str(origin), "rev-parse", "main") == newer
+
+
+def test_stage_paths_from_a_subdirectory(repo, monkeypatch):
+    from git_utils import refresh_state, repo_state, stage_paths
+
+    repo.conflicted_merge({"sub/a.txt": "base\n", "top.txt": "base\n"},
+                          {"sub/a.txt": "ours\n", "top.txt": "ours\n"},
+                          {"sub/a.txt": "theirs\n", "top.txt": "theirs\n"})
+    repo.write("sub/a.txt", "merged\n")
+    repo.write("top.txt", "merged\n")
+    monkeypatch.chdir(str(repo.path / "sub"))
+    refresh_state()
+    assert sorted(repo_state().conflicted) == ["sub/a.txt", "top.txt"]
+    stage_paths(["sub/a.txt", "top.txt"])
+    refresh_state()
+    assert not repo_state().conflicted
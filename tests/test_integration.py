@@ -0,0 +1,192 @@
+import pytest
+
+from git_utils import git, refresh_state
+
+
+def advance(repo):
+    """Commit a change on branch ahead, leaving main checked out; returns
+    (old main, ahead)"""
+    repo.write("a.txt", "one\n")
+    old = repo.commit("base")
+    repo.git("checkout", "-q", "-b", "ahead")
+    repo.write("a.txt", "two\n")
+    head = repo.commit("ahead")
+    repo.git("checkout", "-q", "main")
+    git().forget()
+    return old, head
+
+
+def test_finalize_target_fast_forwards_clean_checkout(repo):
+    from integration import finalize_target
+
+    old, head = advance(repo)
+    assert finalize_target("main", head, old)
+    assert repo.git("rev-parse", "main") == head
+    assert (repo.path / "a.txt").read_text() == "two\n"
+    assert repo.git("status", "--porcelain") == ""
+
+
+def test_finalize_target_skips_dirty_checkout(repo):
+    from integration import finalize_target
+
+    old, head = advance(repo)
+    repo.write("a.txt", "local edit\n")
+    assert not finalize_target("main", head, old)
+    assert repo.git("rev-parse", "main") == old
+    assert (repo.path / "a.txt").read_text() == "local edit\n"
+
+
+def test_finalize_target_restores_ref_when_checkout_update_fails(repo):
+    from integration import finalize_target
+
+    old, head = advance(repo)
+    repo.git("checkout", "-q", "ahead")
+    repo.write("b.txt", "new\n")
+    repo.commit("add b")
+    head = repo.git("rev-parse", "HEAD")
+    repo.git("checkout", "-q", "main")
+    repo.write("b.txt", "untracked\n")
+    git().forget()
+    with pytest.raises(RuntimeError, match="Could not update"):
+        finalize_target("main", head, old)
+    assert repo.git("rev-parse", "main") == old
+    assert (repo.path / "b.txt").read_text() == "untracked\n"
+
+
+def test_in_memory_engine_leaves_dirty_checkout_alone(repo, tmp_path):
+    from integration import INTEGRATION_BRANCH, integrate_branches
+
+    origin = tmp_path / "origin.git"
+    repo.git("init", "-q", "--bare", str(origin))
+    repo.git("remote", "add", "origin", str(origin))
+    old, head = advance(repo)
+    repo.git("push", "-q", "origin", "main", "ahead")
+    repo.write("a.txt", "local edit\n")
+    refresh_state()
+
+    integrate_branches([("ahead", "ahead")], engine="in-memory", use_cache=False)
+
+    assert repo.git("rev-parse", "main") == old
+    assert repo.git("rev-parse", INTEGRATION_BRANCH) == head
+    assert repo.git("rev-parse", "origin/main") == head
+    assert (repo.path / "a.txt").read_text() == "local edit\n"
+
+
+def test_worktree_engine_leaves_the_checkout_and_process_directory_alone(repo, tmp_path,
+                                                                         monkeypatch):
+    import os
+    from integration import INTEGRATION_BRANCH, integrate_branches
+    from journal import Journal
+
+    origin = tmp_path / "origin.git"
+    repo.git("init", "-q", "--bare", str(origin))
+    repo.git("remote", "add", "origin", str(origin))
+    repo.conflicted_merge({"a.txt": "x\nshared\ny\n"}, {"a.txt": "x\nours\ny\n"},
+                          {"a.txt": "x\ntheirs\ny\n"})
+    repo.git("merge", "--abort")
+    repo.git("push", "-q", "origin", "main", "feature")
+    lock = repo.path / ".git" / "index.lock"
+    lock.write_text("")
+
+    def no_chdir(path):
+        raise AssertionError("changed the process directory")
+
+    monkeypatch.setattr(os, "chdir", no_chdir)
+    results = integrate_branches([("feature", "feature")], engine="worktree",
+                                 strategy="union", use_cache=False)
+
+    assert [result.path for result in results] == ["a.txt"]
+    assert lock.exists()
+    head = repo.git("rev-parse", INTEGRATION_BRANCH)
+    assert repo.git("show", f"{head}:a.txt") == "x\nours\ntheirs\ny"
+    assert repo.git("log", "-1", "--format=%s", head).endswith(f"into {INTEGRATION_BRANCH}")
+    assert (repo.path / "a.txt").read_text() == "x\nours\ny\n"
+    assert "finalize" in [entry["phase"] for entry in Journal.load("main").phases]
+
+
+def test_target_journals_finish_only_after_the_combined_push(repo, tmp_path, monkeypatch):
+    import integration
+    from integration import integrate_targets, resume_integration
+    from journal import Journal
+
+    origin = tmp_path / "origin.git"
+    repo.git("init", "-q", "--bare", str(origin))
+    repo.git("remote", "add", "origin", str(origin))
+    old, head = advance(repo)
+    repo.git("branch", "release", old)
+    repo.git("push", "-q", "origin", "main", "release", "ahead")
+    push_branches = integration.push_branches
+
+    def rejected(updates):
+        raise RuntimeError("Push rejected: main stale info")
+
+    monkeypatch.setattr(integration, "push_branches", rejected)
+    with pytest.raises(RuntimeError, match="Push rejected"):
+        integrate_targets([("ahead", "ahead")], ["main", "release"], engine="in-memory",
+                          use_cache=False)
+    for target in ("main", "release"):
+        journal = Journal.load(target)
+        assert journal.status == "failed" and not journal.completed("push")
+    assert repo.git("rev-parse", "origin/main") == old
+
+    monkeypatch.setattr(integration, "push_branches", push_branches)
+    resume_integration(Journal.load("release"))
+    journal = Journal.load("release")
+    assert journal.status == "done" and journal.completed("push")
+    assert repo.git("rev-parse", "origin/release") == head
+
+
+def test_target_journals_record_the_combined_push(repo, tmp_path):
+    from integration import integrate_targets
+    from journal import Journal
+
+    origin = tmp_path / "origin.git"
+    repo.git("init", "-q", "--bare", str(origin))
+    repo.git("remote", "add", "origin", str(origin))
+    old, head = advance(repo)
+    repo.git("branch", "release", old)
+    repo.git("push", "-q", "origin", "main", "release", "ahead")
+
+    integrate_targets([("ahead", "ahead")], ["main", "release"], engine="in-memory",
+                      use_cache=False)
+    for target in ("main", "release"):
+        journal = Journal.load(target)
+        assert journal.status == "done"
+        assert journal.entry("push")["commit"] == head
+        assert journal.refs[f"origin/{target}"] == head
+
+
+def test_async_engine_keeps_blocking_calls_off_the_event_loop(repo, tmp_path, monkeypatch):
+    import threading
+    import integration
+    from integration import INTEGRATION_BRANCH, integrate_branches
+    from journal import Journal
+
+    origin = tmp_path / "origin.git"
+    repo.git("init", "-q", "--bare", str(origin))
+    repo.git("remote", "add", "origin", str(origin))
+    repo.conflicted_merge({"a.txt": "x\nshared\ny\n"}, {"a.txt": "x\nours\ny\n"},
+                          {"a.txt": "x\ntheirs\ny\n"})
+    repo.git("merge", "--abort")
+    repo.git("push", "-q", "origin", "main", "feature")
+
+    on_loop = []
+    rev_parse = integration.rev_parse
+
+    def watched(name):
+        if threading.current_thread() is threading.main_thread():
+            on_loop.append(name)
+        return rev_parse(name)
+
+    monkeypatch.setattr(integration, "rev_parse", watched)
+    results = integrate_branches([("feature", "feature")], engine="async",
+                                 strategy="union", use_cache=False)
+
+    assert [result.path for result in results] == ["a.txt"]
+    assert on_loop == []
+    head = repo.git("rev-parse", "main")
+    assert repo.git("show", "main:a.txt") == "x\nours\ntheirs\ny"
+    assert repo.git("rev-parse", "origin/main") == head
+    journal = Journal.load("main")
+    assert journal.entry("merge:feature")["commit"] == head
+    assert journal.refs[INTEGRATION_BRANCH] == head
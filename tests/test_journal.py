@@ -0,0 +1,57 @@
+import pytest
+
+from journal import Journal, resumable
+
+
+def start(target):
+    return Journal.start("checkout", [("feature", "feature")], {"target": target})
+
+
+def test_each_target_keeps_its_own_journal(repo):
+    start("main").record("pull", "a" * 40)
+    start("release/1.0").record("pull", "b" * 40)
+
+    assert Journal.load("main").head == "a" * 40
+    assert Journal.load("release/1.0").head == "b" * 40
+    assert Journal.load("other") is None
+
+
+def test_resumable_needs_a_target_when_several_runs_stopped(repo):
+    start("main").fail(RuntimeError("boom"))
+    start("release").fail(RuntimeError("boom"))
+    with pytest.raises(RuntimeError, match="main, release"):
+        resumable()
+    assert resumable("release").options["target"] == "release"
+
+    Journal.load("main").finish()
+    assert resumable().options["target"] == "release"
+    with pytest.raises(RuntimeError, match="No interrupted merge into 'main'"):
+        resumable("main")
+
+
+def test_reload_keeps_phases_and_refs(repo):
+    journal = start("main")
+    journal.record("validate", refs={"main": "c" * 40}, labels={"feature": "origin/feature"})
+    journal.record("merge:feature", "d" * 40, {"auto-integration-branch": "d" * 40})
+
+    loaded = Journal.load("main")
+    assert [entry["phase"] for entry in loaded.phases] == ["validate", "merge:feature"]
+    assert loaded.entry("validate")["labels"] == {"feature": "origin/feature"}
+    assert loaded.completed("merge:feature") and not loaded.completed("push")
+    assert loaded.refs == {"main": "c" * 40, "auto-integration-branch": "d" * 40}
+    assert loaded.last_phase == "merge:feature"
+
+
+def test_moved_ref_blocks_resume(repo):
+    repo.write("a.txt", "one\n")
+    first = repo.commit()
+    journal = start("main")
+    journal.record("pull", first, {"main": first})
+    journal.verify()
+
+    repo.write("a.txt", "two\n")
+    repo.commit()
+    from git_utils import git
+    git().forget()
+    with pytest.raises(RuntimeError, match="Refs moved"):
+        journal.verify()
@@ -0,0 +1,60 @@
+import pytest
+
+from line_merge import conflict_lines, match_lines, merge_lines, split_lines
+
+
+def test_split_lines_keeps_line_endings():
+    assert split_lines(b"a\r\nb\nc") == [b"a\r\n", b"b\n", b"c"]
+    assert split_lines(b"") == []
+
+
+def test_match_lines_anchors_on_unique_lines():
+    a = [1, 2, 3, 4, 5]
+    b = [9, 1, 3, 2, 5]
+    matched = match_lines(a, b)
+    assert matched[4] == 4
+    # Only one of 2 and 3 can stay in order
+    assert len(matched) == 3
+    assert sorted(matched.values()) == [matched[i] for i in sorted(matched)]
+
+
+def test_match_lines_falls_back_to_the_rarest_run():
+    # No line is unique on both sides, so patience finds no anchor
+    a = [1, 1, 2, 2, 3]
+    b = [2, 2, 1, 1, 3]
+    matched = match_lines(a, b)
+    assert matched[4] == 4
+    assert len(matched) == 3
+
+
+def test_changes_on_different_lines_merge_cleanly():
+    base = b"import a\nimport b\nimport c\n"
+    ours = b"import a\nimport b2\nimport c\n"
+    theirs = b"import a\nimport b\nimport c\nimport d\n"
+    assert merge_lines(ours, base, theirs) == [b"import a\nimport b2\nimport c\nimport d\n"]
+
+
+def test_same_change_on_both_sides_merges():
+    base = b"x\nold\ny\n"
+    assert merge_lines(b"x\nnew\ny\n", base, b"x\nnew\ny\n") == [b"x\nnew\ny\n"]
+
+
+def test_overlapping_change_leaves_a_residual_conflict():
+    base = b"keep\nvalue = 1\nend\n"
+    segments = merge_lines(b"keep\nvalue = 2\nend\n", base, b"keep\nvalue = 3\nend\n")
+    assert segments == [b"keep\n", (b"value = 2\n", b"value = 1\n", b"value = 3\n"), b"end\n"]
+
+
+def test_rewritten_block_only_conflicts_where_sides_differ():
+    base = b"a\nb\n"
+    ours = b"x\nshared\nmine\n"
+    theirs = b"x\nshared\nyours\n"
+    assert merge_lines(ours, base, theirs) == [b"x\nshared\n", (b"mine\n", None, b"yours\n")]
+
+
+@pytest.mark.parametrize("ours, theirs, size", [
+    (b"a\nb\n", b"c\n", 3),
+    (b"", b"c", 1),
+])
+def test_conflict_lines(ours, theirs, size):
+    assert conflict_lines(ours, theirs) == size
@@ -0,0 +1,105 @@
+import pytest
+
+from marker_scan import check_markers, find_markers, scan_file, scan_tree
+
+
+@pytest.mark.parametrize("data, expected", [
+    (b"<<<<<<< HEAD\nours\n=======\ntheirs\n>>>>>>> feature\n", ([1, 5], 1)),
+    (b"a\r\n<<<<<<<\r\nb\r\n>>>>>>>\r\n", ([2, 4], 1)),
+    (b"x\n>>>>>>> only an end\n", ([2], 1)),
+])
+def test_find_markers(data, expected):
+    assert find_markers(data) == expected
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"plain\n",
+    b"<<<<<<<< eight brackets\n>>>>>>>> are not markers\n",
+    b"=======\nunderline only\n",
+    b"text <<<<<<< mid line\n",
+])
+def test_not_markers(data):
+    assert find_markers(data) is None
+
+
+def test_scan_file(tmp_path):
+    text = tmp_path / "text.txt"
+    text.write_bytes(b"ok\n<<<<<<< HEAD\nx\n=======\ny\n>>>>>>> b\n")
+    binary = tmp_path / "image.bin"
+    binary.write_bytes(b"\0\x01<<<<<<< HEAD\n")
+    empty = tmp_path / "empty.txt"
+    empty.write_bytes(b"")
+
+    hit = scan_file(str(text), "text.txt")
+    assert (hit.path, hit.lines, hit.hunks) == ("text.txt", [2, 6], 1)
+    assert scan_file(str(binary)) is None
+    assert scan_file(str(empty)) is None
+    assert scan_file(str(tmp_path / "gone.txt")) is None
+
+
+def test_scan_tree_from_a_subdirectory(repo, monkeypatch):
+    repo.write("sub/a.txt", "clean\n")
+    repo.commit()
+    repo.write("sub/a.txt", "<<<<<<< HEAD\n")
+    monkeypatch.chdir(str(repo.path / "sub"))
+    assert [hit.path for hit in scan_tree("HEAD")] == ["sub/a.txt"]
+
+
+def marker_conflict(repo):
+    """A conflict whose union resolution leaves a line that looks like a marker"""
+    repo.conflicted_merge({"a.txt": "x\nshared\ny\n"},
+                          {"a.txt": "x\n<<<<<<< kept on purpose\ny\n"},
+                          {"a.txt": "x\ntheirs\ny\n"})
+
+
+def test_check_markers_blocks_the_checkout_engine_commit(repo):
+    from integration import IntegrationOptions, merge_and_resolve
+
+    marker_conflict(repo)
+    repo.git("merge", "--abort")
+    head = repo.git("rev-parse", "HEAD")
+    with pytest.raises(RuntimeError, match=r"Conflict markers left in 1 file\(s\)"):
+        merge_and_resolve("feature", "feature", IntegrationOptions(use_cache=False), [])
+    assert repo.git("rev-parse", "HEAD") == head
+    assert "a.txt" in repo.git("diff", "--name-only", "--diff-filter=U")
+
+
+def test_check_markers_on_a_commit(repo):
+    repo.write("a.txt", "fine\n")
+    base = repo.commit()
+    repo.write("a.txt", ">>>>>>> left\n")
+    commit = repo.commit()
+    check_markers(base, commit=base)
+    with pytest.raises(RuntimeError, match="a.txt: 1 hunk"):
+        check_markers(base, commit=commit)
+
+
+def test_async_stager_holds_back_files_with_markers(repo):
+    import asyncio
+    from integration import AsyncIntegration, IntegrationOptions
+
+    marker_conflict(repo)
+    flow = AsyncIntegration([], IntegrationOptions(use_cache=False))
+    loop = asyncio.new_event_loop()
+    try:
+        with pytest.raises(RuntimeError, match="a.txt: 1 hunk"):
+            loop.run_until_complete(flow.resolve_and_stage())
+    finally:
+        loop.close()
+    assert "a.txt" in repo.git("diff", "--name-only", "--diff-filter=U")
+
+
+def test_shell_scan_output(repo, capsys):
+    from cli_shell import ConflictSolverShell
+
+    repo.write("clean.txt", "ok\n")
+    repo.write("left.txt", "a\n<<<<<<< HEAD\nb\n=======\nc\n>>>>>>> x\n")
+    ConflictSolverShell().cmd_scan([])
+    out = capsys.readouterr().out
+    assert "Conflict markers in 1 of 2 file(s)" in out
+    assert "left.txt: 1 hunk(s), line(s) 2, 6" in out
+
+    repo.write("left.txt", "resolved\n")
+    ConflictSolverShell().cmd_scan(["--workers", "1"])
+    assert "No conflict markers in 2 file(s)" in capsys.readouterr().out
@@ -0,0 +1,62 @@
+from git_utils import git
+from merge_planner import plan_merges
+
+
+def branch(repo, name, files, start="main"):
+    repo.git("checkout", "-q", "-b", name, start)
+    for path, data in files.items():
+        repo.write(path, data)
+    repo.commit(name)
+    repo.git("checkout", "-q", "main")
+
+
+def four_branches(repo):
+    """docs and tests touch nothing else, small and big share a.txt, zed
+    touches z.txt which main changed too; old is already in main"""
+    for path in ("a.txt", "b.txt", "c.txt", "z.txt"):
+        repo.write(path, f"{path}\n")
+    repo.commit("base")
+    repo.git("branch", "old")
+    branch(repo, "docs", {"docs.txt": "docs\n"})
+    branch(repo, "tests", {"tests.txt": "tests\n"})
+    branch(repo, "big", {"a.txt": "big\n", "b.txt": "big\n", "c.txt": "big\n"})
+    branch(repo, "small", {"a.txt": "small\n"})
+    branch(repo, "zed", {"z.txt": "zed\n"})
+    repo.write("z.txt", "main\n")
+    repo.commit("main moves on")
+    git().forget()
+    names = ["old", "big", "docs", "zed", "small", "tests"]
+    return [(name, name) for name in names]
+
+
+def test_order_and_groups(repo):
+    branches = four_branches(repo)
+    plan = plan_merges(repo.git("rev-parse", "main"), branches)
+
+    assert [c.label for c in plan.merged] == ["old"]
+    assert [c.label for c in plan.clean] == ["docs", "tests"]
+    # Least overlap with what is merged so far goes first
+    assert [c.label for c in plan.ordered] == ["small", "zed", "big"]
+    assert plan.overlaps == {("big", "small"): 1}
+    assert plan.groups() == [[("docs", "docs"), ("tests", "tests")], [("small", "small")],
+                             [("zed", "zed")], [("big", "big")]]
+
+
+def test_clean_branches_go_in_one_octopus_commit(repo, tmp_path):
+    from integration import INTEGRATION_BRANCH, integrate_branches
+
+    branches = four_branches(repo)
+    origin = tmp_path / "origin.git"
+    repo.git("init", "-q", "--bare", str(origin))
+    repo.git("remote", "add", "origin", str(origin))
+    repo.git("push", "-q", "origin", "main")
+
+    integrate_branches(branches, engine="in-memory", strategy="union", conflict_order=True,
+                       use_cache=False)
+    log = repo.git("log", "--first-parent", "--merges", "--format=%s%x00%P",
+                   INTEGRATION_BRANCH)
+    merges = [line.split("\0") for line in log.splitlines()][::-1]
+    assert [subject.split("'")[1] for subject, _ in merges] == ["docs", "small", "zed", "big"]
+    assert merges[0][0].startswith("Merge branches 'docs' and 'tests'")
+    assert len(merges[0][1].split()) == 3  # main plus both branches
+    assert repo.git("show", f"{INTEGRATION_BRANCH}:a.txt") == "small\nbig"
@@ -0,0 +1,31 @@
+import asyncio
+import subprocess
+
+import tracing
+from pipeline import start_git
+
+
+def test_start_git_is_traced_when_it_finishes(repo):
+    repo.write("a.txt", "one\n")
+
+    async def stage():
+        process = await start_git(["update-index", "-z", "--add", "--stdin"],
+                                  stdin=subprocess.PIPE)
+        process.stdin.write(b"a.txt\0")
+        await process.stdin.drain()
+        process.stdin.close()
+        await process.communicate()
+        return process.returncode
+
+    tracing.enable()
+    try:
+        loop = asyncio.new_event_loop()
+        try:
+            assert loop.run_until_complete(stage()) == 0
+        finally:
+            loop.close()
+    finally:
+        tracer = tracing.disable()
+    names = [event["name"] for event in tracer.events if event["kind"] == "command"]
+    assert "git update-index -z --add --stdin" in names
+    assert repo.git("ls-files") == "a.txt"
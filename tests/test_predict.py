@@ -0,0 +1,62 @@
+import json
+
+from click.testing import CliRunner
+
+import predict
+from git_utils import git
+from predict import format_predictions, load_cache, pair_key, predict_command, save_cache
+
+
+def branches(repo):
+    """feature conflicts with main in a.txt, clean only adds b.txt"""
+    repo.write("a.txt", "base\n")
+    repo.commit("base")
+    for name, path in (("feature", "a.txt"), ("clean", "b.txt")):
+        repo.git("checkout", "-q", "-b", name)
+        repo.write(path, f"{name}\n")
+        repo.commit(name)
+        repo.git("checkout", "-q", "main")
+    repo.write("a.txt", "main\n")
+    repo.commit("main moves on")
+    git().forget()
+
+
+def test_cached_pair_is_reported_and_invalidated_when_a_commit_moves(repo):
+    branches(repo)
+    first, = predict.predict(["feature"])
+    assert not first.cached
+    assert first.paths == {"a.txt": 1}
+
+    again, = predict.predict(["feature"])
+    assert again.cached
+    assert again.paths == first.paths
+    assert "(cached)" in format_predictions([again])[0]
+    assert pair_key(first.ours_commit, first.theirs_commit) in load_cache()
+
+    repo.git("checkout", "-q", "feature")
+    repo.write("a.txt", "main\n")
+    repo.commit("take main's a.txt")
+    repo.git("checkout", "-q", "main")
+    git().forget()
+    moved, = predict.predict(["feature"])
+    assert not moved.cached
+    assert moved.theirs_commit != first.theirs_commit
+    assert moved.paths == {}
+
+
+def test_cache_keeps_most_recently_used_pairs(repo, monkeypatch):
+    monkeypatch.setattr(predict, "MAX_CACHED", 2)
+    entry = {"paths": {}, "conflicted_bytes": 0, "seconds": 0.0}
+    save_cache({key: dict(entry, used=used) for key, used in (("a..b", 3), ("c..d", 1),
+                                                               ("e..f", 2))})
+    assert sorted(load_cache()) == ["a..b", "e..f"]
+
+
+def test_exit_code(repo):
+    branches(repo)
+    runner = CliRunner()
+    assert runner.invoke(predict_command, ["feature", "--exit-code"]).exit_code == 1
+    assert runner.invoke(predict_command, ["feature"]).exit_code == 0
+    result = runner.invoke(predict_command, ["clean", "--exit-code", "--json"])
+    assert result.exit_code == 0
+    assert json.loads(result.output)[0]["paths"] == {}
@@ -0,0 +1,65 @@
+import pytest
+
+from git_utils import branch_exists, git
+from ref_index import RefIndex, needs_rev_parse, page
+
+ROWS = [
+    ("refs/heads/main", "1" * 40),
+    ("refs/heads/feature", "2" * 40),
+    ("refs/remotes/origin/HEAD", "1" * 40),
+    ("refs/remotes/origin/main", "1" * 40),
+    ("refs/remotes/origin/friend", "3" * 40),
+    ("refs/remotes/upstream/fix-1", "4" * 40),
+    ("refs/tags/v1.0", "5" * 40),
+]
+
+
+def test_resolve_prefers_local_then_origin():
+    refs = RefIndex(ROWS)
+    assert refs.resolve("main") == "main"
+    assert refs.resolve("friend") == "origin/friend"
+    assert refs.resolve("upstream/fix-1") == "upstream/fix-1"
+    assert refs.resolve("v1.0") == "v1.0"
+    assert refs.resolve("fix-1") is None
+    assert refs.resolve("origin/HEAD") is None
+
+
+def test_names_and_pages():
+    refs = RefIndex(ROWS)
+    assert refs.names("local") == ["feature", "main"]
+    assert refs.names("remote") == ["origin/friend", "origin/main", "upstream/fix-1"]
+    assert refs.names(pattern="fix-*") == ["upstream/fix-1"]
+    assert refs.names(pattern="ai") == ["main", "origin/main"]
+    assert page(list(range(5)), 2, 2) == ([2, 3], 3)
+    assert page([], 4) == ([], 1)
+
+
+@pytest.mark.parametrize("name,expected", [
+    ("feature", False), ("origin/feature", False), ("HEAD~1", True), ("main^2", True),
+    ("@{u}", True), ("abc1234", True), ("main:a.txt", True),
+])
+def test_needs_rev_parse(name, expected):
+    assert needs_rev_parse(name) is expected
+
+
+def test_index_is_dropped_when_refs_move(repo):
+    repo.write("a.txt", "a\n")
+    first = repo.commit("first")
+    refs = git().refs()
+    assert refs.local == {"main": first}
+    assert git().refs() is refs
+
+    # update-ref through the backend drops the cached index
+    git().run(["update-ref", "refs/heads/feature", first])
+    assert git().refs() is not refs
+    assert branch_exists("feature") == "feature"
+
+    # Outside the backend the index is stale until it is forgotten
+    repo.git("update-ref", "refs/remotes/origin/friend", first)
+    assert branch_exists("friend") is None
+    git().forget("refs")
+    assert branch_exists("friend") == "origin/friend"
+
+    # Commit ids are not in the index and fall back to rev-parse
+    assert branch_exists(first[:10]) == first[:10]
+    assert branch_exists("main~5") is None
@@ -0,0 +1,63 @@
+from repo_state import RepoState, describe
+
+OID = "1" * 40
+
+
+def test_branch_headers():
+    state = RepoState([
+        f"# branch.oid {OID}",
+        "# branch.head main",
+        "# branch.upstream origin/main",
+        "# branch.ab +2 -3",
+    ])
+    assert (state.oid, state.branch, state.upstream) == (OID, "main", "origin/main")
+    assert (state.ahead, state.behind) == (2, 3)
+    assert not state.dirty
+    assert describe(state) == ["🌿 On branch main → origin/main (ahead 2, behind 3)",
+                               "✅ Working tree clean"]
+
+
+def test_initial_commit_and_detached_head():
+    assert RepoState(["# branch.oid (initial)", "# branch.head main"]).oid is None
+    assert RepoState([f"# branch.oid {OID}", "# branch.head (detached)"]).branch is None
+
+
+def test_changed_renamed_and_untracked_paths():
+    state = RepoState([
+        f"1 .M N... 100644 100644 100644 {OID} {OID} file with spaces.txt",
+        f"2 R. N... 100644 100644 100644 {OID} {OID} R100 new.txt",
+        "old.txt",
+        "? scratch.txt",
+        "? build/",
+    ])
+    assert state.changed == {"file with spaces.txt": ".M", "new.txt": "R."}
+    assert state.untracked == 2
+    assert state.dirty
+
+
+def test_unmerged_stages():
+    base, ours, theirs = "a" * 40, "b" * 40, "c" * 40
+    zero = "0" * 40
+    state = RepoState([
+        f"u UU N... 100644 100644 100644 100644 {base} {ours} {theirs} both.txt",
+        f"u DU N... 100644 000000 100644 100644 {base} {zero} {theirs} gone.txt",
+    ])
+    assert state.conflicted["both.txt"] == ("UU", {1: ("100644", base), 2: ("100644", ours),
+                                                   3: ("100644", theirs)})
+    assert state.conflicted["gone.txt"] == ("DU", {1: ("100644", base),
+                                                   3: ("100644", theirs)})
+    assert state.conflict_kind("gone.txt") == "deleted by us"
+    assert state.as_dict()["conflicted"] == ["both.txt", "gone.txt"]
+
+
+def test_load_reads_a_real_status(repo):
+    from git_utils import refresh_state, repo_state
+
+    repo.conflicted_merge({"a.txt": "base\n"}, {"a.txt": "ours\n"}, {"a.txt": "theirs\n"})
+    repo.write("new.txt", "untracked\n")
+    refresh_state()
+    state = repo_state()
+    assert state.branch == "main"
+    assert list(state.conflicted) == ["a.txt"]
+    assert sorted(state.conflicted["a.txt"][1]) == [1, 2, 3]
+    assert state.untracked == 1
@@ -0,0 +1,83 @@
+import itertools
+import os
+
+import resolution_cache
+from resolution_cache import ResolutionCache, hunk_key, open_cache
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(resolution_cache.time, "time", lambda: next(clock))
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResolutionCache(path, max_bytes=25)
+    for key in "abc":
+        cache.put(key, key.encode() * 10)
+    assert cache.get("a") == b"a" * 10  # now the most recently used
+    cache.close()
+
+    cache = ResolutionCache(path, max_bytes=25)
+    assert cache.get("b") is None
+    assert cache.get("a") == b"a" * 10
+    assert cache.get("c") == b"c" * 10
+    assert (cache.hits, cache.misses) == (2, 1)
+    cache.close()
+
+
+def test_oversized_resolutions_are_not_stored(tmp_path):
+    cache = ResolutionCache(str(tmp_path / "cache.sqlite"), max_bytes=4)
+    cache.put("big", b"12345")
+    assert cache.get("big") is None
+    cache.close()
+
+
+def test_key_version_bump_invalidates_old_entries(tmp_path, monkeypatch):
+    cache = ResolutionCache(str(tmp_path / "cache.sqlite"))
+    old = hunk_key(b"ours\n", b"base\n", b"theirs\n", "union")
+    cache.put(old, b"resolved\n")
+    monkeypatch.setattr(resolution_cache, "KEY_VERSION", resolution_cache.KEY_VERSION + 1)
+    new = hunk_key(b"ours\n", b"base\n", b"theirs\n", "union")
+    assert new != old
+    assert cache.get(new) is None
+    cache.close()
+
+
+def test_keys_ignore_line_endings_but_not_content():
+    lf = hunk_key(b"a\nb\n", b"base\n", b"c\n", "union")
+    assert hunk_key(b"a\r\nb\r\n", b"base\r\n", b"c\r\n", "union") == lf
+    assert hunk_key(b"a\nb\n", None, b"c\n", "union") != lf
+    assert hunk_key(b"a\nb\n", b"base\n", b"c\n", "ours") != lf
+
+
+def test_crlf_file_hits_the_entry_an_lf_file_stored(repo):
+    from conflict_solver import resolve_conflicts
+    from git_utils import get_common_dir
+
+    repo.conflicted_merge({"lf.txt": "x\nshared\ny\n", "crlf.txt": "x\r\nshared\r\ny\r\n"},
+                          {"lf.txt": "x\nours\ny\n", "crlf.txt": "x\r\nours\r\ny\r\n"},
+                          {"lf.txt": "x\ntheirs\ny\n", "crlf.txt": "x\r\ntheirs\r\ny\r\n"})
+    path = resolution_cache.cache_path(get_common_dir())
+    results = {result.path: result
+               for result in resolve_conflicts(cache_path=path, strategy="union")}
+    assert results["crlf.txt"].cache_misses + results["lf.txt"].cache_misses == 1
+    assert results["crlf.txt"].cache_hits + results["lf.txt"].cache_hits == 1
+    assert (repo.path / "crlf.txt").read_bytes() == b"x\r\nours\r\ntheirs\r\ny\r\n"
+    assert (repo.path / "lf.txt").read_bytes() == b"x\nours\ntheirs\ny\n"
+
+
+def test_the_store_lives_under_the_git_dir(repo, tmp_path):
+    from git_utils import get_common_dir, temporary_worktree
+    from integration import IntegrationOptions
+
+    expected = os.path.join(os.path.realpath(str(repo.path / ".git")), "git-solver",
+                            "resolution-cache.sqlite")
+    assert os.path.realpath(IntegrationOptions().cache_path()) == expected
+    open_cache(get_common_dir()).close()
+    assert os.path.exists(expected)
+
+    # Every worktree of the repository shares the one store
+    repo.write("a.txt", "a\n")
+    repo.commit()
+    with temporary_worktree("HEAD", str(tmp_path)):
+        assert os.path.realpath(IntegrationOptions().cache_path()) == expected
+    assert IntegrationOptions(use_cache=False).cache_path() is None
+    assert open_cache(None) is None
@@ -0,0 +1,81 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import pytest
+
+from solver_daemon import is_running, repo_root, request, send_request, serve
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"),
+                                reason="needs Unix domain sockets")
+
+
+@pytest.fixture
+def socket_path():
+    # tmp_path can be longer than a Unix socket path may be
+    directory = tempfile.mkdtemp(prefix="gs-")
+    yield os.path.join(directory, "d.sock")
+    os.rmdir(directory)
+
+
+def start_daemon(socket_path):
+    thread = threading.Thread(target=serve, args=(socket_path,), daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not is_running(socket_path):
+        assert time.monotonic() < deadline, "daemon did not start"
+        time.sleep(0.05)
+    return thread
+
+
+def test_repo_root(repo):
+    (repo.path / "sub" / "dir").mkdir(parents=True)
+    assert repo_root(str(repo.path / "sub" / "dir")) == os.path.realpath(str(repo.path))
+    assert repo_root("/") == "/"
+
+
+def test_request_round_trip(repo, socket_path):
+    repo.write("a.txt", "base\n")
+    repo.commit("base")
+    repo.git("checkout", "-q", "-b", "feature")
+    repo.write("a.txt", "feature\n")
+    repo.commit("feature")
+    repo.git("checkout", "-q", "main")
+    repo.write("a.txt", "main\n")
+    repo.commit("main")
+    (repo.path / "sub").mkdir()
+
+    thread = start_daemon(socket_path)
+    try:
+        ping = send_request({"command": "ping", "repo": str(repo.path)}, socket_path)
+        assert ping["ok"]
+        assert ping["result"]["repo"] == os.path.realpath(str(repo.path))
+        assert ping["result"]["pid"] != os.getpid()
+        # A subdirectory is served by the same warm worker
+        again = request({"command": "ping", "repo": str(repo.path / "sub")}, socket_path)
+        assert again["result"]["pid"] == ping["result"]["pid"]
+
+        predicted = request({"command": "predict", "branches": ["feature"]}, socket_path)
+        assert predicted["ok"], predicted["error"]
+        assert [(p["ours"], p["theirs"], p["paths"]) for p in predicted["result"]] == [
+            ("main", "feature", {"a.txt": 1})
+        ]
+
+        status = request({"command": "status"}, socket_path)
+        assert status["ok"] and status["result"]["branch"] == "main"
+
+        unknown = request({"command": "rebase"}, socket_path)
+        assert not unknown["ok"]
+        assert unknown["error"].startswith("RuntimeError: Unknown command 'rebase'")
+    finally:
+        send_request({"command": "shutdown"}, socket_path)
+        thread.join(10)
+    assert not thread.is_alive()
+    assert not os.path.exists(socket_path)
+
+    # Without a daemon the request runs in-process, unless that is refused
+    assert request({"command": "ping"}, socket_path)["result"]["pid"] == os.getpid()
+    with pytest.raises(OSError):
+        request({"command": "ping"}, socket_path, fallback=False)
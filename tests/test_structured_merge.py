@@ -0,0 +1,174 @@
+import io
+import json
+
+import pytest
+
+from structured_merge import (
+    JsonPlugin, TomlLockPlugin, Unmergeable, YamlPlugin, _Output, merge_container, merge_stages,
+    plugin_for,
+)
+
+
+def merge(plugin, base, ours, theirs):
+    out = io.BytesIO()
+    bufs = [base, ours, theirs]
+    merge_container(plugin, _Output(out), bufs, [(0, len(buf)) for buf in bufs])
+    return out.getvalue()
+
+
+BASE = b'{\n  "a": 1,\n  "b": 2,\n  "packages": {\n    "x": {"v": "1"},\n    "y": {"v": "1"}\n  }\n}\n'
+
+
+def test_json_takes_each_sides_entries():
+    ours = BASE.replace(b'"x": {"v": "1"}', b'"x": {"v": "2"}')
+    theirs = BASE.replace(b'"y": {"v": "1"}', b'"y": {"v": "3"},\n    "z": {"v": "1"}')
+    merged = json.loads(merge(JsonPlugin(), BASE, ours, theirs))
+    assert merged["packages"] == {"x": {"v": "2"}, "y": {"v": "3"}, "z": {"v": "1"}}
+
+
+def test_json_keeps_untouched_formatting():
+    ours = BASE.replace(b'"a": 1', b'"a": 10')
+    assert merge(JsonPlugin(), BASE, ours, BASE) == ours
+
+
+def test_json_key_deleted_on_both_sides():
+    ours = BASE.replace(b'  "b": 2,\n', b"")
+    merged = merge(JsonPlugin(), BASE, ours, ours)
+    assert "b" not in json.loads(merged)
+
+
+def test_json_delete_on_one_side():
+    theirs = BASE.replace(b'  "b": 2,\n', b"")
+    assert "b" not in json.loads(merge(JsonPlugin(), BASE, BASE, theirs))
+
+
+def test_json_conflicting_values_are_unmergeable():
+    ours = BASE.replace(b'"x": {"v": "1"}', b'"x": {"v": "2"}')
+    theirs = BASE.replace(b'"x": {"v": "1"}', b'"x": {"v": "3"}')
+    with pytest.raises(Unmergeable, match="packages.x.v"):
+        merge(JsonPlugin(), BASE, ours, theirs)
+
+
+def test_json_modify_delete_is_unmergeable():
+    ours = BASE.replace(b'"a": 1', b'"a": 5')
+    theirs = BASE.replace(b'  "a": 1,\n', b"")
+    with pytest.raises(Unmergeable, match="deleted"):
+        merge(JsonPlugin(), BASE, ours, theirs)
+
+
+def test_json_volatile_key_keeps_ours():
+    base = b'{"content-hash": "a", "x": 1}'
+    merged = merge(JsonPlugin(), base, base.replace(b'"a"', b'"b"'), base.replace(b'"a"', b'"c"'))
+    assert json.loads(merged)["content-hash"] == "b"
+
+
+@pytest.mark.parametrize("data", [b'{"a": }', b'{"a": [1}', b'{"a": 1,}', b'{"a": 1} x'])
+def test_json_rejects_invalid_input(data):
+    with pytest.raises(ValueError):
+        JsonPlugin().container(data, 0, len(data), 0)
+
+
+def test_yaml_merges_nested_mappings():
+    pytest.importorskip("yaml")
+    base = b"version: 1\npackages:\n  /a@1:\n    dev: false\n  /b@1:\n    dev: false\n"
+    ours = base.replace(b"/a@1:\n    dev: false", b"/a@1:\n    dev: true")
+    theirs = base + b"  /c@1:\n    dev: false\n"
+    import yaml
+
+    merged = yaml.safe_load(merge(YamlPlugin(), base, ours, theirs))
+    assert merged["packages"] == {"/a@1": {"dev": True}, "/b@1": {"dev": False},
+                                  "/c@1": {"dev": False}}
+
+
+def test_toml_lock_merges_packages():
+    plugin = TomlLockPlugin(("poetry.lock",))
+    base = (b'[[package]]\nname = "a"\nversion = "1"\n\n[package.dependencies]\nx = "*"\n\n'
+            b'[metadata]\ncontent-hash = "h"\n')
+    ours = base.replace(b'version = "1"', b'version = "2"')
+    theirs = base.replace(b"[metadata]", b'[[package]]\nname = "b"\nversion = "1"\n\n[metadata]')
+    merged = merge(plugin, base, ours, theirs)
+    assert b'name = "b"' in merged and b'version = "2"' in merged
+    assert merged.count(b"[package.dependencies]") == 1
+
+
+def test_plugin_for_picks_by_pattern():
+    assert plugin_for("web/package-lock.json").name == "json"
+    assert plugin_for("poetry.lock").name == "toml"
+    assert plugin_for("README.md") is None
+
+
+def test_merge_stages_validates_and_streams_blobs(repo, tmp_path):
+    stages = {stage: ("100644", repo.blob(data.decode()))
+              for stage, data in ((1, BASE), (2, BASE.replace(b'"a": 1', b'"a": 3')),
+                                  (3, BASE.replace(b'  "b": 2,\n', b"")))}
+    dst = tmp_path / "out.json"
+    assert merge_stages("conf.json", stages, str(dst)) == "json"
+    assert json.loads(dst.read_bytes()) == {"a": 3, "packages": {"x": {"v": "1"},
+                                                                  "y": {"v": "1"}}}
+
+
+def test_merge_stages_refuses_one_sided_delete(repo, tmp_path):
+    stages = {1: ("100644", repo.blob("{}")), 2: ("100644", repo.blob("{}"))}
+    with pytest.raises(Unmergeable):
+        merge_stages("conf.json", stages, str(tmp_path / "out.json"))
+
+
+def conflicted_json(repo):
+    """Checkout merge where both branches delete "b" and edit the lines around it"""
+    repo.write("conf.json", '{\n  "a": 1,\n  "b": 2,\n  "c": 3\n}\n')
+    repo.commit("base")
+    repo.git("checkout", "-q", "-b", "feature")
+    repo.write("conf.json", '{\n  "a": 1,\n  "c": 30\n}\n')
+    repo.commit("theirs")
+    repo.git("checkout", "-q", "main")
+    repo.write("conf.json", '{\n  "a": 10,\n  "c": 3\n}\n')
+    repo.commit("ours")
+    repo.git("-c", "merge.conflictStyle=diff3", "merge", "-q", "feature", check=False)
+    from git_utils import refresh_state
+    refresh_state()
+
+
+def test_resolve_conflicts_merges_both_deleted_key(repo):
+    from conflict_solver import resolve_conflicts
+
+    conflicted_json(repo)
+    [result] = resolve_conflicts()
+    assert result.error is None and result.action == "structured"
+    assert json.loads((repo.path / "conf.json").read_text()) == {"a": 10, "c": 30}
+
+
+def test_resolve_conflicts_falls_back_on_any_plugin_error(repo, monkeypatch):
+    import structured_merge
+    from conflict_solver import resolve_conflicts
+
+    def broken(path, stages, dst):
+        raise KeyError("plugin bug")
+
+    monkeypatch.setattr(structured_merge, "merge_stages", broken)
+    conflicted_json(repo)
+    [result] = resolve_conflicts(strategy="ours")
+    assert result.error is None and result.action == "text"
+    assert "plugin bug" in result.note
+    assert b"<<<<<<<" not in (repo.path / "conf.json").read_bytes()
+
+
+def test_tree_conflicts_merge_both_deleted_key(repo):
+    from merge_engine import merge_commits
+
+    conflicted_json(repo)
+    repo.git("merge", "--abort")
+    commit, results = merge_commits("main", "feature", "merge")
+    assert [result.action for result in results] == ["structured"]
+    data = repo.git("show", f"{commit}:conf.json")
+    assert json.loads(data) == {"a": 10, "c": 30}
+
+
+def test_format_plugin_requires_container_and_validate():
+    from structured_merge import FormatPlugin
+
+    class Partial(FormatPlugin):
+        def container(self, buf, start, end, depth):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
@@ -0,0 +1,176 @@
+"""Opt-in timing of git subprocess calls and named pipeline phases.
+
+Nothing is recorded until enable() is called (or GIT_SOLVER_TRACE is set).
+Recorded events can be dumped as a Chrome trace (open in chrome://tracing
+or Perfetto) or as JSON lines, and summarized as a top-N table.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+TRACE_ENV = "GIT_SOLVER_TRACE"
+
+
+class Tracer:
+    """Collects command and span events relative to its creation time"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events = []
+        self._lock = threading.Lock()
+
+    def add(self, kind, name, start, end, **details):
+        event = {
+            "kind": kind,
+            "name": name,
+            "start": start - self.origin,
+            "duration": end - start,
+            "pid": os.getpid(),
+            "thread": threading.get_ident(),
+        }
+        event.update(details)
+        with self._lock:
+            self.events.append(event)
+
+
+_tracer = None
+
+
+def enable():
+    """Start recording (keeps recording into the current trace if already on)"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def disable():
+    """Stop recording and return the finished tracer, if any"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def is_enabled():
+    return _tracer is not None
+
+
+def current():
+    return _tracer
+
+
+def record_command(args, start, returncode, output_size):
+    """Record one finished subprocess call that started at perf_counter() start"""
+    tracer = _tracer
+    if tracer is None:
+        return
+    tracer.add("command", " ".join(str(arg) for arg in args), start, time.perf_counter(),
+               returncode=returncode, output_bytes=output_size)
+
+
+@contextmanager
+def span(name, **details):
+    """Time a named phase; a no-op unless tracing is enabled"""
+    tracer = _tracer
+    if tracer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracer.add("span", name, start, time.perf_counter(), **details)
+
+
+def command_key(name):
+    """Group commands by their git subcommand, skipping -c options"""
+    words = name.split()
+    while len(words) > 2 and words[1] == "-c":
+        del words[1:3]
+    return " ".join(words[:2])
+
+
+def summary(tracer=None, top=10):
+    """Top-N commands by total time plus the time spent in each span"""
+    tracer = tracer or _tracer
+    if tracer is None:
+        return {"commands": [], "spans": []}
+
+    commands = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "output_bytes": 0,
+                                    "failures": 0})
+    spans = defaultdict(lambda: {"calls": 0, "seconds": 0.0})
+    for event in list(tracer.events):
+        if event["kind"] == "command":
+            entry = commands[command_key(event["name"])]
+            entry["output_bytes"] += event.get("output_bytes", 0)
+            entry["failures"] += 1 if event.get("returncode") else 0
+        else:
+            entry = spans[event["name"]]
+        entry["calls"] += 1
+        entry["seconds"] += event["duration"]
+
+    def ranked(groups):
+        rows = [dict(name=name, **values) for name, values in groups.items()]
+        return sorted(rows, key=lambda row: row["seconds"], reverse=True)[:top]
+
+    return {"commands": ranked(commands), "spans": ranked(spans)}
+
+
+def format_summary(tracer=None, top=10):
+    """Human readable lines for summary()"""
+    data = summary(tracer, top)
+    lines = [f"{'calls':>6} {'seconds':>9}  command"]
+    for row in data["commands"]:
+        lines.append(f"{row['calls']:>6} {row['seconds']:>9.3f}  {row['name']}")
+    if data["spans"]:
+        lines.append("")
+        lines.append(f"{'calls':>6} {'seconds':>9}  phase")
+        for row in data["spans"]:
+            lines.append(f"{row['calls']:>6} {row['seconds']:>9.3f}  {row['name']}")
+    return lines
+
+
+def dump(path, tracer=None):
+    """Write events to path: JSON lines for .jsonl, a Chrome trace otherwise"""
+    tracer = tracer or _tracer
+    events = list(tracer.events) if tracer else []
+    with open(path, "w") as out:
+        if path.endswith(".jsonl"):
+            for event in events:
+                out.write(json.dumps(event) + "\n")
+            return len(events)
+
+        trace_events = []
+        for event in events:
+            args = {k: v for k, v in event.items()
+                    if k not in ("kind", "name", "start", "duration", "pid", "thread")}
+            trace_events.append({
+                "name": event["name"],
+                "cat": event["kind"],
+                "ph": "X",
+                "ts": event["start"] * 1e6,
+                "dur": event["duration"] * 1e6,
+                "pid": event["pid"],
+                "tid": event["thread"],
+                "args": args,
+            })
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, out)
+    return len(events)
+
+
+def _trace_from_environment():
+    path = os.environ.get(TRACE_ENV)
+    if not path:
+        return
+    import multiprocessing
+    # Pool workers re-import this module; only the main process writes the file
+    if multiprocessing.current_process().name == "MainProcess":
+        enable()
+        atexit.register(lambda: _tracer and dump(path))
+
+
+_trace_from_environment()
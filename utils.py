@@ -0,0 +1,97 @@
+import click
+
+
+def option_value(args, name, default=None, cast=str):
+    """Read '--name value' or '--name=value' from a list of shell arguments"""
+    for i, arg in enumerate(args):
+        if arg == name and i + 1 < len(args):
+            return cast(args[i + 1])
+        if arg.startswith(name + "="):
+            return cast(arg.split("=", 1)[1])
+    return default
+
+
+def split_branches(value):
+    """Branch names from a comma or whitespace separated list"""
+    return [name for name in value.replace(",", " ").split() if name]
+
+
+def report_resolution(results):
+    """Print a per-batch resolution summary, raising if any file failed"""
+    from conflict_solver import summarize_results
+    from file_classifier import regenerate_command
+
+    summary = summarize_results(results)
+    click.echo(
+        f"   Resolved {summary['hunks']} hunk(s) in {summary['files']} file(s), "
+        f"{summary['bytes_written']} bytes written"
+    )
+    if summary["hunks_shrunk"]:
+        click.echo(
+            f"   ✂️  Line-level merge shrank {summary['hunks_shrunk']} hunk(s): "
+            f"{summary['lines_before']} → {summary['lines_after']} conflicting line(s)"
+        )
+        for result in results:
+            shrunk = [f"{before}→{after}" for before, after in result.shrink if after < before]
+            if shrunk:
+                click.echo(f"      {result.path}: {', '.join(shrunk)}")
+    for result in results:
+        if result.note and result.action != "structured":
+            command = regenerate_command(result.path)
+            hint = f"; rebuild it with '{command}'" if command else ""
+            click.echo(f"   ↩️  {result.path}: {result.note}; resolved as {result.action}{hint}")
+        if result.error or result.action == "text":
+            continue
+        if result.action == "structured":
+            command = regenerate_command(result.path)
+            hint = f"; refresh it with '{command}'" if command else ""
+            click.echo(f"   🧩 {result.path}: merged entry by entry as {result.note}{hint}")
+        elif result.action == "regenerate":
+            command = regenerate_command(result.path)
+            hint = f"; rebuild it with '{command}'" if command else "; rebuild it before pushing"
+            click.echo(f"   🔁 {result.path}: kept ours{hint}")
+        else:
+            click.echo(f"   📦 {result.path}: took {result.action} as a whole file")
+    if summary["failed"]:
+        for result in summary["failed"]:
+            click.echo(f"   ⚠️  {result.path}: {result.error}")
+        raise RuntimeError(
+            f"Could not resolve {len(summary['failed'])} file(s); merge left in progress"
+        )
+    return summary
+
+
+def report_cache(results):
+    """Print resolution cache hit/miss counts for a whole merge"""
+    from conflict_solver import summarize_results
+
+    summary = summarize_results(results)
+    lookups = summary["cache_hits"] + summary["cache_misses"]
+    if lookups:
+        click.echo(
+            f"🗃  Resolution cache: {summary['cache_hits']} hit(s), "
+            f"{summary['cache_misses']} miss(es)"
+        )
+
+
+def report_plan(plan, top=5):
+    """Print how a multi-branch merge was ordered and where conflicts are likely"""
+    click.echo(
+        f"🧭 Merge plan: {len(plan.clean)} clean branch(es) in one octopus merge, "
+        f"{len(plan.ordered)} merged one by one"
+    )
+    for changes in plan.merged:
+        click.echo(f"   {changes.label} is already merged; skipping")
+    if plan.ordered:
+        click.echo(f"   Order: {', '.join(changes.label for changes in plan.ordered)}")
+    risky = sorted(plan.overlaps.items(), key=lambda item: item[1], reverse=True)[:top]
+    for (a, b), shared in risky:
+        click.echo(f"   ⚠️  {a} and {b} both change {shared} path(s)")
+
+
+def report_fetch(result, ttl):
+    """Print which branches a fetch_planner.FetchResult skipped and why"""
+    if result.missing:
+        click.echo(f"   Not on origin, using the local branch: {', '.join(result.missing)}")
+    if result.fresh and not result.fetched:
+        click.echo(f"   Remote branches fetched less than {ttl}s ago; skipping fetch")